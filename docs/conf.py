@@ -2,7 +2,7 @@ import os
 import sys
 import django
 sys.path.insert(0, os.path.abspath('..'))
-os.environ['DJANGO_SETTINGS_MODULE'] = 'project_news.settings'
+os.environ['DJANGO_SETTINGS_MODULE'] = 'project_news.settings.dev'
 django.setup()
 
 
@@ -6,7 +6,10 @@ import sys
 
 def main():
     """Run administrative tasks."""
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project_news.settings')
+    # The test suite uses its own settings unless told otherwise
+    profile = 'test' if sys.argv[1:2] == ['test'] else 'dev'
+    os.environ.setdefault(
+        'DJANGO_SETTINGS_MODULE', f'project_news.settings.{profile}')
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
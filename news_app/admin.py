@@ -1,31 +1,72 @@
 from django.contrib import admin
+from .functions.pagination import EstimatedCountPaginator
 from .models import Article, Publisher, Newsletter, CustomUser
+from .models import ArticleTag, NewsletterTag, Tag
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """
+    Admin options for tables with millions of rows: counts come from
+    the table statistics and the changelist doesn't count the unfiltered
+    table again next to the filtered results.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(CustomUser)
-class CustomUserAdmin(admin.ModelAdmin):
+class CustomUserAdmin(ScalableAdmin):
     """
     Admin interface options for the CustomUser model.
     """
     list_display = ('username', 'email', 'role', 'publisher')
     list_filter = ('role',)
-    search_fields = ('username', 'email')
-    filter_horizontal = ('subscribed_journalists', 'subscribed_publishers')
+    list_select_related = ('publisher',)
+    # Autocomplete results are paginated, which needs a stable order
+    ordering = ('username',)
+    # Prefix searches can use the username index
+    search_fields = ('^username', '^email')
+    autocomplete_fields = (
+        'publisher', 'subscribed_journalists', 'subscribed_publishers',
+        'subscribed_tags')
+
+
+class ArticleTagInline(admin.TabularInline):
+    """
+    Edits the tags of an article, which have their own link model.
+    """
+    model = ArticleTag
+    autocomplete_fields = ('tag',)
+    extra = 1
+
+
+class NewsletterTagInline(admin.TabularInline):
+    """
+    Edits the tags of a newsletter, which have their own link model.
+    """
+    model = NewsletterTag
+    autocomplete_fields = ('tag',)
+    extra = 1
 
 
 @admin.register(Article)
-class ArticleAdmin(admin.ModelAdmin):
+class ArticleAdmin(ScalableAdmin):
     """
     Admin interface options for the Article model.
     """
     list_display = (
         'title', 'article_author', 'editor_approved', 'independent_journalist')
     list_filter = ('editor_approved', 'independent_journalist')
-    search_fields = ('title', 'content')
+    list_select_related = ('article_author',)
+    # Searching the content would scan every row; a title prefix search
+    # uses the title index
+    search_fields = ('^title',)
+    autocomplete_fields = ('article_author',)
+    inlines = (ArticleTagInline,)
 
 
 @admin.register(Newsletter)
-class NewsletterAdmin(admin.ModelAdmin):
+class NewsletterAdmin(ScalableAdmin):
     """
     Admin interface options for the Newsletter model.
     """
@@ -33,7 +74,10 @@ class NewsletterAdmin(admin.ModelAdmin):
         'title', 'newsletter_author', 'editor_approved',
         'independent_journalist')
     list_filter = ('editor_approved', 'independent_journalist')
-    search_fields = ('title', 'content')
+    list_select_related = ('newsletter_author',)
+    search_fields = ('^title',)
+    autocomplete_fields = ('newsletter_author',)
+    inlines = (NewsletterTagInline,)
 
 
 @admin.register(Publisher)
@@ -42,4 +86,15 @@ class PublisherAdmin(admin.ModelAdmin):
     Admin interface options for the Publisher model.
     """
     list_display = ('name',)
-    search_fields = ('name',)
+    ordering = ('name',)
+    search_fields = ('^name',)
+
+
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    """
+    Admin interface options for the Tag model.
+    """
+    list_display = ('name', 'slug')
+    prepopulated_fields = {'slug': ('name',)}
+    search_fields = ('^name',)
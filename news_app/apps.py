@@ -7,3 +7,7 @@ class NewsAppConfig(AppConfig):
     """
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'news_app'
+
+    def ready(self):
+        # Connect the signal receivers and register the system checks
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,164 @@
+import copy
+import hashlib
+import secrets
+import time
+from collections import OrderedDict
+from threading import Lock
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.authentication import get_authorization_header
+from .models import ApiToken
+
+# Number of verified tokens kept in memory per process.
+TOKEN_CACHE_SIZE = getattr(settings, 'API_TOKEN_CACHE_SIZE', 10000)
+# Seconds a verified token is trusted before it is looked up again,
+# which bounds how long a deactivated user keeps access.
+TOKEN_CACHE_TTL = getattr(settings, 'API_TOKEN_CACHE_TTL', 60)
+# Shared cache key of the version revoking a token changes.
+TOKEN_VERSION_KEY = 'api_token_version'
+
+
+def hash_token(key):
+    """
+    Returns the hash a token is stored under. Tokens are long random
+    strings, so a fast hash is enough.
+    """
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def token_version():
+    """
+    Returns the current token version, shared by all processes through
+    the cache.
+    """
+    return cache.get_or_set(TOKEN_VERSION_KEY, time.time_ns, None)
+
+
+def bump_token_version():
+    """
+    Makes every process look its cached tokens up again, so a revoked
+    token is rejected by all of them.
+    """
+    cache.set(TOKEN_VERSION_KEY, time.time_ns(), None)
+
+
+class TokenCache:
+    """
+    A thread safe LRU cache of the users of verified token hashes, with
+    a time to live. Entries are only valid for the token version they
+    were verified at.
+    """
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key_hash, version):
+        """
+        Returns a copy of the user of a token cached at the given
+        version, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key_hash)
+            if entry is None:
+                return None
+            user, cached_version, expires_at = entry
+            if cached_version != version or expires_at < time.monotonic():
+                del self._entries[key_hash]
+                return None
+            self._entries.move_to_end(key_hash)
+        # Requests may change the user they are given
+        return copy.copy(user)
+
+    def set(self, key_hash, user, version):
+        """Caches the user of a token verified at the given version."""
+        with self._lock:
+            self._entries[key_hash] = (
+                copy.copy(user), version, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key_hash)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key_hash):
+        """Removes a token from the cache."""
+        with self._lock:
+            self._entries.pop(key_hash, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL)
+
+
+def issue_token(user, name):
+    """
+    Creates an API token for the user. Returns the token and the raw
+    key, which can't be recovered later.
+    """
+    key = secrets.token_urlsafe(32)
+    token = ApiToken.objects.create(
+        user=user, name=name, key_hash=hash_token(key), prefix=key[:8])
+    return token, key
+
+
+def revoke_token(token):
+    """
+    Revokes an API token and removes it from the cache of every
+    process.
+    """
+    token.revoked = True
+    token.save(update_fields=['revoked'])
+    token_cache.discard(token.key_hash)
+    bump_token_version()
+
+
+class TokenAuthentication(BaseAuthentication):
+    """
+    REST framework authentication with an API token sent in an
+    'Authorization: Bearer <token>' or 'Authorization: Token <token>'
+    header. Verified tokens and their users are kept in an in-process
+    cache for TOKEN_CACHE_TTL seconds, so a known token costs one
+    shared cache read and no query. Revoking a token changes the token
+    version, which takes effect immediately in every process; changes
+    to the user, such as deactivating them, within TOKEN_CACHE_TTL.
+    """
+    keywords = (b'bearer', b'token')
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() not in self.keywords:
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed(
+                'Invalid token header.')
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(
+                'Invalid token header.')
+
+        key_hash = hash_token(key)
+        # Read before the token, so a revocation in between makes the
+        # entry stale
+        version = token_version()
+        user = token_cache.get(key_hash, version)
+        if user is None:
+            try:
+                token = ApiToken.objects.select_related('user').get(
+                    key_hash=key_hash, revoked=False)
+            except ApiToken.DoesNotExist:
+                raise exceptions.AuthenticationFailed('Invalid token.')
+            user = token.user
+            token_cache.set(key_hash, user, version)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                'User inactive or deleted.')
+        return user, None
+
+    def authenticate_header(self, request):
+        return 'Bearer'
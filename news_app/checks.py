@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.core import checks
+from django.core.exceptions import ImproperlyConfigured
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+
+CACHED_LOADER = 'django.template.loaders.cached.Loader'
+# Caches that are not shared between server processes.
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def _uses_cached_loader(engine):
+    for loader in engine.engine.loaders:
+        name = loader[0] if isinstance(loader, (list, tuple)) else loader
+        if name == CACHED_LOADER:
+            return True
+    return False
+
+
+@checks.register(checks.Tags.compatibility, deploy=True)
+def check_performance_settings(app_configs=None, **kwargs):
+    """
+    Checks the settings a production deployment needs to perform well.
+    Reported by 'manage.py check --deploy' and at startup by
+    fail_fast().
+    """
+    errors = []
+    if settings.DEBUG:
+        errors.append(checks.Error(
+            "DEBUG is on, so every SQL query is kept in memory.",
+            hint="Unset DJANGO_DEBUG.", id='news_app.E001'))
+    try:
+        secret_key = settings.SECRET_KEY
+    except ImproperlyConfigured:
+        # Django refuses to read an empty SECRET_KEY
+        secret_key = ''
+    if not secret_key or secret_key.startswith('django-insecure'):
+        errors.append(checks.Error(
+            "SECRET_KEY is missing or a development key.",
+            hint="Set DJANGO_SECRET_KEY.", id='news_app.E002'))
+    if not settings.ALLOWED_HOSTS:
+        errors.append(checks.Error(
+            "ALLOWED_HOSTS is empty.",
+            hint="Set DJANGO_ALLOWED_HOSTS.", id='news_app.E003'))
+    for engine in engines.all():
+        if isinstance(engine, DjangoTemplates) and (
+                not _uses_cached_loader(engine)):
+            errors.append(checks.Error(
+                f"Templates of the '{engine.name}' engine are parsed on "
+                f"every render.",
+                hint=f"Wrap its loaders in {CACHED_LOADER}.",
+                id='news_app.E004'))
+    for alias, database in settings.DATABASES.items():
+        if not database.get('CONN_MAX_AGE'):
+            errors.append(checks.Error(
+                f"The '{alias}' database opens a new connection for every "
+                f"request.",
+                hint="Set DB_CONN_MAX_AGE to a number of seconds.",
+                id='news_app.E005'))
+    # Subscriber sets, feed and facet versions are invalidated in the
+    # cache, so a process-local cache leaves the other processes
+    # notifying unsubscribed readers and serving stale feeds
+    if settings.CACHES['default']['BACKEND'] in PROCESS_LOCAL_CACHES:
+        errors.append(checks.Error(
+            "The default cache is not shared between server processes.",
+            hint="Set REDIS_URL.", id='news_app.E006'))
+    return errors
+
+
+def fail_fast():
+    """
+    Raises ImproperlyConfigured when check_performance_settings finds
+    an error, so a misconfigured server refuses to start.
+    """
+    errors = [
+        message for message in check_performance_settings()
+        if message.is_serious()]
+    if errors:
+        raise ImproperlyConfigured(
+            "Refusing to start with these settings:\n" + "\n".join(
+                f"{error.id}: {error.msg} {error.hint}" for error in errors))
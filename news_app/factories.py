@@ -0,0 +1,129 @@
+"""
+Builders of publisher, journalist, reader and content graphs for tests
+and benchmarks. Objects are inserted with bulk_create, so building
+thousands of rows takes a handful of queries.
+"""
+
+from types import SimpleNamespace
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, Permission
+from django.utils import timezone
+from .models import Article, CustomUser, Newsletter, Publisher, make_summary
+
+PASSWORD = 'password'
+# Permissions of the role groups, as assigned on registration.
+ROLE_PERMISSIONS = {
+    'Journalist': [
+        'add_article', 'view_article', 'change_article', 'delete_article',
+        'add_newsletter', 'view_newsletter', 'change_newsletter',
+        'delete_newsletter',
+    ],
+    'Editor': [
+        'view_article', 'change_article', 'delete_article',
+        'view_newsletter', 'change_newsletter', 'delete_newsletter',
+    ],
+    'Reader': ['view_article', 'view_newsletter'],
+}
+
+
+def role_group(role):
+    """
+    Returns the group of a role, creating it with the role's
+    permissions when needed.
+    """
+    group, created = Group.objects.get_or_create(name=role)
+    if created:
+        group.permissions.set(Permission.objects.filter(
+            content_type__app_label='news_app',
+            codename__in=ROLE_PERMISSIONS[role]))
+    return group
+
+
+def make_publishers(count, prefix='Publisher'):
+    """Creates and returns count publishers."""
+    names = [f'{prefix} {i}' for i in range(count)]
+    Publisher.objects.bulk_create(Publisher(name=name) for name in names)
+    # Not every database returns the primary keys of bulk inserts
+    return list(Publisher.objects.filter(name__in=names).order_by('pk'))
+
+
+def make_users(role, count, prefix=None, publisher=None, **fields):
+    """
+    Creates and returns count users of a role, in the role's group,
+    all with the password PASSWORD.
+    """
+    prefix = prefix or role.lower()
+    password = make_password(PASSWORD)
+    usernames = [f'{prefix}{i}' for i in range(count)]
+    CustomUser.objects.bulk_create(
+        CustomUser(
+            username=username, email=f'{username}@example.com',
+            password=password, role=role, publisher=publisher, **fields)
+        for username in usernames)
+    users = list(
+        CustomUser.objects.filter(username__in=usernames).order_by('pk'))
+    role_group(role).user_set.add(*users)
+    return users
+
+
+def make_items(model, authors, per_author, approved=True,
+               independent=False, content='<p>Content</p>'):
+    """
+    Creates per_author articles or newsletters for each author, with
+    the summary and publication time save() would set.
+    """
+    author_field = (
+        'article_author' if model is Article else 'newsletter_author')
+    visible = approved or independent
+    now = timezone.now()
+    return model.objects.bulk_create(
+        model(
+            title=f'{model.__name__} {i} by {author.username}',
+            content=content, summary=make_summary(content),
+            editor_approved=approved, independent_journalist=independent,
+            published_at=now if visible else None,
+            **{author_field: author})
+        for author in authors for i in range(per_author))
+
+
+def subscribe(readers, publishers=(), journalists=()):
+    """Subscribes every reader to the publishers and journalists."""
+    through = CustomUser.subscribed_publishers.through
+    through.objects.bulk_create(
+        through(customuser_id=reader.pk, publisher_id=publisher.pk)
+        for reader in readers for publisher in publishers)
+    through = CustomUser.subscribed_journalists.through
+    through.objects.bulk_create(
+        through(from_customuser_id=reader.pk, to_customuser_id=journalist.pk)
+        for reader in readers for journalist in journalists)
+
+
+def build_graph(publishers=2, journalists=3, readers=5, items=4,
+                prefix=''):
+    """
+    Builds a graph of publishers, each with an editor and journalists,
+    independent journalists and readers subscribed to everything, plus
+    items articles and newsletters per journalist: approved ones, and
+    pending ones for each publisher's editor to review.
+    """
+    graph = SimpleNamespace(
+        publishers=make_publishers(publishers, f'{prefix}Publisher'),
+        editors=[], journalists=[])
+    for publisher in graph.publishers:
+        name = f'{prefix}p{publisher.pk}_'
+        graph.editors += make_users(
+            'Editor', 1, f'{name}editor', publisher)
+        graph.journalists += make_users(
+            'Journalist', journalists, f'{name}journalist', publisher)
+    graph.independents = make_users(
+        'Journalist', journalists, f'{prefix}independent')
+    graph.readers = make_users('Reader', readers, f'{prefix}reader')
+
+    for model in (Article, Newsletter):
+        make_items(model, graph.journalists, items)
+        make_items(model, graph.journalists, 1, approved=False)
+        make_items(
+            model, graph.independents, items, approved=False,
+            independent=True)
+    subscribe(graph.readers, graph.publishers, graph.independents)
+    return graph
@@ -0,0 +1,330 @@
+import hashlib
+import time
+from itertools import chain
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core import signing
+from django.core.cache import cache
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+from django.utils.feedgenerator import Atom1Feed
+from .models import Article, Newsletter, Publisher, CustomUser
+from .models import ArticleTag, NewsletterTag, Tag
+
+# Number of items listed in a feed.
+FEED_LENGTH = getattr(settings, 'FEED_LENGTH', 20)
+# Seconds a rendered feed is kept in the cache.
+FEED_CACHE_TIMEOUT = getattr(settings, 'FEED_CACHE_TIMEOUT', 60 * 60)
+# Item fields shown in feeds or deciding which feeds list an item.
+FEED_FIELDS = {
+    'title', 'summary', 'editor_approved', 'independent_journalist',
+    'published_at', 'article_author', 'newsletter_author',
+}
+# Salt of the signed tokens of personal reader feeds.
+READER_FEED_SALT = 'news_app.feeds.reader'
+
+
+def feed_version(kind, pk):
+    """
+    Returns the current cache version of the feed of a source, where
+    kind is 'publisher', 'journalist', 'tag' or 'reader'.
+    """
+    return cache.get_or_set(
+        f'feed_version:{kind}:{pk}', time.time_ns(), None)
+
+
+def bump_feed_version(kind, pk):
+    """
+    Invalidates the cached feeds of a source.
+    """
+    cache.set(f'feed_version:{kind}:{pk}', time.time_ns(), None)
+
+
+def _bump_source_feed(independent, author):
+    """
+    Invalidates the feed of the journalist or publisher an item by
+    author is listed under.
+    """
+    if independent:
+        bump_feed_version('journalist', author.pk)
+    elif author.publisher_id:
+        bump_feed_version('publisher', author.publisher_id)
+
+
+def bump_item_feeds(item):
+    """
+    Invalidates the cached feeds an article or newsletter appears in,
+    and those it appeared in before its source changed.
+    """
+    field = 'article_author' if isinstance(item, Article) else (
+        'newsletter_author')
+    author = getattr(item, field)
+    _bump_source_feed(item.independent_journalist, author)
+    was_independent = item.saved_value(
+        'independent_journalist', item.independent_journalist)
+    previous_author = item.saved_value(field, author.pk)
+    if (was_independent, previous_author) != (
+            item.independent_journalist, author.pk):
+        if previous_author != author.pk:
+            author = CustomUser.objects.filter(pk=previous_author).first()
+        if author is not None:
+            _bump_source_feed(was_independent, author)
+    # Tag feeds would need the item's tags, and personal feeds combine
+    # many sources, so each share one version
+    bump_feed_version('tag', 'all')
+    bump_feed_version('reader', 'all')
+
+
+def reader_feed_token(user):
+    """
+    Returns the signed token identifying a reader's personal feed.
+    """
+    return signing.dumps(user.pk, salt=READER_FEED_SALT)
+
+
+def _latest(articles, newsletters):
+    """
+    Returns the most recently published articles and newsletters
+    merged into one list.
+    """
+    articles = articles.select_related('article_author').defer('content')
+    newsletters = newsletters.select_related(
+        'newsletter_author').defer('content')
+    items = chain(
+        articles.order_by('-published_at')[:FEED_LENGTH],
+        newsletters.order_by('-published_at')[:FEED_LENGTH])
+    return sorted(
+        items, key=lambda item: item.published_at, reverse=True
+    )[:FEED_LENGTH]
+
+
+def _tagged(links, field, tags):
+    """
+    Returns the ids of the latest published items carrying any of the
+    given tags, read from the (tag, published_at) index of their links.
+    """
+    return list(
+        links.objects.filter(tag__in=tags, published_at__isnull=False)
+        .order_by('-published_at')
+        .values_list(f'{field}_id', flat=True)[:FEED_LENGTH])
+
+
+def _latest_tagged(tags):
+    """
+    Returns the querysets of the latest published articles and
+    newsletters carrying any of the given tags.
+    """
+    return (
+        Article.objects.filter(pk__in=_tagged(ArticleTag, 'article', tags)),
+        Newsletter.objects.filter(
+            pk__in=_tagged(NewsletterTag, 'newsletter', tags)))
+
+
+class BaseContentFeed(Feed):
+    """
+    Common item rendering of the article and newsletter feeds.
+    """
+    def item_title(self, item):
+        return item.title
+
+    def item_description(self, item):
+        return item.summary
+
+    def item_pubdate(self, item):
+        return item.published_at
+
+    def item_author_name(self, item):
+        author = item.article_author if isinstance(item, Article) else (
+            item.newsletter_author)
+        return author.username
+
+
+class PublisherFeed(BaseContentFeed):
+    """
+    RSS feed of the approved articles and newsletters of a publisher.
+    """
+    def get_object(self, request, pk):
+        return get_object_or_404(Publisher, pk=pk)
+
+    def title(self, obj):
+        return f"News app: {obj.name}"
+
+    def link(self, obj):
+        return reverse('article_list')
+
+    def description(self, obj):
+        return f"Latest articles and newsletters published by {obj.name}."
+
+    def items(self, obj):
+        return _latest(
+            Article.objects.filter(
+                editor_approved=True, independent_journalist=False,
+                article_author__publisher=obj),
+            Newsletter.objects.filter(
+                editor_approved=True, independent_journalist=False,
+                newsletter_author__publisher=obj))
+
+
+class JournalistFeed(BaseContentFeed):
+    """
+    RSS feed of the independently published articles and newsletters
+    of a journalist.
+    """
+    def get_object(self, request, pk):
+        return get_object_or_404(CustomUser, pk=pk, role='Journalist')
+
+    def title(self, obj):
+        return f"News app: {obj.username}"
+
+    def link(self, obj):
+        return reverse('article_list')
+
+    def description(self, obj):
+        return (
+            f"Latest articles and newsletters published by independent "
+            f"journalist {obj.username}.")
+
+    def items(self, obj):
+        return _latest(
+            Article.objects.filter(
+                independent_journalist=True, article_author=obj),
+            Newsletter.objects.filter(
+                independent_journalist=True, newsletter_author=obj))
+
+
+class TagFeed(BaseContentFeed):
+    """
+    RSS feed of the published articles and newsletters carrying a tag.
+    """
+    def get_object(self, request, pk):
+        return get_object_or_404(Tag, pk=pk)
+
+    def title(self, obj):
+        return f"News app: {obj.name}"
+
+    def link(self, obj):
+        return f"{reverse('article_list')}?tag={obj.slug}"
+
+    def description(self, obj):
+        return f"Latest articles and newsletters tagged {obj.name}."
+
+    def items(self, obj):
+        return _latest(*_latest_tagged([obj]))
+
+
+class ReaderFeed(BaseContentFeed):
+    """
+    Personal RSS feed of a reader's subscribed publishers and
+    journalists, identified by a signed token.
+    """
+    def get_object(self, request, token):
+        try:
+            pk = signing.loads(token, salt=READER_FEED_SALT)
+        except signing.BadSignature:
+            raise Http404("Invalid feed token.")
+        return get_object_or_404(CustomUser, pk=pk, role='Reader')
+
+    def title(self, obj):
+        return f"News app: {obj.username}'s subscriptions"
+
+    def link(self, obj):
+        return reverse('article_list')
+
+    def description(self, obj):
+        return (
+            "Latest items from your subscribed publishers, journalists "
+            "and tags.")
+
+    def items(self, obj):
+        publishers = obj.subscribed_publishers.all()
+        journalists = obj.subscribed_journalists.all()
+        tagged_articles, tagged_newsletters = _latest_tagged(
+            obj.subscribed_tags.all())
+        return _latest(
+            Article.objects.filter(
+                editor_approved=True, independent_journalist=False,
+                article_author__publisher__in=publishers)
+            | Article.objects.filter(
+                independent_journalist=True,
+                article_author__in=journalists)
+            | tagged_articles,
+            Newsletter.objects.filter(
+                editor_approved=True, independent_journalist=False,
+                newsletter_author__publisher__in=publishers)
+            | Newsletter.objects.filter(
+                independent_journalist=True,
+                newsletter_author__in=journalists)
+            | tagged_newsletters)
+
+
+class AtomPublisherFeed(PublisherFeed):
+    feed_type = Atom1Feed
+    subtitle = PublisherFeed.description
+
+
+class AtomJournalistFeed(JournalistFeed):
+    feed_type = Atom1Feed
+    subtitle = JournalistFeed.description
+
+
+class AtomTagFeed(TagFeed):
+    feed_type = Atom1Feed
+    subtitle = TagFeed.description
+
+
+class AtomReaderFeed(ReaderFeed):
+    feed_type = Atom1Feed
+    subtitle = ReaderFeed.description
+
+
+def cached_feed(feed, kind, private=False):
+    """
+    Wraps a feed so it is served from the cache until the feed version
+    of its source changes, with an ETag so unchanged feeds are answered
+    with 304 Not Modified.
+    """
+    def etag(request, **kwargs):
+        # Needed by condition() and the view, so computed once
+        if not hasattr(request, 'feed_etag'):
+            request.feed_etag = compute_etag(**kwargs)
+        return request.feed_etag
+
+    def compute_etag(**kwargs):
+        if kind == 'reader':
+            # Per-reader version changes with their subscriptions
+            try:
+                pk = signing.loads(kwargs['token'], salt=READER_FEED_SALT)
+            except signing.BadSignature:
+                return None
+            version = (
+                f"{feed_version('reader', 'all')}-"
+                f"{feed_version('reader', pk)}")
+        elif kind == 'tag':
+            pk = kwargs['pk']
+            version = feed_version('tag', 'all')
+        else:
+            pk = kwargs['pk']
+            version = feed_version(kind, pk)
+        key = f'{type(feed).__name__}:{pk}:{version}'
+        return hashlib.md5(key.encode()).hexdigest()
+
+    @condition(etag_func=etag)
+    def view(request, **kwargs):
+        cache_key = f'feed:{etag(request, **kwargs)}'
+        cached = cache.get(cache_key)
+        if cached is None:
+            response = feed(request, **kwargs)
+            cache.set(
+                cache_key, (response['Content-Type'], response.content),
+                FEED_CACHE_TIMEOUT)
+        else:
+            response = HttpResponse(cached[1], content_type=cached[0])
+        if private:
+            patch_cache_control(response, private=True, max_age=0)
+        else:
+            patch_cache_control(response, public=True, max_age=60)
+        return response
+    return view
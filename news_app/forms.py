@@ -1,5 +1,7 @@
 from django.contrib.auth.forms import UserCreationForm
 from django import forms
+from django.conf import settings
+from django.template.defaultfilters import filesizeformat
 from .models import Article, Newsletter
 from .models import CustomUser
 
@@ -21,19 +23,35 @@ class RegisterForm(UserCreationForm):
         fields = UserCreationForm.Meta.fields + ('email', 'role')
 
 
-class ArticleForm(forms.ModelForm):
+class AttachmentFormMixin:
+    """
+    Refuses images larger than the ATTACHMENT_MAX_SIZE setting. The
+    upload has already been streamed to a temporary file by then.
+    """
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        max_size = getattr(settings, 'ATTACHMENT_MAX_SIZE', 10 * 1024 * 1024)
+        if image and image.size > max_size:
+            raise forms.ValidationError(
+                f"Images can be at most {filesizeformat(max_size)}.")
+        return image
+
+
+class ArticleForm(AttachmentFormMixin, forms.ModelForm):
     """
     A form for creating and updating Article instances.
     """
     class Meta:
         model = Article
-        fields = ['title', 'content']
+        fields = ['title', 'content', 'image', 'tags']
+        widgets = {'tags': forms.CheckboxSelectMultiple}
 
 
-class NewsletterForm(forms.ModelForm):
+class NewsletterForm(AttachmentFormMixin, forms.ModelForm):
     """
     A form for creating and updating Newsletter instances.
     """
     class Meta:
         model = Newsletter
-        fields = ['title', 'content']
+        fields = ['title', 'content', 'image', 'tags']
+        widgets = {'tags': forms.CheckboxSelectMultiple}
@@ -0,0 +1,101 @@
+"""
+Archival of old articles and newsletters.
+
+Items published before a cutoff are moved in batches to the
+ArchivedArticle and ArchivedNewsletter tables, keeping their primary
+keys. The live tables and their indexes then only hold recent items
+and drafts, which is what listings, feeds and the API read. Item pages
+fall back to the archive, so old links keep working.
+
+Each batch is copied and deleted in one transaction. The live rows are
+deleted without signals: the receivers would delete the revision
+history the archived item keeps, and the caches they invalidate are
+invalidated once per batch instead.
+"""
+
+from collections import defaultdict
+from django.db import transaction
+from ..feeds import bump_feed_version
+from ..models import Article, ArchivedArticle, ArchivedNewsletter
+from ..models import ContentStats
+from .tags import bump_facet_version, tag_links
+
+
+def archive_model(model):
+    """Returns the archive model of the Article or Newsletter model."""
+    return ArchivedArticle if model is Article else ArchivedNewsletter
+
+
+def author_field(model):
+    """Returns the name of the author field of an item model."""
+    return 'article_author' if model is Article else 'newsletter_author'
+
+
+def archive_items(model, before, batch_size=1000):
+    """
+    Moves the articles or newsletters published before a datetime to
+    their archive table, batch_size items per transaction. Returns the
+    number of items moved.
+    """
+    moved = 0
+    while True:
+        with transaction.atomic():
+            count = _archive_batch(model, before, batch_size)
+        if not count:
+            return moved
+        moved += count
+
+
+def _archive_batch(model, before, batch_size):
+    """Moves one batch of items to the archive and returns its size."""
+    author = author_field(model)
+    # Locks the batch, so it is not edited while it is copied
+    pks = list(
+        model.objects.select_for_update().filter(published_at__lt=before)
+        .order_by('published_at', 'pk').values_list('pk', flat=True)
+        [:batch_size])
+    if not pks:
+        return 0
+    items = list(
+        model.objects.filter(pk__in=pks).select_related(author))
+    links, field = tag_links(model)
+    tags = defaultdict(list)
+    for item_id, tag_id in links.objects.filter(
+            **{f'{field}_id__in': pks}).values_list(f'{field}_id', 'tag_id'):
+        tags[item_id].append(tag_id)
+
+    archive_model(model).objects.bulk_create(
+        archive_model(model)(
+            id=item.pk, title=item.title, content=item.content,
+            summary=item.summary, editor_approved=item.editor_approved,
+            independent_journalist=item.independent_journalist,
+            published_at=item.published_at, image=item.image.name,
+            thumbnail=item.thumbnail.name, tag_ids=tags[item.pk],
+            **{f'{author}_id': getattr(item, f'{author}_id')})
+        for item in items)
+    links.objects.filter(**{f'{field}_id__in': pks})._raw_delete(
+        links.objects.db)
+    model.objects.filter(pk__in=pks)._raw_delete(model.objects.db)
+    # Archived items are no longer counted or listed as trending
+    ContentStats.objects.filter(
+        kind=ContentStats.ARTICLE if model is Article
+        else ContentStats.NEWSLETTER, object_id__in=pks).delete()
+
+    # The feeds the items may still appear in
+    sources = set()
+    for item in items:
+        user = getattr(item, author)
+        if item.independent_journalist:
+            sources.add(('journalist', user.pk))
+        elif user.publisher_id:
+            sources.add(('publisher', user.publisher_id))
+    sources |= {('tag', 'all'), ('reader', 'all')}
+    transaction.on_commit(lambda: _invalidate(sources))
+    return len(items)
+
+
+def _invalidate(sources):
+    """Invalidates the feeds of the given sources and the tag facets."""
+    for kind, pk in sources:
+        bump_feed_version(kind, pk)
+    bump_facet_version()
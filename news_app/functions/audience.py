@@ -0,0 +1,183 @@
+"""
+Subscriber sets of publishers, journalists and tags, for working out
+whom to notify.
+
+The subscribers of each source are kept as a ReaderSet: a sorted array
+of reader ids, or a bitset indexed by reader id once that is smaller.
+Each set is built from its through table with one indexed query, kept
+in the cache and dropped when the subscriptions of its source change,
+so unions and intersections across sources run without any query.
+"""
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from ..models import CustomUser
+
+JOURNALIST = 'journalist'
+PUBLISHER = 'publisher'
+TAG = 'tag'
+
+
+class ReaderSet:
+    """
+    Immutable set of reader ids, stored as a sorted uint32 array or as
+    a bitset, whichever is smaller.
+    """
+    __slots__ = ('ids', 'bits')
+
+    def __init__(self, ids=None, bits=None):
+        self.ids = ids
+        self.bits = bits
+
+    @classmethod
+    def from_ids(cls, ids):
+        """Returns the set of the given reader ids."""
+        ids = np.unique(np.asarray(ids, np.uint32))
+        # A bitset takes one bit per possible id, an array 32 per id
+        if len(ids) and len(ids) * 32 > int(ids[-1]) + 1:
+            bits = np.zeros(int(ids[-1]) + 1, bool)
+            bits[ids] = True
+            return cls(bits=np.packbits(bits, bitorder='little'))
+        return cls(ids=ids)
+
+    def _bitset(self, size):
+        """Returns the set as a packed bitset of size bytes."""
+        if self.bits is not None:
+            bits = self.bits[:size]
+        else:
+            bits = np.zeros(size * 8, bool)
+            bits[self.ids[self.ids < size * 8]] = True
+            bits = np.packbits(bits, bitorder='little')
+        return np.pad(bits, (0, size - len(bits)))
+
+    def _contains(self, ids):
+        """Returns a mask of which of the given ids are in a bitset."""
+        inside = ids < len(self.bits) * 8
+        mask = np.zeros(len(ids), bool)
+        mask[inside] = (
+            self.bits[ids[inside] >> 3] >> (ids[inside] & 7).astype(np.uint8)
+        ) & 1 == 1
+        return mask
+
+    def _size(self):
+        if self.bits is not None:
+            return len(self.bits)
+        return (int(self.ids[-1]) >> 3) + 1 if len(self.ids) else 0
+
+    def to_ids(self):
+        """Returns the reader ids of the set as a sorted array."""
+        if self.ids is not None:
+            return self.ids
+        return np.flatnonzero(
+            np.unpackbits(self.bits, bitorder='little')).astype(np.uint32)
+
+    def __or__(self, other):
+        if self.ids is not None and other.ids is not None:
+            return ReaderSet.from_ids(np.union1d(self.ids, other.ids))
+        size = max(self._size(), other._size())
+        return ReaderSet(bits=self._bitset(size) | other._bitset(size))
+
+    def __and__(self, other):
+        if self.ids is not None and other.ids is not None:
+            return ReaderSet(ids=np.intersect1d(self.ids, other.ids))
+        if self.ids is not None:
+            return ReaderSet(ids=self.ids[other._contains(self.ids)])
+        if other.ids is not None:
+            return ReaderSet(ids=other.ids[self._contains(other.ids)])
+        size = min(self._size(), other._size())
+        return ReaderSet(bits=self._bitset(size) & other._bitset(size))
+
+    def __sub__(self, other):
+        if self.ids is not None:
+            if other.ids is not None:
+                return ReaderSet(ids=np.setdiff1d(self.ids, other.ids))
+            return ReaderSet(ids=self.ids[~other._contains(self.ids)])
+        return ReaderSet(
+            bits=self.bits & ~other._bitset(len(self.bits)))
+
+    def __len__(self):
+        if self.ids is not None:
+            return len(self.ids)
+        return int(np.bitwise_count(self.bits).sum())
+
+    def __iter__(self):
+        return iter(self.to_ids().tolist())
+
+    def __contains__(self, reader_id):
+        if self.ids is not None:
+            index = np.searchsorted(self.ids, reader_id)
+            return index < len(self.ids) and self.ids[index] == reader_id
+        return bool(self._contains(np.array([reader_id], np.uint32))[0])
+
+
+def _cache_key(kind, pk):
+    return f'audience:{kind}:{pk}'
+
+
+def _load(kind, pk):
+    """Builds the subscriber set of a source from its through table."""
+    if kind == JOURNALIST:
+        rows = CustomUser.subscribed_journalists.through.objects.filter(
+            to_customuser_id=pk).values_list('from_customuser_id', flat=True)
+    elif kind == TAG:
+        rows = CustomUser.subscribed_tags.through.objects.filter(
+            tag_id=pk).values_list('customuser_id', flat=True)
+    else:
+        rows = CustomUser.subscribed_publishers.through.objects.filter(
+            publisher_id=pk).values_list('customuser_id', flat=True)
+    return ReaderSet.from_ids(
+        np.fromiter(rows.iterator(chunk_size=10000), np.uint32))
+
+
+def subscribers(sources):
+    """
+    Returns the subscriber sets of (kind, pk) sources as a dict, from
+    the cache where possible.
+    """
+    sources = list(sources)
+    keys = {source: _cache_key(*source) for source in sources}
+    cached = cache.get_many(keys.values())
+    sets, missing = {}, {}
+    for source, key in keys.items():
+        if key in cached:
+            sets[source] = cached[key]
+        else:
+            sets[source] = missing[key] = _load(*source)
+    if missing:
+        cache.set_many(
+            missing, getattr(settings, 'AUDIENCE_CACHE_TIMEOUT', 24 * 3600))
+    return sets
+
+
+def audience(publishers=(), journalists=(), tags=()):
+    """
+    Returns the readers subscribed to any of the given publishers,
+    journalists or tags, each once.
+    """
+    sets = subscribers(
+        [(PUBLISHER, getattr(p, 'pk', p)) for p in publishers]
+        + [(JOURNALIST, getattr(j, 'pk', j)) for j in journalists]
+        + [(TAG, getattr(t, 'pk', t)) for t in tags])
+    result = ReaderSet(ids=np.empty(0, np.uint32))
+    for readers in sets.values():
+        result = result | readers
+    return result
+
+
+def invalidate(kind, pks):
+    """Drops the cached subscriber sets of sources."""
+    cache.delete_many([_cache_key(kind, pk) for pk in pks])
+
+
+def recipient_emails(readers, chunk_size=1000):
+    """
+    Yields the email addresses of the readers in a set who get
+    immediate notifications, querying chunk_size readers at a time.
+    """
+    ids = readers.to_ids().tolist()
+    for start in range(0, len(ids), chunk_size):
+        yield from CustomUser.objects.filter(
+            pk__in=ids[start:start + chunk_size],
+            digest_frequency='immediate',
+        ).exclude(email='').values_list('email', flat=True)
@@ -0,0 +1,290 @@
+import json
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+import django
+from django.apps import apps
+from django.core.mail import EmailMessage, get_connection
+from django.db import connections
+from django.db.models import F, Q
+from django.template.loader import get_template
+
+# Time between two digests of each frequency.
+DIGEST_PERIODS = {
+    'daily': timedelta(days=1),
+    'weekly': timedelta(days=7),
+}
+# Readers are considered due slightly early so a nightly job that runs
+# a little earlier than the previous night doesn't skip them.
+DIGEST_GRACE = timedelta(hours=1)
+
+
+@lru_cache(maxsize=None)
+def digest_template():
+    """
+    Returns the compiled reader digest template, loaded once per
+    process.
+    """
+    return get_template('news_app/reader_digest_email.html')
+
+
+def due_readers(frequency, run_started):
+    """
+    Returns a queryset of readers on the given digest frequency that
+    are due a digest at run_started.
+    """
+    CustomUser = apps.get_model('news_app', 'CustomUser')
+    cutoff = run_started - DIGEST_PERIODS[frequency] + DIGEST_GRACE
+    return CustomUser.objects.filter(
+        Q(last_digest_sent__isnull=True) | Q(last_digest_sent__lte=cutoff),
+        role='Reader', digest_frequency=frequency,
+    ).exclude(email='')
+
+
+def iter_chunks(frequency, run_started, chunk_size, after_id=0):
+    """
+    Streams the ids of due readers in id order and yields (first_id,
+    last_id) bounds of chunks holding at most chunk_size readers.
+    """
+    ids = (
+        due_readers(frequency, run_started)
+        .filter(id__gt=after_id).order_by('id')
+        .values_list('id', flat=True).iterator(chunk_size=chunk_size))
+    chunk = []
+    for reader_id in ids:
+        chunk.append(reader_id)
+        if len(chunk) == chunk_size:
+            yield chunk[0], chunk[-1]
+            chunk = []
+    if chunk:
+        yield chunk[0], chunk[-1]
+
+
+def _load_items(model, author_field, publisher_ids, journalist_ids, tag_ids,
+                since, until):
+    """
+    Returns the items of a model published between since and until by
+    the given publishers (approved) or journalists (independent), or
+    carrying one of the given tags. Each item lists the ids of those of
+    the tags it carries.
+    """
+    field = model._meta.model_name
+    links = model.tags.through
+    items = model.objects.filter(
+        Q(editor_approved=True, independent_journalist=False,
+          **{f'{author_field}__publisher__in': publisher_ids})
+        | Q(independent_journalist=True,
+            **{f'{author_field}__in': journalist_ids})
+        | Q(pk__in=links.objects.filter(
+            tag__in=tag_ids, published_at__gt=since,
+            published_at__lte=until).values(f'{field}_id')),
+        published_at__gt=since, published_at__lte=until,
+    ).annotate(
+        author_name=F(f'{author_field}__username'),
+        publisher_id=F(f'{author_field}__publisher_id'),
+        publisher_name=F(f'{author_field}__publisher__name'),
+    ).values(
+        'id', 'title', 'summary', 'published_at', 'independent_journalist',
+        'author_name', 'publisher_id', 'publisher_name',
+        author_id=F(author_field))
+    items = list(items.order_by('published_at'))
+
+    tags = defaultdict(set)
+    if tag_ids and items:
+        for item_id, tag_id in links.objects.filter(
+                **{f'{field}__in': [item['id'] for item in items]},
+                tag__in=tag_ids).values_list(f'{field}_id', 'tag_id'):
+            tags[item_id].add(tag_id)
+    for item in items:
+        item['tag_ids'] = tags[item['id']]
+    return items
+
+
+def _matches(item, publisher_ids, journalist_ids, tag_ids, since):
+    """
+    Returns whether an item belongs in a reader's digest.
+    """
+    if since is not None and item['published_at'] <= since:
+        return False
+    if item['tag_ids'] & tag_ids:
+        return True
+    if item['independent_journalist']:
+        return item['author_id'] in journalist_ids
+    return item['publisher_id'] in publisher_ids
+
+
+def send_chunk(frequency, run_started, first_id, last_id):
+    """
+    Builds and sends the digests for the due readers with ids between
+    first_id and last_id, then records the run time as their last
+    digest. Returns the number of emails sent.
+    """
+    CustomUser = apps.get_model('news_app', 'CustomUser')
+    Article = apps.get_model('news_app', 'Article')
+    Newsletter = apps.get_model('news_app', 'Newsletter')
+
+    readers = list(
+        due_readers(frequency, run_started)
+        .filter(id__gte=first_id, id__lte=last_id)
+        .only('id', 'username', 'email', 'last_digest_sent'))
+    if not readers:
+        return 0
+    reader_ids = [reader.id for reader in readers]
+
+    # Load the subscriptions of the whole chunk from the through tables
+    publishers = defaultdict(set)
+    journalists = defaultdict(set)
+    tags = defaultdict(set)
+    publisher_through = CustomUser.subscribed_publishers.through
+    journalist_through = CustomUser.subscribed_journalists.through
+    tag_through = CustomUser.subscribed_tags.through
+    for reader_id, publisher_id in publisher_through.objects.filter(
+            customuser_id__in=reader_ids).values_list(
+            'customuser_id', 'publisher_id'):
+        publishers[reader_id].add(publisher_id)
+    for reader_id, journalist_id in journalist_through.objects.filter(
+            from_customuser_id__in=reader_ids).values_list(
+            'from_customuser_id', 'to_customuser_id'):
+        journalists[reader_id].add(journalist_id)
+    for reader_id, tag_id in tag_through.objects.filter(
+            customuser_id__in=reader_ids).values_list(
+            'customuser_id', 'tag_id'):
+        tags[reader_id].add(tag_id)
+
+    # Fetch every candidate item once for the chunk
+    default_since = run_started - DIGEST_PERIODS[frequency]
+    since = min(
+        reader.last_digest_sent or default_since for reader in readers)
+    all_publishers = set().union(*publishers.values())
+    all_journalists = set().union(*journalists.values())
+    all_tags = set().union(*tags.values())
+    articles = _load_items(
+        Article, 'article_author', all_publishers, all_journalists,
+        all_tags, since, run_started)
+    newsletters = _load_items(
+        Newsletter, 'newsletter_author', all_publishers, all_journalists,
+        all_tags, since, run_started)
+
+    template = digest_template()
+    subject = f"Your {frequency} News app digest"
+    emails = []
+    for reader in readers:
+        reader_since = reader.last_digest_sent or default_since
+        args = (
+            publishers[reader.id], journalists[reader.id], tags[reader.id],
+            reader_since)
+        reader_articles = [a for a in articles if _matches(a, *args)]
+        reader_newsletters = [n for n in newsletters if _matches(n, *args)]
+        if not reader_articles and not reader_newsletters:
+            continue
+        message = template.render({
+            'reader': reader,
+            'frequency': frequency,
+            'articles': reader_articles,
+            'newsletters': reader_newsletters,
+        })
+        emails.append(EmailMessage(subject, message, to=[reader.email]))
+
+    sent = 0
+    if emails:
+        # Send the whole chunk over one pooled connection
+        with get_connection() as connection:
+            sent = connection.send_messages(emails) or 0
+
+    CustomUser.objects.filter(id__in=reader_ids).update(
+        last_digest_sent=run_started)
+    return sent
+
+
+def _init_worker():
+    """
+    Prepares a worker process of the digest process pool.
+    """
+    if not apps.ready:
+        django.setup()
+
+
+def _send_chunk_task(args):
+    """
+    Process pool entry point for send_chunk.
+    """
+    return send_chunk(*args)
+
+
+class Checkpoint:
+    """
+    Persists the progress of a digest run so an interrupted run can be
+    resumed from the last completed chunk.
+    """
+    def __init__(self, path, frequency):
+        self.path = Path(path)
+        self.frequency = frequency
+        self.run_started = None
+        self.last_id = 0
+
+    def load(self):
+        """Loads the progress of an unfinished run, if any."""
+        if not self.path.exists():
+            return False
+        state = json.loads(self.path.read_text())
+        if state.get('frequency') != self.frequency:
+            return False
+        self.run_started = datetime.fromisoformat(state['run_started'])
+        self.last_id = state['last_id']
+        return True
+
+    def save(self):
+        """Writes the current progress atomically."""
+        tmp_path = self.path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps({
+            'frequency': self.frequency,
+            'run_started': self.run_started.isoformat(),
+            'last_id': self.last_id,
+        }))
+        tmp_path.replace(self.path)
+
+    def clear(self):
+        """Removes the checkpoint once a run has completed."""
+        self.path.unlink(missing_ok=True)
+
+
+def run_digests(frequency, run_started, checkpoint, chunk_size=1000,
+                workers=1):
+    """
+    Sends the digests of every due reader in id ordered chunks,
+    advancing the checkpoint after each completed chunk. Chunks are
+    spread over a process pool when workers is greater than one.
+    Returns the number of emails sent.
+    """
+    if checkpoint.load():
+        run_started = checkpoint.run_started
+    else:
+        checkpoint.run_started = run_started
+    chunks = (
+        (frequency, run_started, first_id, last_id)
+        for first_id, last_id in iter_chunks(
+            frequency, run_started, chunk_size, checkpoint.last_id))
+
+    sent = 0
+    if workers > 1:
+        # Forked workers must not share the parent's DB connections
+        chunks = list(chunks)
+        connections.close_all()
+        with ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker) as pool:
+            # Results come back in chunk order so the checkpoint only
+            # ever covers fully sent chunks
+            for args, count in zip(chunks, pool.map(_send_chunk_task, chunks)):
+                sent += count
+                checkpoint.last_id = args[3]
+                checkpoint.save()
+    else:
+        for args in chunks:
+            sent += send_chunk(*args)
+            checkpoint.last_id = args[3]
+            checkpoint.save()
+
+    checkpoint.clear()
+    return sent
@@ -0,0 +1,279 @@
+import asyncio
+import json
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from functools import lru_cache
+from itertools import chain
+from threading import Lock
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Seconds between heartbeat comments sent on idle connections.
+HEARTBEAT_SECONDS = getattr(settings, 'SSE_HEARTBEAT_SECONDS', 15)
+# Seconds between two queries of the database polling backend.
+POLL_SECONDS = getattr(settings, 'SSE_POLL_SECONDS', 5)
+# Maximum number of open event streams per process and per user.
+MAX_CONNECTIONS = getattr(settings, 'SSE_MAX_CONNECTIONS', 1000)
+MAX_CONNECTIONS_PER_USER = getattr(
+    settings, 'SSE_MAX_CONNECTIONS_PER_USER', 3)
+# Maximum number of undelivered events buffered per connection.
+QUEUE_SIZE = getattr(settings, 'SSE_QUEUE_SIZE', 100)
+# Maximum number of missed events replayed on reconnection.
+REPLAY_LIMIT = getattr(settings, 'SSE_REPLAY_LIMIT', 100)
+
+
+class TooManyConnections(Exception):
+    """Raised when an event stream would exceed a connection limit."""
+
+
+def _event_key(event_id):
+    """
+    Parses an event id of the form '<microseconds>-<type>-<pk>' into a
+    sortable key, or returns None for a malformed id.
+    """
+    try:
+        timestamp, kind, pk = event_id.split('-')
+        return int(timestamp), kind, int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+def make_event(item):
+    """
+    Returns the event announcing that an article or newsletter became
+    visible to readers.
+    """
+    kind = 'article' if item._meta.model_name == 'article' else 'newsletter'
+    author = getattr(item, f'{kind}_author')
+    timestamp = int(item.published_at.timestamp() * 1_000_000)
+    return {
+        'id': f'{timestamp}-{kind}-{item.pk}',
+        'type': kind,
+        'pk': item.pk,
+        'title': item.title,
+        # Routing fields, not sent to clients
+        'author_id': author.pk,
+        'publisher_id': author.publisher_id,
+        'independent': item.independent_journalist,
+    }
+
+
+def events_since(event_id, limit=REPLAY_LIMIT):
+    """
+    Returns the events of the items published after the given event
+    id, oldest first.
+    """
+    key = _event_key(event_id)
+    if key is None:
+        return []
+    since = datetime.fromtimestamp(key[0] / 1_000_000, tz=dt_timezone.utc)
+    items = []
+    for model_name, author_field in (
+            ('Article', 'article_author'),
+            ('Newsletter', 'newsletter_author')):
+        model = apps.get_model('news_app', model_name)
+        items.append(
+            model.objects.filter(published_at__gte=since)
+            .select_related(author_field).defer('content')
+            .order_by('published_at')[:limit])
+    events = sorted(
+        (make_event(item) for item in chain(*items)),
+        key=lambda event: _event_key(event['id']))
+    return [e for e in events if _event_key(e['id']) > key][:limit]
+
+
+class InProcessBackend:
+    """
+    Delivers events published in this process to the event streams
+    open in this process. Suitable for a single server process.
+    """
+    def __init__(self):
+        self._queues = {}
+        self._lock = Lock()
+
+    def subscribe(self):
+        """Registers and returns the event queue of a new stream."""
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        with self._lock:
+            self._queues[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, queue):
+        """Removes the event queue of a closed stream."""
+        with self._lock:
+            self._queues.pop(queue, None)
+
+    def publish(self, event):
+        """Sends an event to every open stream. Thread safe."""
+        with self._lock:
+            subscribers = list(self._queues.items())
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, event)
+            except RuntimeError:
+                # The stream's event loop has already been closed
+                self.unsubscribe(queue)
+
+    @staticmethod
+    def _put(queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow clients miss events; they can resume with
+            # Last-Event-ID after reconnecting
+            pass
+
+
+class DatabasePollingBackend(InProcessBackend):
+    """
+    Finds new events by polling the content tables, so events reach
+    streams in every server process without an external service. One
+    query per poll interval is shared by all streams of a process.
+    """
+    def __init__(self):
+        super().__init__()
+        self._poller = None
+        self._last_id = None
+
+    def subscribe(self):
+        queue = super().subscribe()
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.get_running_loop().create_task(
+                self._poll())
+        return queue
+
+    def publish(self, event):
+        # Events are picked up by the poller instead
+        pass
+
+    async def _poll(self):
+        if self._last_id is None:
+            now = datetime.now(dt_timezone.utc)
+            self._last_id = f'{int(now.timestamp() * 1_000_000)}-poll-0'
+        while self._queues:
+            await asyncio.sleep(POLL_SECONDS)
+            events = await sync_to_async(events_since)(self._last_id)
+            for event in events:
+                super().publish(event)
+                self._last_id = event['id']
+
+
+class EventBroker:
+    """
+    Opens Server-Sent Events streams of readers on top of a pluggable
+    backend, enforcing the connection limits.
+    """
+    def __init__(self, backend):
+        self.backend = backend
+        self.connections = Counter()
+        self._lock = Lock()
+
+    def publish(self, event):
+        """Publishes an event to the connected readers."""
+        self.backend.publish(event)
+
+    def open(self, user, publisher_ids, journalist_ids, last_event_id=None):
+        """
+        Reserves a connection for the user and returns their event
+        stream. Raises TooManyConnections when a limit is reached.
+        """
+        with self._lock:
+            if sum(self.connections.values()) >= MAX_CONNECTIONS:
+                raise TooManyConnections("Too many open event streams.")
+            if self.connections[user.pk] >= MAX_CONNECTIONS_PER_USER:
+                raise TooManyConnections(
+                    "Too many open event streams for this user.")
+            self.connections[user.pk] += 1
+        return EventStream(
+            self, user.pk, set(publisher_ids), set(journalist_ids),
+            last_event_id)
+
+    def release(self, user_pk):
+        """Frees a connection reserved by open()."""
+        with self._lock:
+            self.connections[user_pk] -= 1
+            if self.connections[user_pk] <= 0:
+                del self.connections[user_pk]
+
+
+class EventStream:
+    """
+    The event stream of one reader, formatted as Server-Sent Events.
+    Its connection is released when the response is closed.
+    """
+    def __init__(self, broker, user_pk, publisher_ids, journalist_ids,
+                 last_event_id):
+        self.broker = broker
+        self.user_pk = user_pk
+        self.publisher_ids = publisher_ids
+        self.journalist_ids = journalist_ids
+        self.last_event_id = last_event_id
+        self._closed = False
+
+    def is_visible(self, event):
+        """Returns whether an event concerns the reader's sources."""
+        if event['independent']:
+            return event['author_id'] in self.journalist_ids
+        return event['publisher_id'] in self.publisher_ids
+
+    @staticmethod
+    def format(event):
+        data = json.dumps({
+            'id': event['pk'], 'type': event['type'],
+            'title': event['title']})
+        return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
+
+    def __aiter__(self):
+        return self._stream()
+
+    async def _stream(self):
+        backend = self.broker.backend
+        queue = backend.subscribe()
+        last_key = _event_key(self.last_event_id)
+        try:
+            yield f"retry: {HEARTBEAT_SECONDS * 1000}\n\n"
+            # Replay events missed while the client was disconnected
+            if last_key is not None:
+                missed = await sync_to_async(events_since)(
+                    self.last_event_id)
+                for event in missed:
+                    last_key = _event_key(event['id'])
+                    if self.is_visible(event):
+                        yield self.format(event)
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                # Skip live events that were already replayed
+                if last_key is not None and (
+                        _event_key(event['id']) <= last_key):
+                    continue
+                if self.is_visible(event):
+                    yield self.format(event)
+        finally:
+            backend.unsubscribe(queue)
+            self.close()
+
+    def close(self):
+        """Releases the stream's connection. Safe to call twice."""
+        if not self._closed:
+            self._closed = True
+            self.broker.release(self.user_pk)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    """
+    Returns the event broker of this process, using the backend class
+    named by the SSE_BACKEND setting.
+    """
+    backend_path = getattr(
+        settings, 'SSE_BACKEND',
+        'news_app.functions.events.InProcessBackend')
+    return EventBroker(import_string(backend_path)())
@@ -0,0 +1,210 @@
+"""
+Image attachments of articles and newsletters.
+
+Images are kept in the 'attachments' storage. Their thumbnails are
+rendered by a pool of THUMBNAIL_WORKERS processes once the item is
+committed, so neither the request that uploaded the image nor the other
+threads of its process wait for Pillow. A worker only receives the
+image bytes; the result is stored and recorded by a callback thread of
+this process.
+
+serve_file() streams stored files with ETag and Last-Modified
+validators and answers single byte range requests, so clients can
+resume downloads and revalidate cached images.
+"""
+
+import mimetypes
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from threading import Lock
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from ..log import count_event
+from ..storage import attachment_storage
+from .thumbnails import render_thumbnail
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+_pool = None
+_pool_lock = Lock()
+
+
+def thumbnail_name(image_name):
+    """Returns the storage name of the thumbnail of an image."""
+    return f'thumbnails/{image_name}.jpg'
+
+
+def get_pool():
+    """
+    Returns the thumbnail process pool of this process, or None when
+    THUMBNAIL_WORKERS is 0.
+    """
+    global _pool
+    workers = getattr(settings, 'THUMBNAIL_WORKERS', 2)
+    if not workers:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # Forking a process with running threads can deadlock the
+            # child, so workers are started afresh
+            _pool = ProcessPoolExecutor(
+                workers, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _reset_pool(pool):
+    """Drops a broken pool so the next thumbnail starts a new one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+
+
+def schedule_thumbnail(model, pk, image_name):
+    """
+    Renders the thumbnail of the image of an article or newsletter in
+    the process pool and records it on the item when done.
+    """
+    with attachment_storage().open(image_name, 'rb') as image:
+        data = image.read()
+    size = tuple(getattr(settings, 'THUMBNAIL_SIZE', (320, 320)))
+    pool = get_pool()
+    if pool is None:
+        store_thumbnail(model, pk, image_name, render_thumbnail(data, size))
+        return
+    try:
+        future = pool.submit(render_thumbnail, data, size)
+    except BrokenProcessPool:
+        # A worker died; the next image gets a new pool
+        _reset_pool(pool)
+        count_event('thumbnail_failed', item=f'{model.__name__}:{pk}')
+        return
+    future.add_done_callback(
+        partial(_rendered, pool, model, pk, image_name))
+
+
+def _rendered(pool, model, pk, image_name, future):
+    """Stores a thumbnail rendered by the pool."""
+    try:
+        store_thumbnail(model, pk, image_name, future.result())
+    except Exception as e:
+        if isinstance(e, BrokenProcessPool):
+            _reset_pool(pool)
+        count_event(
+            'thumbnail_failed', item=f'{model.__name__}:{pk}', error=str(e))
+    finally:
+        # Callbacks run in a thread of the pool, which would keep its
+        # connection open otherwise
+        connections.close_all()
+
+
+def store_thumbnail(model, pk, image_name, data):
+    """
+    Stores the rendered thumbnail of an image and records it on its
+    article or newsletter, unless the image has been replaced since.
+    """
+    storage = attachment_storage()
+    name = thumbnail_name(image_name)
+    if storage.exists(name):
+        storage.delete(name)
+    name = storage.save(name, ContentFile(data))
+    if not model.objects.filter(pk=pk, image=image_name).update(
+            thumbnail=name):
+        storage.delete(name)
+
+
+def parse_range(header, size):
+    """
+    Returns the first and last byte of the single byte range of a
+    Range header, None when the header should be ignored, or False when
+    the range lies outside a file of size bytes.
+    """
+    match = RANGE_RE.match(header.strip())
+    if match is None or match.groups() == ('', ''):
+        # Multiple ranges are allowed to be answered in full
+        return None
+    first, last = match.groups()
+    if not first:
+        # The last n bytes
+        if int(last) == 0:
+            return False
+        return max(size - int(last), 0), size - 1
+    first = int(first)
+    if first >= size:
+        return False
+    last = int(last) if last else size - 1
+    if last < first:
+        return None
+    last = min(last, size - 1)
+    return first, last
+
+
+class RangeFile:
+    """File-like reader of the next length bytes of an open file."""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def serve_file(request, storage, name):
+    """
+    Returns a response streaming a stored file. Answers conditional
+    requests with 304 Not Modified and single byte range requests with
+    206 Partial Content.
+    """
+    try:
+        size = storage.size(name)
+        modified = storage.get_modified_time(name)
+    except FileNotFoundError:
+        raise Http404("No such file.")
+    etag = f'"{size:x}-{int(modified.timestamp() * 1000000):x}"'
+    last_modified = int(modified.timestamp())
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+
+    if response is None:
+        content_type = (
+            mimetypes.guess_type(name)[0] or 'application/octet-stream')
+        byte_range = None
+        # A range of an older version of the file is useless
+        if_range = request.headers.get('If-Range')
+        if 'Range' in request.headers and if_range in (None, etag):
+            byte_range = parse_range(request.headers['Range'], size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        file = storage.open(name, 'rb')
+        if byte_range is None:
+            response = FileResponse(file, content_type=content_type)
+            response['Content-Length'] = size
+        else:
+            first, last = byte_range
+            file.seek(first)
+            response = FileResponse(
+                RangeFile(file, last - first + 1), status=206,
+                content_type=content_type)
+            response['Content-Range'] = f'bytes {first}-{last}/{size}'
+            response['Content-Length'] = last - first + 1
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
@@ -0,0 +1,87 @@
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+from ..models import ArticleTag, NewsletterTag
+from .audience import audience, recipient_emails
+from .tweet import Tweet
+
+
+def send_emails(subject, message, recipients, batch_size=1000):
+    """
+    Sends one email per address in recipients over a single mail
+    connection, batch_size emails at a time. Returns the number of
+    emails sent.
+    """
+    sent, batch = 0, []
+    with get_connection() as connection:
+        for email in recipients:
+            batch.append(EmailMessage(
+                subject, message, to=[email], connection=connection))
+            if len(batch) == batch_size:
+                sent += connection.send_messages(batch) or 0
+                batch = []
+        if batch:
+            sent += connection.send_messages(batch) or 0
+    return sent
+
+
+def notify_subscribers(subject, message, publishers=(), journalists=(),
+                       tags=()):
+    """
+    Emails everyone subscribed to any of the given publishers,
+    journalists or tags and notified immediately, once each, however
+    many of the sources they follow. Returns the number of emails sent.
+    """
+    readers = audience(publishers, journalists, tags)
+    if not readers:
+        return 0
+    return send_emails(subject, message, recipient_emails(readers))
+
+
+def send_publisher_digest(publisher, articles, newsletters):
+    """
+    Emails every subscriber of a publisher, of the authors of the items
+    or of their tags a single digest listing the given newly approved
+    articles and newsletters.
+
+    The digest is rendered once and all messages are sent over one
+    mail connection. Returns the number of emails sent.
+    """
+    if not articles and not newsletters:
+        return 0
+
+    authors = {
+        getattr(item, 'article_author_id', None)
+        or getattr(item, 'newsletter_author_id', None)
+        for item in list(articles) + list(newsletters)}
+    tags = set(ArticleTag.objects.filter(
+        article__in=articles).values_list('tag_id', flat=True))
+    tags.update(NewsletterTag.objects.filter(
+        newsletter__in=newsletters).values_list('tag_id', flat=True))
+    readers = audience([publisher], authors, tags)
+    if not readers:
+        return 0
+
+    count = len(articles) + len(newsletters)
+    subject = f"{count} new item(s) published by {publisher.name}"
+    message = render_to_string(
+        'news_app/digest_email.html',
+        {
+         'publisher': publisher,
+         'articles': articles,
+         'newsletters': newsletters,
+        })
+
+    # Readers on a daily or weekly digest get the items in their digest
+    return send_emails(subject, message, recipient_emails(readers))
+
+
+def tweet_publisher_digest(publisher, articles, newsletters):
+    """
+    Posts a single tweet announcing a batch of newly approved items of
+    a publisher.
+    """
+    titles = [item.title for item in list(articles) + list(newsletters)]
+    tweet_text = (
+        f'{len(titles)} new item(s) from {publisher.name}:\n'
+        + '\n'.join(titles))
+    Tweet().make_tweet({"text": tweet_text})
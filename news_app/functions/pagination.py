@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def table_row_estimate(model, using='default'):
+    """
+    Returns the number of rows of a model's table according to the
+    database's table statistics, or None when the database keeps no
+    such statistics. Reading them doesn't scan the table.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'mysql':
+        sql = (
+            "SELECT table_rows FROM information_schema.tables "
+            "WHERE table_schema = DATABASE() AND table_name = %s")
+    elif connection.vendor == 'postgresql':
+        sql = "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass"
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [table])
+        row = cursor.fetchone()
+    # PostgreSQL reports -1 for tables that were never analysed
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that counts an unfiltered table from the table statistics
+    once they report more than ADMIN_ESTIMATED_COUNT_THRESHOLD rows, as
+    an exact COUNT(*) then reads the whole table. Filtered querysets and
+    smaller tables are counted exactly.
+    """
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+        if query is not None and not query.where and not query.distinct:
+            estimate = table_row_estimate(queryset.model, queryset.db)
+            threshold = getattr(
+                settings, 'ADMIN_ESTIMATED_COUNT_THRESHOLD', 100000)
+            if estimate is not None and estimate > threshold:
+                return estimate
+        return super().count
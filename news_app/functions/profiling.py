@@ -0,0 +1,165 @@
+import cProfile
+import io
+import json
+import pstats
+import time
+from contextlib import ExitStack
+from pathlib import Path
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+
+# Salt of the signed tokens requesting a profile with the X-Profile
+# header.
+PROFILE_TOKEN_SALT = 'news_app.profiling'
+
+
+def profile_dir():
+    """Returns the directory the profiles are written to."""
+    return Path(getattr(
+        settings, 'PROFILING_DIR', Path(settings.BASE_DIR) / 'profiles'))
+
+
+def make_profile_token():
+    """
+    Returns a signed token that requests a profile of any request
+    sending it in the X-Profile header, until it expires.
+    """
+    return signing.dumps('profile', salt=PROFILE_TOKEN_SALT)
+
+
+def check_profile_token(token):
+    """Returns whether a profile token is valid and unexpired."""
+    max_age = getattr(settings, 'PROFILING_TOKEN_MAX_AGE', 60 * 60)
+    try:
+        signing.loads(token, salt=PROFILE_TOKEN_SALT, max_age=max_age)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+class SQLTimeline:
+    """
+    Records the start offset, duration and SQL of every query run on
+    any database connection of this thread while active.
+    """
+    def __init__(self, started):
+        self.started = started
+        self.queries = []
+        self._stack = ExitStack()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            end = time.perf_counter()
+            self.queries.append({
+                'alias': context['connection'].alias,
+                'start_ms': round((start - self.started) * 1000, 3),
+                'duration_ms': round((end - start) * 1000, 3),
+                'sql': sql,
+            })
+
+    def __enter__(self):
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+
+class RequestProfiler:
+    """
+    Profiles the CPU time and the queries of one request.
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.profiler = cProfile.Profile()
+        self.timeline = SQLTimeline(self.started)
+        self.duration_ms = None
+
+    def start(self):
+        """
+        Starts profiling. Raises ValueError when another profiler is
+        already active in this thread.
+        """
+        self.timeline.__enter__()
+        try:
+            self.profiler.enable()
+        except ValueError:
+            self.timeline.__exit__(None, None, None)
+            raise
+
+    def stop(self):
+        self.profiler.disable()
+        self.timeline.__exit__(None, None, None)
+        self.duration_ms = (time.perf_counter() - self.started) * 1000
+
+
+def save_profile(profiler, request, response, max_profiles):
+    """
+    Writes the CPU profile and a JSON record of a profiled request,
+    then deletes the oldest profiles beyond max_profiles. Returns the
+    id of the profile.
+    """
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    # Names sort in the order the profiles were taken
+    profile_id = f'{time.time_ns()}'
+    profiler.profiler.dump_stats(directory / f'{profile_id}.prof')
+    record = {
+        'id': profile_id,
+        'method': request.method,
+        'path': request.path,
+        'view': getattr(request.resolver_match, 'view_name', None),
+        'status': response.status_code,
+        'duration_ms': round(profiler.duration_ms, 3),
+        'sql_ms': round(sum(
+            query['duration_ms'] for query in profiler.timeline.queries), 3),
+        'queries': profiler.timeline.queries,
+    }
+    (directory / f'{profile_id}.json').write_text(json.dumps(record))
+
+    # Bounded ring buffer of profiles
+    records = sorted(directory.glob('*.json'))
+    for old in records[:max(0, len(records) - max_profiles)]:
+        old.unlink(missing_ok=True)
+        old.with_suffix('.prof').unlink(missing_ok=True)
+    return profile_id
+
+
+def list_profiles():
+    """Returns the records of the stored profiles, oldest first."""
+    records = []
+    for path in sorted(profile_dir().glob('*.json')):
+        try:
+            records.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            # Deleted or being written by a concurrent request
+            continue
+    return records
+
+
+def load_profile(profile_id):
+    """
+    Returns the record of a stored profile, or None when it doesn't
+    exist.
+    """
+    path = profile_dir() / f'{profile_id}.json'
+    if not path.is_file():
+        return None
+    return json.loads(path.read_text())
+
+
+def format_stats(profile_id, limit=20, sort='cumulative'):
+    """
+    Returns the functions of a stored CPU profile taking the most time
+    as text.
+    """
+    out = io.StringIO()
+    stats = pstats.Stats(
+        str(profile_dir() / f'{profile_id}.prof'), stream=out)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
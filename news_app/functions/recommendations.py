@@ -0,0 +1,177 @@
+"""
+"Readers also follow" recommendations built from the subscription
+graph.
+
+The subscriptions are loaded into a sparse reader by source matrix R,
+where the sources are the journalists and publishers. R.T @ R counts
+the readers every two sources share, which normalised by the number of
+readers of each source gives their cosine similarity. A reader's score
+for a source is the summed similarity of that source to the reader's
+subscriptions. Only the top few sources of each reader and source are
+stored, packed into one binary value per row.
+"""
+
+from itertools import chain
+import numpy as np
+from scipy import sparse
+from django.conf import settings
+from django.db import transaction
+from ..models import CustomUser, Recommendation
+
+# One packed recommended source: its kind, id and score.
+SOURCE_DTYPE = np.dtype([('kind', 'u1'), ('id', '<u8'), ('score', '<f4')])
+SOURCE_KINDS = {
+    Recommendation.JOURNALIST: 'journalist',
+    Recommendation.PUBLISHER: 'publisher',
+}
+
+
+def pack_sources(kinds, ids, scores):
+    """Packs recommended sources into bytes."""
+    sources = np.empty(len(ids), SOURCE_DTYPE)
+    sources['kind'], sources['id'], sources['score'] = kinds, ids, scores
+    return sources.tobytes()
+
+
+def unpack_sources(data):
+    """
+    Returns the recommended sources packed into data as dicts, best
+    first.
+    """
+    return [
+        {'type': SOURCE_KINDS[int(kind)], 'id': int(pk),
+         'score': round(float(score), 4)}
+        for kind, pk, score in np.frombuffer(bytes(data), SOURCE_DTYPE)]
+
+
+def get_recommendations(kind, object_id):
+    """
+    Returns the recommended sources of a reader, or the sources most
+    similar to a journalist or publisher.
+    """
+    data = Recommendation.objects.filter(
+        kind=kind, object_id=object_id).values_list(
+            'sources', flat=True).first()
+    return [] if data is None else unpack_sources(data)
+
+
+def load_pairs(queryset, chunk_size=10000):
+    """
+    Loads the (reader, source) id pairs of a through table queryset
+    into an array with one row per pair.
+    """
+    values = chain.from_iterable(queryset.iterator(chunk_size=chunk_size))
+    return np.fromiter(values, dtype=np.int64).reshape(-1, 2)
+
+
+def subscription_matrix():
+    """
+    Returns the reader by source subscription matrix, the ids of its
+    rows and the kinds and ids of its columns.
+    """
+    journalist_pairs = load_pairs(
+        CustomUser.subscribed_journalists.through.objects.values_list(
+            'from_customuser_id', 'to_customuser_id'))
+    publisher_pairs = load_pairs(
+        CustomUser.subscribed_publishers.through.objects.values_list(
+            'customuser_id', 'publisher_id'))
+
+    journalist_ids, journalist_columns = np.unique(
+        journalist_pairs[:, 1], return_inverse=True)
+    publisher_ids, publisher_columns = np.unique(
+        publisher_pairs[:, 1], return_inverse=True)
+    reader_ids, rows = np.unique(
+        np.concatenate([journalist_pairs[:, 0], publisher_pairs[:, 0]]),
+        return_inverse=True)
+    columns = np.concatenate(
+        [journalist_columns, publisher_columns + len(journalist_ids)])
+
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), np.float32), (rows, columns)),
+        shape=(len(reader_ids), len(journalist_ids) + len(publisher_ids)))
+    source_kinds = np.concatenate([
+        np.full(len(journalist_ids), Recommendation.JOURNALIST, np.uint8),
+        np.full(len(publisher_ids), Recommendation.PUBLISHER, np.uint8)])
+    source_ids = np.concatenate([journalist_ids, publisher_ids])
+    return matrix, reader_ids, source_kinds, source_ids
+
+
+def similarity_matrix(matrix):
+    """
+    Returns the cosine similarity of every two sources, the columns of
+    a reader by source matrix, as a sparse matrix with a zero diagonal.
+    """
+    cooccurrence = (matrix.T @ matrix).tocsr()
+    readers = cooccurrence.diagonal()
+    norm = sparse.diags(1 / np.sqrt(np.maximum(readers, 1)))
+    similarity = (norm @ cooccurrence @ norm).tocsr()
+    similarity.setdiag(0)
+    similarity.eliminate_zeros()
+    return similarity
+
+
+def top_k(matrix, k):
+    """
+    Yields the row number, column numbers and values of the k largest
+    values of every non-empty row of a CSR matrix, largest first.
+    """
+    for row in range(matrix.shape[0]):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        if start == end:
+            continue
+        values = matrix.data[start:end]
+        best = np.argpartition(-values, min(k, len(values)) - 1)[:k]
+        best = best[np.argsort(-values[best], kind='stable')]
+        yield row, matrix.indices[start:end][best], values[best]
+
+
+def build_recommendations(k=None, batch_size=1000):
+    """
+    Rebuilds the recommendations of every source and reader. Readers
+    are scored batch_size at a time to bound the memory used. Returns
+    the number of stored rows.
+    """
+    k = k or getattr(settings, 'RECOMMENDATIONS_TOP_K', 10)
+    matrix, reader_ids, source_kinds, source_ids = subscription_matrix()
+    if not matrix.nnz:
+        Recommendation.objects.all().delete()
+        return 0
+    similarity = similarity_matrix(matrix)
+
+    def source_rows():
+        for row, columns, scores in top_k(similarity, k):
+            yield Recommendation(
+                kind=int(source_kinds[row]), object_id=int(source_ids[row]),
+                sources=pack_sources(
+                    source_kinds[columns], source_ids[columns], scores))
+
+    def reader_rows():
+        for start in range(0, matrix.shape[0], batch_size):
+            subscribed = matrix[start:start + batch_size]
+            scores = (subscribed @ similarity).tocsr()
+            # Leave out the sources the reader already follows
+            scores = (scores - scores.multiply(subscribed)).tocsr()
+            scores.eliminate_zeros()
+            for row, columns, values in top_k(scores, k):
+                yield Recommendation(
+                    kind=Recommendation.READER,
+                    object_id=int(reader_ids[start + row]),
+                    sources=pack_sources(
+                        source_kinds[columns], source_ids[columns], values))
+
+    count = 0
+    # Readers keep seeing the previous recommendations until the new
+    # ones are committed
+    with transaction.atomic():
+        Recommendation.objects.all().delete()
+        for rows in (source_rows(), reader_rows()):
+            batch = []
+            for recommendation in rows:
+                batch.append(recommendation)
+                if len(batch) == batch_size:
+                    Recommendation.objects.bulk_create(batch)
+                    count += len(batch)
+                    batch = []
+            Recommendation.objects.bulk_create(batch)
+            count += len(batch)
+    return count
@@ -0,0 +1,198 @@
+"""
+Related articles and newsletters by TF-IDF similarity.
+
+The words of an item's title and content are hashed into
+RELATED_FEATURES buckets with CRC32, which unlike hash() is the same in
+every process, and counted. Each published item's term frequencies are
+stored packed in RelatedContent. The idf weights follow from the number
+of stored vectors each feature appears in, so they are never stored.
+Weighted vectors are normalised, making the product of two vectors
+their cosine similarity, and the neighbours of a block of items are
+found with one sparse matrix product.
+
+Signals clear the vector of an item when it is published or changed.
+A build then only indexes those items and recomputes the neighbours of
+the items they may now appear next to.
+"""
+
+import re
+import zlib
+import numpy as np
+from scipy import sparse
+from django.conf import settings
+from django.db import transaction
+from django.utils.html import strip_tags
+from ..models import Article, Newsletter, RelatedContent
+from .recommendations import top_k
+
+# One packed hashed term: its feature number and term frequency.
+TERM_DTYPE = np.dtype([('feature', '<u4'), ('tf', '<f4')])
+WORD_RE = re.compile(r'[^\W\d_]{3,}')
+MODELS = {
+    RelatedContent.ARTICLE: Article,
+    RelatedContent.NEWSLETTER: Newsletter,
+}
+TYPES = {
+    RelatedContent.ARTICLE: 'article',
+    RelatedContent.NEWSLETTER: 'newsletter',
+}
+KINDS = {name: kind for kind, name in TYPES.items()}
+# Words in more than this fraction of the items say little about how
+# similar two items are, and make the similarity products dense. Only
+# applied to indexes of at least MAX_DF_MIN_ITEMS items.
+MAX_DF = 0.5
+MAX_DF_MIN_ITEMS = 100
+
+
+def feature_count():
+    """Returns the number of hashed features."""
+    return getattr(settings, 'RELATED_FEATURES', 2 ** 18)
+
+
+def term_vector(title, content, features):
+    """
+    Returns the packed hashed term frequencies of an item, damped with
+    1 + log(count). Title words count twice.
+    """
+    words = WORD_RE.findall(f'{title} {title} {strip_tags(content)}'.lower())
+    hashes = np.fromiter(
+        (zlib.crc32(word.encode()) for word in words), np.uint32,
+        len(words))
+    ids, counts = np.unique(hashes % features, return_counts=True)
+    terms = np.empty(len(ids), TERM_DTYPE)
+    terms['feature'], terms['tf'] = ids, 1 + np.log(counts)
+    return terms.tobytes()
+
+
+def tfidf_matrix(vectors, features):
+    """
+    Returns the normalised TF-IDF matrix of packed term vectors, with
+    one float32 row per vector.
+    """
+    terms = [np.frombuffer(bytes(vector), TERM_DTYPE) for vector in vectors]
+    indptr = np.zeros(len(terms) + 1, np.int64)
+    np.cumsum([len(row) for row in terms], out=indptr[1:])
+    terms = np.concatenate(terms) if terms else np.empty(0, TERM_DTYPE)
+    tf = sparse.csr_matrix(
+        (terms['tf'], terms['feature'].astype(np.int64), indptr),
+        shape=(len(indptr) - 1, features))
+
+    items = tf.shape[0]
+    df = np.bincount(terms['feature'], minlength=features)
+    idf = (np.log((1 + items) / (1 + df)) + 1).astype(np.float32)
+    if items >= MAX_DF_MIN_ITEMS:
+        idf[df > MAX_DF * items] = 0
+    matrix = (tf @ sparse.diags(idf)).tocsr()
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    matrix = (sparse.diags(1 / np.maximum(norms, 1e-12)) @ matrix).tocsr()
+    return matrix.astype(np.float32)
+
+
+def similar_blocks(matrix, rows, block_size):
+    """
+    Yields the row numbers and sparse similarities to all rows of the
+    given rows of a normalised matrix, block_size rows at a time. The
+    similarity of a row to itself is left out.
+    """
+    transposed = matrix.T.tocsr()
+    for start in range(0, len(rows), block_size):
+        block = np.asarray(rows[start:start + block_size])
+        scores = (matrix[block] @ transposed).tocsr()
+        own = np.repeat(block, np.diff(scores.indptr))
+        scores.data[scores.indices == own] = 0
+        scores.eliminate_zeros()
+        yield block, scores
+
+
+def build_related_content(full=False, k=None, block_size=512):
+    """
+    Indexes the published items whose vector was cleared, or every
+    item when full, and stores the k most similar items of every item
+    whose neighbours may have changed. Returns the numbers of indexed,
+    updated and removed items.
+    """
+    k = k or getattr(settings, 'RELATED_TOP_K', 5)
+    features = feature_count()
+    published = {
+        kind: set(model.objects.filter(
+            published_at__isnull=False).values_list('pk', flat=True))
+        for kind, model in MODELS.items()}
+    rows = {
+        (row.kind, row.object_id): row
+        for row in RelatedContent.objects.iterator(chunk_size=2000)}
+
+    removed = [key for key in rows if key[1] not in published[key[0]]]
+    for key in removed:
+        del rows[key]
+    stale = [
+        (kind, pk) for kind, ids in published.items() for pk in ids
+        if full or (kind, pk) not in rows or rows[kind, pk].vector is None]
+    for kind in MODELS:
+        ids = [pk for stale_kind, pk in stale if stale_kind == kind]
+        for start in range(0, len(ids), 1000):
+            for item in MODELS[kind].objects.filter(
+                    pk__in=ids[start:start + 1000]).only('title', 'content'):
+                row = rows.setdefault(
+                    (kind, item.pk),
+                    RelatedContent(kind=kind, object_id=item.pk))
+                row.vector = term_vector(item.title, item.content, features)
+    # Items deleted since the published ids were read
+    stale = [key for key in stale if key in rows]
+
+    keys = sorted(rows)
+    index = {key: number for number, key in enumerate(keys)}
+    matrix = tfidf_matrix([rows[key].vector for key in keys], features)
+
+    if full:
+        targets = set(keys)
+    else:
+        # Items listing a changed or removed item as related
+        changed = set(stale) | set(removed)
+        targets = set(stale) | {
+            key for key in keys if any(
+                (KINDS[item['type']], item['id']) in changed
+                for item in rows[key].related)}
+        # Items a changed item now beats one of the neighbours of
+        min_scores = np.array([
+            min(item['score'] for item in rows[key].related)
+            if len(rows[key].related) >= k else 0
+            for key in keys], np.float32)
+        for _, scores in similar_blocks(
+                matrix, [index[key] for key in stale], block_size):
+            beaten = scores.indices[scores.data > min_scores[scores.indices]]
+            targets.update(keys[number] for number in np.unique(beaten))
+
+    neighbours = {}
+    for block, scores in similar_blocks(
+            matrix, sorted(index[key] for key in targets), block_size):
+        for row, columns, values in top_k(scores, k):
+            neighbours[keys[block[row]]] = [
+                (keys[column], float(value))
+                for column, value in zip(columns, values)]
+    titles = {}
+    for kind, model in MODELS.items():
+        ids = {
+            key[1] for items in neighbours.values() for key, _ in items
+            if key[0] == kind}
+        titles[kind] = dict(
+            model.objects.filter(pk__in=ids).values_list('pk', 'title'))
+    for key in targets:
+        rows[key].related = [
+            {'type': TYPES[kind], 'id': pk, 'title': titles[kind][pk],
+             'score': round(score, 4)}
+            for (kind, pk), score in neighbours.get(key, [])
+            if pk in titles[kind]]
+
+    created = [row for row in rows.values() if row.pk is None]
+    updated = [
+        rows[key] for key in set(stale) | targets
+        if rows[key].pk is not None]
+    with transaction.atomic():
+        for kind in MODELS:
+            RelatedContent.objects.filter(kind=kind, object_id__in=[
+                pk for item_kind, pk in removed if item_kind == kind
+            ]).delete()
+        RelatedContent.objects.bulk_create(created, batch_size=500)
+        RelatedContent.objects.bulk_update(
+            updated, ['vector', 'related'], batch_size=500)
+    return len(stale), len(targets), len(removed)
@@ -0,0 +1,266 @@
+"""
+Revision history of articles and newsletters.
+
+The first revision of an item stores its content in full. Later ones
+store a delta from the previous revision: the runs of words copied from
+it and the text inserted between them, as compact JSON. Both are
+compressed with zlib, so a small edit of a long article costs a few
+dozen bytes.
+
+Every REVISION_SNAPSHOT_INTERVAL-th revision, and any revision whose
+delta would be larger than the content itself, is a full snapshot
+instead. A version is rebuilt from the last snapshot before it with one
+query, applying at most that many deltas. compact_revisions drops old
+revisions and encodes the remaining ones again.
+"""
+
+import difflib
+import json
+import re
+import zlib
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Subquery
+from ..models import Article, Newsletter, Revision
+
+# A word with the whitespace after it, or the whitespace a text starts
+# with. The tokens of a text join to the text itself.
+TOKEN_RE = re.compile(r'\s+|\S+\s*')
+MODELS = {
+    Revision.ARTICLE: Article,
+    Revision.NEWSLETTER: Newsletter,
+}
+TYPES = {
+    Revision.ARTICLE: 'article',
+    Revision.NEWSLETTER: 'newsletter',
+}
+KINDS = {name: kind for kind, name in TYPES.items()}
+
+
+def snapshot_interval():
+    """Returns the number of revisions between two snapshots."""
+    return max(getattr(settings, 'REVISION_SNAPSHOT_INTERVAL', 10), 1)
+
+
+def kind_of(model):
+    """Returns the revision kind of the Article or Newsletter model."""
+    return Revision.ARTICLE if model is Article else Revision.NEWSLETTER
+
+
+def make_delta(old, new):
+    """
+    Returns the compressed delta turning the text old into new: a list
+    of [start, count] runs of tokens copied from old and strings of
+    inserted text.
+    """
+    old_tokens = TOKEN_RE.findall(old)
+    new_tokens = TOKEN_RE.findall(new)
+    matcher = difflib.SequenceMatcher(None, old_tokens, new_tokens)
+    ops = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2 - i1])
+        elif j2 > j1:
+            ops.append(''.join(new_tokens[j1:j2]))
+    return zlib.compress(
+        json.dumps(ops, separators=(',', ':')).encode(), 9)
+
+
+def apply_delta(old, delta):
+    """Returns the text a compressed delta turns the text old into."""
+    old_tokens = TOKEN_RE.findall(old)
+    parts = []
+    for op in json.loads(zlib.decompress(delta)):
+        if isinstance(op, str):
+            parts.append(op)
+        else:
+            start, count = op
+            parts.extend(old_tokens[start:start + count])
+    return ''.join(parts)
+
+
+def encode(previous, content, since_snapshot):
+    """
+    Returns whether a revision of content is stored as a snapshot and
+    its data. previous is the content of the revision before, or None,
+    and since_snapshot the number of revisions since the last snapshot.
+    """
+    full = zlib.compress(content.encode(), 9)
+    if previous is None or since_snapshot >= snapshot_interval():
+        return True, full
+    delta = make_delta(previous, content)
+    if len(delta) >= len(full):
+        return True, full
+    return False, delta
+
+
+def decode(revision, previous):
+    """
+    Returns the content of a revision, given the content of the
+    revision before it.
+    """
+    if revision.snapshot:
+        return zlib.decompress(revision.data).decode()
+    return apply_delta(previous, revision.data)
+
+
+def _chain(kind, object_id, number=None):
+    """
+    Returns the revisions of an item from the last snapshot at or
+    before number, or before the latest revision, up to that revision.
+    """
+    revisions = Revision.objects.filter(kind=kind, object_id=object_id)
+    if number is not None:
+        revisions = revisions.filter(number__lte=number)
+    start = revisions.filter(snapshot=True).order_by(
+        '-number').values('number')[:1]
+    return list(
+        revisions.filter(number__gte=Subquery(start)).order_by('number'))
+
+
+def _content(chain):
+    """Returns the content of the last revision of a chain."""
+    content = None
+    for revision in chain:
+        content = decode(revision, content)
+    return content
+
+
+def get_version(kind, object_id, number):
+    """
+    Returns a revision of an item and its content, or None when there
+    is no such revision.
+    """
+    chain = _chain(kind, object_id, number)
+    if not chain or chain[-1].number != number:
+        return None
+    return chain[-1], _content(chain)
+
+
+def record_revision(item, author=None, created=False):
+    """
+    Records the title and content of a saved article or newsletter as
+    its next revision, unless neither changed since the latest one.
+    Returns the new revision or None.
+    """
+    with transaction.atomic():
+        if not created:
+            # Concurrent saves of the item wait for each other, so they
+            # don't take the same revision number
+            list(type(item).objects.select_for_update().filter(
+                pk=item.pk).values_list('pk', flat=True))
+        return _record_revision(item, author, created)
+
+
+def _record_revision(item, author, created):
+    """Records a revision of an item; see record_revision."""
+    kind = kind_of(type(item))
+    chain = [] if created else _chain(kind, item.pk)
+    previous = _content(chain) if chain else None
+    # A deferred content is unchanged, and reading it would load it
+    if previous is not None and 'content' in item.get_deferred_fields():
+        content = previous
+    else:
+        content = item.content
+    revision = Revision(
+        kind=kind, object_id=item.pk, title=item.title,
+        length=len(content), author=author)
+    if chain:
+        if chain[-1].title == item.title and previous == content:
+            return None
+        revision.number = chain[-1].number + 1
+        revision.snapshot, revision.data = encode(
+            previous, content, len(chain))
+    else:
+        # Items saved before their history was kept start it with the
+        # version the edit replaced, when it was loaded
+        previous = None if created else item.saved_value('content')
+        revision.number = 1
+        if previous is not None:
+            Revision.objects.create(
+                kind=kind, object_id=item.pk, number=1,
+                title=item.saved_value('title', item.title),
+                snapshot=True, data=encode(None, previous, 0)[1],
+                length=len(previous))
+            revision.number = 2
+        revision.snapshot, revision.data = encode(previous, content, 1)
+    revision.save()
+    return revision
+
+
+def diff_versions(kind, object_id, first, second):
+    """
+    Returns a unified diff of the content of two revisions of an item,
+    or None when either does not exist.
+    """
+    old, new = (get_version(kind, object_id, n) for n in (first, second))
+    if old is None or new is None:
+        return None
+    return '\n'.join(difflib.unified_diff(
+        old[1].splitlines(), new[1].splitlines(),
+        f'{TYPES[kind]}/{object_id}#{first}',
+        f'{TYPES[kind]}/{object_id}#{second}', lineterm=''))
+
+
+def compact_revisions(keep=None, before=None, batch_size=100):
+    """
+    Drops the revisions of each item beyond the latest keep, or created
+    before a datetime, always keeping the latest revision. The
+    remaining revisions are encoded again with the current snapshot
+    interval. Returns the number of items, the number of revisions
+    dropped and the stored bytes before and after.
+    """
+    items = Revision.objects.values_list(
+        'kind', 'object_id').distinct().order_by('kind', 'object_id')
+    counts = [0, 0, 0, 0]
+    for start in range(0, items.count(), batch_size):
+        for kind, object_id in items[start:start + batch_size]:
+            with transaction.atomic():
+                dropped, before_bytes, after_bytes = _compact_item(
+                    kind, object_id, keep, before)
+            counts[0] += 1
+            counts[1] += dropped
+            counts[2] += before_bytes
+            counts[3] += after_bytes
+    return tuple(counts)
+
+
+def _compact_item(kind, object_id, keep, before):
+    """
+    Compacts the revisions of one item. Returns the number of revisions
+    dropped and the stored bytes before and after.
+    """
+    revisions = list(
+        Revision.objects.select_for_update().filter(
+            kind=kind, object_id=object_id).order_by('number'))
+    contents, content = [], None
+    for revision in revisions:
+        content = decode(revision, content)
+        contents.append(content)
+    stored = sum(len(revision.data) for revision in revisions)
+
+    kept = list(range(len(revisions)))
+    if keep is not None:
+        kept = kept[-max(keep, 1):]
+    if before is not None:
+        kept = [
+            i for i in kept[:-1] if revisions[i].created_at >= before
+        ] + kept[-1:]
+    dropped = [
+        revisions[i].pk
+        for i in sorted(set(range(len(revisions))) - set(kept))]
+    Revision.objects.filter(pk__in=dropped).delete()
+
+    changed, previous, since_snapshot = [], None, 0
+    for i in kept:
+        revision = revisions[i]
+        snapshot, data = encode(previous, contents[i], since_snapshot)
+        since_snapshot = 1 if snapshot else since_snapshot + 1
+        if (snapshot, data) != (revision.snapshot, bytes(revision.data)):
+            revision.snapshot, revision.data = snapshot, data
+            changed.append(revision)
+        previous = contents[i]
+    Revision.objects.bulk_update(changed, ['snapshot', 'data'])
+    return (
+        len(dropped), stored,
+        sum(len(revisions[i].data) for i in kept))
@@ -0,0 +1,186 @@
+"""
+Buffered view counters and trending lists.
+
+Views are counted in memory and flushed to ContentStats in a few
+batched queries every VIEW_FLUSH_INTERVAL seconds, so reading an item
+never writes to the database.
+
+Trending scores use forward decay: a view at time t adds
+exp(rate * (t - TRENDING_EPOCH)) to the score of its item, where rate
+follows from TRENDING_HALF_LIFE. Later views weigh exponentially more,
+so ordering by the score ranks items by their decayed view counts, and
+scores never need to be recomputed as time passes. Only the natural
+log of the score is stored, as the score itself overflows a float.
+"""
+
+import atexit
+import logging
+import math
+import time
+from collections import Counter, defaultdict
+from threading import Lock, Thread
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import Case, Exists, F, FloatField, OuterRef, Value
+from django.db.models import When
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+from ..log import count_event
+from ..models import Article, ContentStats, Newsletter
+
+logger = logging.getLogger(__name__)
+
+# Start of the forward decay, 2026-01-01 UTC.
+TRENDING_EPOCH = 1767225600
+TRENDING_CACHE_KEY = 'trending'
+MODELS = {ContentStats.ARTICLE: Article, ContentStats.NEWSLETTER: Newsletter}
+
+# Views per (kind, object id) since the last flush, in this process.
+_pending = Counter()
+_pending_lock = Lock()
+_flusher = None
+
+
+def decay_rate():
+    """Returns the decay rate of trending scores per second."""
+    half_life = getattr(settings, 'TRENDING_HALF_LIFE', 6 * 60 * 60)
+    return math.log(2) / half_life
+
+
+def record_view(kind, object_id):
+    """
+    Counts a view of an item. Starts the background flusher of this
+    process on first use.
+    """
+    with _pending_lock:
+        _pending[kind, object_id] += 1
+    if _flusher is None:
+        _start_flusher()
+
+
+def _start_flusher():
+    global _flusher
+    interval = getattr(settings, 'VIEW_FLUSH_INTERVAL', 10)
+    with _pending_lock:
+        if _flusher is not None or not interval:
+            return
+        _flusher = Thread(
+            target=_flush_loop, args=(interval,), name='view-flusher',
+            daemon=True)
+        _flusher.start()
+    # Don't lose the views counted since the last flush on shutdown
+    atexit.register(flush_views)
+
+
+def _flush_loop(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            flush_views()
+        except Exception:
+            logger.exception("Flushing view counts failed")
+        finally:
+            close_old_connections()
+
+
+def log_add(field, value):
+    """
+    Returns an expression adding exp(value) to the log score in field,
+    computed in log space as max + ln(1 + exp(-|a - b|)).
+    """
+    value = Value(value, output_field=FloatField())
+    return Case(
+        When(**{f'{field}__isnull': True}, then=value),
+        default=Greatest(F(field), value) + Ln(
+            Value(1.0) + Exp(-Abs(F(field) - value))),
+        output_field=FloatField())
+
+
+def flush_views(now=None):
+    """
+    Writes the views counted since the last flush to ContentStats and
+    refreshes the cached trending lists. Returns the number of views
+    written.
+    """
+    with _pending_lock:
+        pending = _pending.copy()
+        _pending.clear()
+    if not pending:
+        return 0
+    now = time.time() if now is None else now
+    offset = decay_rate() * (now - TRENDING_EPOCH)
+
+    # Items with the same number of views share an UPDATE
+    groups = defaultdict(list)
+    for (kind, object_id), views in pending.items():
+        groups[kind, views].append(object_id)
+    try:
+        with transaction.atomic():
+            ContentStats.objects.bulk_create(
+                [ContentStats(kind=kind, object_id=object_id)
+                 for kind, object_id in pending],
+                batch_size=500, ignore_conflicts=True)
+            for (kind, views), object_ids in groups.items():
+                ContentStats.objects.filter(
+                    kind=kind, object_id__in=object_ids).update(
+                        views=F('views') + views,
+                        log_score=log_add(
+                            'log_score', math.log(views) + offset))
+    except DatabaseError:
+        # Keep the views for the next flush
+        with _pending_lock:
+            _pending.update(pending)
+        count_event('view_flush_failed', views=sum(pending.values()))
+        raise
+    cache.set(
+        TRENDING_CACHE_KEY, compute_trending(now),
+        getattr(settings, 'TRENDING_CACHE_TIMEOUT', 5 * 60))
+    return sum(pending.values())
+
+
+def compute_trending(now=None):
+    """
+    Returns the published articles and newsletters with the highest
+    trending scores, with their views and decayed scores at now.
+    """
+    now = time.time() if now is None else now
+    offset = decay_rate() * (now - TRENDING_EPOCH)
+    size = getattr(settings, 'TRENDING_SIZE', 20)
+    trending = {}
+    for kind, key in [(ContentStats.ARTICLE, 'articles'),
+                      (ContentStats.NEWSLETTER, 'newsletters')]:
+        # Only published items take a place in the list
+        published = MODELS[kind].objects.filter(
+            pk=OuterRef('object_id'), published_at__isnull=False)
+        stats = list(
+            ContentStats.objects.filter(
+                Exists(published), kind=kind, log_score__isnull=False,
+            ).order_by('-log_score')[:size])
+        items = MODELS[kind].objects.filter(
+            pk__in=[row.object_id for row in stats],
+            published_at__isnull=False).only('title', 'summary').in_bulk()
+        trending[key] = [
+            {
+                'id': row.object_id,
+                'title': items[row.object_id].title,
+                'summary': items[row.object_id].summary,
+                'url': items[row.object_id].get_absolute_url(),
+                'views': row.views,
+                'score': round(math.exp(row.log_score - offset), 4),
+            }
+            for row in stats if row.object_id in items]
+    return trending
+
+
+def get_trending():
+    """
+    Returns the cached trending lists, computing them when the cache
+    is empty.
+    """
+    trending = cache.get(TRENDING_CACHE_KEY)
+    if trending is None:
+        trending = compute_trending()
+        cache.set(
+            TRENDING_CACHE_KEY, trending,
+            getattr(settings, 'TRENDING_CACHE_TIMEOUT', 5 * 60))
+    return trending
@@ -0,0 +1,84 @@
+"""
+Tag filtering and facet counts of article and newsletter listings.
+
+A listing filtered by tags shows the items carrying every selected tag.
+Its facets are the numbers of filtered articles and newsletters
+carrying each tag. They are computed in one query, with a correlated
+count per tag, and cached until an item or the tags of an item change.
+"""
+
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from ..models import Article, ArticleTag, NewsletterTag, Tag
+
+FACET_VERSION_KEY = 'tag_facets_version'
+
+
+def tag_links(model):
+    """
+    Returns the link model between tags and a content model, and the
+    name of its content field.
+    """
+    if model is Article:
+        return ArticleTag, 'article'
+    return NewsletterTag, 'newsletter'
+
+
+def facet_version():
+    """Returns the current cache version of the facet counts."""
+    return cache.get_or_set(FACET_VERSION_KEY, time.time_ns(), None)
+
+
+def bump_facet_version():
+    """Invalidates every cached facet count."""
+    cache.set(FACET_VERSION_KEY, time.time_ns(), None)
+
+
+def selected_tags(slugs):
+    """Returns the tags with the given slugs, ordered by slug."""
+    return list(Tag.objects.filter(slug__in=slugs).order_by('slug'))
+
+
+def filter_by_tags(queryset, tags):
+    """Returns the items of a queryset carrying every given tag."""
+    links, field = tag_links(queryset.model)
+    for tag in tags:
+        queryset = queryset.filter(pk__in=links.objects.filter(
+            tag=tag).values(f'{field}_id'))
+    return queryset
+
+
+def _tag_count(queryset):
+    """
+    Returns an expression counting the items of a queryset carrying
+    the tag of the outer query.
+    """
+    links, field = tag_links(queryset.model)
+    counts = links.objects.filter(
+        tag=OuterRef('pk'), **{f'{field}__in': queryset.values('pk')},
+    ).order_by().values('tag').annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def facet_counts(articles, newsletters, key):
+    """
+    Returns the name, slug and numbers of articles and newsletters of
+    the tags carried by the items of the given querysets, cached under
+    key until items or their tags change.
+    """
+    cache_key = f'tag_facets:{facet_version()}:{key}'
+    facets = cache.get(cache_key)
+    if facets is None:
+        facets = list(
+            Tag.objects.annotate(
+                article_count=_tag_count(articles),
+                newsletter_count=_tag_count(newsletters),
+            ).filter(Q(article_count__gt=0) | Q(newsletter_count__gt=0))
+            .values('name', 'slug', 'article_count', 'newsletter_count'))
+        cache.set(
+            cache_key, facets,
+            getattr(settings, 'TAG_FACET_CACHE_TIMEOUT', 10 * 60))
+    return facets
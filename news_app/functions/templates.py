@@ -0,0 +1,41 @@
+from pathlib import Path
+from django.template import TemplateDoesNotExist, TemplateSyntaxError
+from django.template.loader import get_template
+
+# Directory of the app's templates, whose names are relative to it.
+TEMPLATE_DIR = Path(__file__).resolve().parent.parent / 'templates'
+
+
+def template_names(directory=TEMPLATE_DIR):
+    """
+    Returns the names of the templates under a directory, sorted.
+    """
+    directory = Path(directory)
+    return sorted(
+        path.relative_to(directory).as_posix()
+        for path in directory.rglob('*.html') if path.is_file())
+
+
+def compile_templates(names):
+    """
+    Loads and compiles templates. Returns the (name, error) pairs of
+    the templates that failed to compile.
+    """
+    errors = []
+    for name in names:
+        try:
+            get_template(name)
+        except (TemplateDoesNotExist, TemplateSyntaxError) as error:
+            errors.append((name, error))
+    return errors
+
+
+def warm_templates():
+    """
+    Compiles the app's templates ahead of the first requests, so they
+    are held by the cached template loader before any page is served.
+    Returns the number of templates compiled.
+    """
+    names = template_names()
+    compile_templates(names)
+    return len(names)
@@ -0,0 +1,207 @@
+import math
+import time
+from collections import Counter, defaultdict
+from functools import lru_cache, wraps
+from threading import Lock
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle
+from ..models import ThrottleBucket
+
+# Requests allowed per period for each throttle scope, overridable with
+# the THROTTLE_RATES setting. Bursts up to the full allowance are
+# accepted, after which tokens refill at a steady rate.
+DEFAULT_RATES = {
+    'api_user': '120/minute',
+    # Above api_user, so one user can use their whole allowance and a
+    # few can share an address
+    'api_ip': '240/minute',
+    'login': '10/minute',
+    'password_reset': '5/hour',
+}
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+# Allowed and throttled request counts per scope in this process.
+_metrics = defaultdict(Counter)
+_metrics_lock = Lock()
+
+
+def parse_rate(rate):
+    """
+    Parses a rate such as '60/minute' into the bucket capacity and the
+    number of tokens added per second.
+    """
+    count, period = rate.split('/')
+    return int(count), int(count) / PERIODS[period]
+
+
+def get_rate(scope):
+    """Returns the configured rate of a throttle scope."""
+    rates = {**DEFAULT_RATES, **getattr(settings, 'THROTTLE_RATES', {})}
+    return rates.get(scope)
+
+
+def refill(tokens, updated_at, capacity, refill_rate, now):
+    """
+    Takes one token from a bucket. Returns the allowed flag, the
+    remaining tokens and the seconds to wait before a token is free.
+    """
+    tokens = min(capacity, tokens + (now - updated_at) * refill_rate)
+    if tokens >= 1:
+        return True, tokens - 1, 0
+    return False, tokens, (1 - tokens) / refill_rate
+
+
+class DatabaseBucketStore:
+    """
+    Keeps the token buckets in the database, so the limits hold across
+    all worker processes. Each check locks its bucket row.
+    """
+    def take(self, key, capacity, refill_rate, now):
+        for _ in range(2):
+            try:
+                with transaction.atomic():
+                    bucket, created = (
+                        ThrottleBucket.objects.select_for_update()
+                        .get_or_create(
+                            key=key,
+                            defaults={'tokens': capacity, 'updated_at': now}))
+                    allowed, bucket.tokens, wait = refill(
+                        bucket.tokens, bucket.updated_at, capacity,
+                        refill_rate, now)
+                    bucket.updated_at = now
+                    bucket.save(update_fields=['tokens', 'updated_at'])
+                    return allowed, wait
+            except IntegrityError:
+                # Another process created the bucket first; retry
+                continue
+        return True, 0
+
+
+class CacheBucketStore:
+    """
+    Keeps the token buckets in the cache named by the THROTTLE_CACHE
+    setting. With a shared cache such as Redis or a file based cache
+    the limits hold across processes; concurrent requests may
+    occasionally both take the last token.
+    """
+    def take(self, key, capacity, refill_rate, now):
+        cache = caches[getattr(settings, 'THROTTLE_CACHE', 'default')]
+        tokens, updated_at = cache.get(f'throttle:{key}', (capacity, now))
+        allowed, tokens, wait = refill(
+            tokens, updated_at, capacity, refill_rate, now)
+        # Keep the bucket until it would be full again
+        timeout = math.ceil(capacity / refill_rate)
+        cache.set(f'throttle:{key}', (tokens, now), timeout)
+        return allowed, wait
+
+
+@lru_cache(maxsize=None)
+def _store(path):
+    return import_string(path)()
+
+
+def get_store():
+    """
+    Returns the bucket store named by the THROTTLE_STORE setting.
+    """
+    return _store(getattr(
+        settings, 'THROTTLE_STORE',
+        'news_app.functions.throttling.CacheBucketStore'))
+
+
+def check(scope, ident):
+    """
+    Takes a token from the bucket of ident in a throttle scope.
+    Returns whether the request is allowed and the seconds to wait
+    before retrying.
+    """
+    rate = get_rate(scope)
+    if not rate:
+        return True, 0
+    capacity, refill_rate = parse_rate(rate)
+    allowed, wait = get_store().take(
+        f'{scope}:{ident}', capacity, refill_rate, time.time())
+    with _metrics_lock:
+        _metrics[scope]['allowed' if allowed else 'throttled'] += 1
+    return allowed, wait
+
+
+def get_metrics():
+    """
+    Returns the allowed and throttled request counts per scope seen by
+    this process.
+    """
+    with _metrics_lock:
+        return {scope: dict(counts) for scope, counts in _metrics.items()}
+
+
+def client_ip(request):
+    """
+    Returns the IP address of the client of a request. Behind
+    NUM_PROXIES trusted reverse proxies it is taken from the
+    X-Forwarded-For header, where each proxy appends the address it
+    received the request from; addresses further left are set by the
+    client and not trusted.
+    """
+    proxies = getattr(settings, 'NUM_PROXIES', 0)
+    if proxies:
+        addresses = [
+            address.strip() for address in
+            request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')
+            if address.strip()]
+        if addresses:
+            return addresses[-min(proxies, len(addresses))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def too_many_requests(wait):
+    """
+    Returns the 429 response telling the client when to retry.
+    """
+    response = HttpResponse(
+        "Too many requests. Please try again later.", status=429,
+        content_type='text/plain')
+    response['Retry-After'] = str(math.ceil(wait))
+    return response
+
+
+def throttle(scope, methods=None):
+    """
+    View decorator limiting the requests per client IP address in a
+    throttle scope. Only requests with one of the given methods count
+    when methods is set. Runs before any authentication of the view.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if methods is None or request.method in methods:
+                allowed, wait = check(scope, client_ip(request))
+                if not allowed:
+                    return too_many_requests(wait)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class UserRateThrottle(BaseThrottle):
+    """
+    REST framework throttle limiting the requests per authenticated
+    user in the 'api_user' scope, or per IP address for anonymous
+    requests.
+    """
+    scope = 'api_user'
+
+    def allow_request(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = f'user:{request.user.pk}'
+        else:
+            ident = f'ip:{client_ip(request)}'
+        allowed, self._wait = check(self.scope, ident)
+        return allowed
+
+    def wait(self):
+        return self._wait
@@ -0,0 +1,22 @@
+"""
+Thumbnail rendering, run in the worker processes of the thumbnail pool.
+
+Workers import this module without setting up Django, so it must only
+depend on Pillow.
+"""
+
+import io
+from PIL import Image, ImageOps
+
+
+def render_thumbnail(data, size):
+    """
+    Returns a JPEG thumbnail of the image in data, scaled to fit within
+    size pixels and turned upright according to its EXIF orientation.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(size)
+        output = io.BytesIO()
+        image.convert('RGB').save(output, 'JPEG', quality=85, optimize=True)
+    return output.getvalue()
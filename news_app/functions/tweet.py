@@ -1,6 +1,8 @@
-import json
+import logging
 from requests_oauthlib import OAuth1Session
 
+logger = logging.getLogger(__name__)
+
 
 class Tweet():
     """A singleton class to handle authentication and posting tweets to
@@ -18,7 +20,7 @@ class Tweet():
         """Implements the Singleton pattern. Creates the object and
            authenticates on first call."""
         if cls._instance is None:
-            print('Creating the object')
+            logger.debug('Creating the object')
             cls._instance = super(Tweet, cls).__new__(cls)
             # Authenticate when the first instance is created.
             cls._instance.authenticate()
@@ -38,21 +40,24 @@ class Tweet():
             fetch_response = oauth_session.fetch_request_token(
                 request_token_url)
         except ValueError:
-            print("There may have been an issue with the consumer_key or"
-                  " consumer_secret you entered.")
+            logger.error(
+                "There may have been an issue with the consumer_key or"
+                " consumer_secret you entered.")
             return
 
         resource_owner_key = fetch_response.get("oauth_token")
         resource_owner_secret = fetch_response.get("oauth_token_secret")
-        print(f"Got OAuth token: {resource_owner_key}")
+        # The token itself is a credential and is not logged
+        logger.info("Got OAuth request token")
 
         # Step 2: Prompt the user to authorize the application.
         # Get authorization
         base_authorization_url = "https://api.x.com/oauth/authorize"
         authorization_url = oauth_session.authorization_url(
             base_authorization_url)
-        print(f"Please go here and authorize: {authorization_url}")
-        verifier = input("Paste the PIN here: ")
+        verifier = input(
+            f"Please go here and authorize: {authorization_url}\n"
+            "Paste the PIN here: ")
 
         # Step 3: Exchange the request token and verifier for an access
         #  token.
@@ -77,7 +82,7 @@ class Tweet():
                 resource_owner_key=access_token,
                 resource_owner_secret=access_token_secret,)
         except Exception as e:
-            print(f"Failed to get access token: {e}")
+            logger.error("Failed to get access token: %s", e)
 
     def make_tweet(self, tweet):
         """Posts a tweet using the authenticated OAuth1 session."""
@@ -93,7 +98,8 @@ class Tweet():
                 f"Request returned an error: {response.status_code}",
                 f" {response.text}")
 
-        # Print the success response.
-        print(f"Response code: {response.status_code}")
-        json_response = response.json()
-        print(json.dumps(json_response, indent=4, sort_keys=True))
+        # Log the id of the posted tweet.
+        logger.info(
+            "Tweet posted", extra={
+                'event': 'tweet_posted',
+                'tweet_id': response.json().get('data', {}).get('id')})
@@ -0,0 +1,161 @@
+"""
+Structured JSON logging that never blocks the request thread on I/O.
+
+Records are handed to a queue by QueueJsonHandler and written by a
+background thread. Records logged while a request is handled carry its
+request id, user id and view name, see request_context().
+"""
+
+import copy
+import json
+import logging
+import queue
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+# Id and request object of the request being handled.
+_current_request = ContextVar('current_request', default=None)
+# Attributes every LogRecord has; anything else was passed in extra.
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord(
+    '', logging.INFO, '', 0, '', (), None))) | {'message', 'asctime'}
+
+# Occurrences of counted events, e.g. failed notifications, in this
+# process.
+_event_counts = Counter()
+_event_counts_lock = Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as one JSON object per line, including the
+    request context and any fields passed with extra.
+    """
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(
+                record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        data.update(
+            (key, value) for key, value in vars(record).items()
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'))
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, default=str)
+
+
+def request_fields(request_id, request):
+    """
+    Returns the request id, view name and user id of a request, as far
+    as they are known.
+    """
+    fields = {'request_id': request_id}
+    if getattr(request, 'resolver_match', None) is not None:
+        fields['view'] = request.resolver_match.view_name
+    # Only use a user the request already loaded, so logging never
+    # costs a query
+    user = getattr(request, '_cached_user', None)
+    if user is not None and user.is_authenticated:
+        fields['user_id'] = user.pk
+    return fields
+
+
+class RequestContextFilter(logging.Filter):
+    """Adds the context of the current request to records."""
+    def filter(self, record):
+        current = _current_request.get()
+        if current is not None:
+            for key, value in request_fields(*current).items():
+                if not hasattr(record, key):
+                    setattr(record, key, value)
+        return True
+
+
+class _Listener(QueueListener):
+    """
+    Listener of a bounded queue that waits for room for its stop
+    sentinel, so queued records are still written on shutdown.
+    """
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+    def stop(self):
+        if self._thread is not None:
+            super().stop()
+
+
+class QueueJsonHandler(QueueHandler):
+    """
+    Puts records on a bounded queue, from which a background thread
+    writes them as JSON lines to a stream. When the queue is full,
+    records are dropped and counted rather than blocking the caller.
+    """
+    def __init__(self, stream=None, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        target = logging.StreamHandler(stream)
+        target.setFormatter(JsonFormatter())
+        self.addFilter(RequestContextFilter())
+        self.listener = _Listener(self.queue, target)
+        self.listener.start()
+
+    def close(self):
+        # Called by logging on exit; writes the queued records
+        self.listener.stop()
+        super().close()
+
+    def prepare(self, record):
+        # Resolve the message and traceback in the calling thread, as
+        # the arguments may change once the call returns
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = JsonFormatter().formatException(
+                record.exc_info)
+        record.msg, record.args, record.exc_info = record.message, None, None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with _event_counts_lock:
+                _event_counts['log_records_dropped'] += 1
+
+
+def count_event(name, level=logging.WARNING, **fields):
+    """
+    Counts an occurrence of an event, such as a failed notification,
+    and logs it with the given fields.
+    """
+    with _event_counts_lock:
+        _event_counts[name] += 1
+    logger.log(level, name, extra={'event': name, **fields})
+
+
+def get_event_counts():
+    """Returns the counted events of this process."""
+    with _event_counts_lock:
+        return dict(_event_counts)
+
+
+@contextmanager
+def request_context(request_id, request):
+    """
+    Adds the id, view name and user id of a request to the records
+    logged inside the block.
+    """
+    token = _current_request.set((request_id, request))
+    try:
+        yield
+    finally:
+        _current_request.reset(token)
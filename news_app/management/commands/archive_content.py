@@ -0,0 +1,35 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from news_app.functions.archive import archive_items
+from news_app.models import Article, Newsletter
+
+
+class Command(BaseCommand):
+    """
+    Moves articles and newsletters published before a cutoff to the
+    archive tables, keeping the live tables small. Run it nightly.
+    """
+    help = "Moves old articles and newsletters to the archive tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help="Archive items published more than this many days ago. "
+                 "Defaults to the ARCHIVE_AFTER_DAYS setting.")
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Items moved per transaction.")
+
+    def handle(self, *args, **options):
+        days = options['days']
+        if days is None:
+            days = getattr(settings, 'ARCHIVE_AFTER_DAYS', 2 * 365)
+        before = timezone.now() - timedelta(days=days)
+        articles = archive_items(Article, before, options['batch_size'])
+        newsletters = archive_items(
+            Newsletter, before, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {articles} article(s) and {newsletters} "
+            f"newsletter(s) published before {before:%Y-%m-%d}."))
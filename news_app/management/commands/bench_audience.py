@@ -0,0 +1,107 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.test.utils import setup_test_environment
+from django.test.utils import teardown_test_environment
+from news_app.functions.audience import (
+    JOURNALIST, PUBLISHER, audience, invalidate)
+from news_app.models import CustomUser, Publisher
+
+
+class Rollback(Exception):
+    """Raised to undo the benchmark's changes to the database."""
+
+
+class Command(BaseCommand):
+    """
+    Compares resolving the deduplicated subscribers of a publisher and
+    one of its journalists with SQL and with the audience index.
+    Nothing written by the benchmark is kept.
+    """
+    help = "Benchmarks the audience index against the SQL equivalent."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--readers', type=int, default=1000000,
+            help="Number of readers to create.")
+        parser.add_argument(
+            '--repeat', type=int, default=10,
+            help="Number of times each method is timed.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        try:
+            with transaction.atomic():
+                self.run_benchmark(options['readers'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            teardown_test_environment()
+
+    def create_graph(self, count, batch_size=10000):
+        publisher = Publisher.objects.create(name='bench_audience')
+        journalist = CustomUser.objects.create(
+            username='bench_audience_journalist', role='Journalist',
+            publisher=publisher)
+        for start in range(0, count, batch_size):
+            CustomUser.objects.bulk_create(
+                CustomUser(
+                    username=f'bench_audience_{i}', password='!',
+                    role='Reader')
+                for i in range(start, min(start + batch_size, count)))
+        reader_ids = list(CustomUser.objects.filter(
+            username__startswith='bench_audience_', role='Reader',
+        ).order_by('pk').values_list('pk', flat=True))
+
+        # A third follow the publisher and a fifth the journalist, so a
+        # fifteenth follow both
+        publishers = CustomUser.subscribed_publishers.through
+        journalists = CustomUser.subscribed_journalists.through
+        for start in range(0, len(reader_ids), batch_size):
+            batch = reader_ids[start:start + batch_size]
+            publishers.objects.bulk_create(
+                publishers(customuser_id=pk, publisher_id=publisher.pk)
+                for pk in batch[::3])
+            journalists.objects.bulk_create(
+                journalists(
+                    from_customuser_id=pk, to_customuser_id=journalist.pk)
+                for pk in batch[::5])
+        return publisher, journalist
+
+    def time(self, function, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            result = function()
+        return (time.perf_counter() - started) / repeat * 1000, result
+
+    def run_benchmark(self, count, repeat):
+        self.stdout.write(f"Creating {count} readers...")
+        publisher, journalist = self.create_graph(count)
+
+        def sql():
+            return list(CustomUser.objects.filter(
+                Q(subscribed_publishers=publisher)
+                | Q(subscribed_journalists=journalist),
+            ).values_list('pk', flat=True).distinct())
+
+        def build():
+            invalidate(PUBLISHER, [publisher.pk])
+            invalidate(JOURNALIST, [journalist.pk])
+            return audience([publisher], [journalist]).to_ids()
+
+        def cached():
+            return audience([publisher], [journalist]).to_ids()
+
+        self.stdout.write(f"{'method':<24}{'ms':>10}{'readers':>10}")
+        results = {}
+        for name, function in [
+                ('SQL DISTINCT', sql), ('index, build', build),
+                ('index, cached', cached)]:
+            elapsed, results[name] = self.time(function, repeat)
+            self.stdout.write(
+                f"{name:<24}{elapsed:>10.2f}{len(results[name]):>10}")
+        if set(results['SQL DISTINCT']) != set(
+                results['index, cached'].tolist()):
+            self.stderr.write("The index and SQL results differ.")
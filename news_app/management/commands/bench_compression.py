@@ -0,0 +1,100 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment
+from django.test.utils import teardown_test_environment
+from django.urls import reverse
+from news_app.models import Article, CustomUser, Publisher
+
+WORDS = (
+    "the council said on monday that new funding for local schools "
+    "would be announced after a review of budgets across the region "
+    "while critics warned that rising costs and delays could affect "
+    "residents who rely on public transport health services and housing"
+).split()
+ENCODINGS = ('identity', 'gzip', 'br')
+
+
+class Rollback(Exception):
+    """Raised to undo the benchmark's changes to the database."""
+
+
+class Command(BaseCommand):
+    """
+    Compares the bytes sent and the CPU time per request of the article
+    list and the reader API without compression, with gzip and with
+    brotli. Nothing written by the benchmark is kept.
+    """
+    help = "Benchmarks response compression of the article list and API."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--articles', type=int, default=200,
+            help="Number of sample articles to create.")
+        parser.add_argument(
+            '--requests', type=int, default=20,
+            help="Number of requests per page and encoding.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        try:
+            with transaction.atomic():
+                self.run_benchmark(options['articles'], options['requests'])
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            teardown_test_environment()
+
+    def create_content(self, count):
+        publisher = Publisher.objects.create(name='Bench Compression')
+        journalist = CustomUser.objects.create_user(
+            username='bench_compression_journalist', password='password',
+            role='Journalist', publisher=publisher)
+        reader = CustomUser.objects.create_user(
+            username='bench_compression_reader', password='password',
+            role='Reader')
+        reader.subscribed_publishers.add(publisher)
+        words = random.Random(0)
+        Article.objects.bulk_create(
+            Article(
+                title=' '.join(words.choices(WORDS, k=6)).capitalize(),
+                content=' '.join(words.choices(WORDS, k=400)),
+                summary=' '.join(words.choices(WORDS, k=40)),
+                article_author=journalist, editor_approved=True)
+            for _ in range(count))
+        return reader
+
+    def run_benchmark(self, articles, count):
+        reader = self.create_content(articles)
+        client = Client()
+        client.force_login(reader)
+        pages = {
+            'article_list': reverse('article_list'),
+            'api_reader_view': reverse('api_reader_view'),
+        }
+        self.stdout.write(
+            f"{'page':<18}{'encoding':<10}{'bytes':>10}{'ratio':>8}"
+            f"{'cpu ms/req':>12}")
+        # Unthrottled, so the benchmark's own requests aren't rejected
+        with override_settings(
+                THROTTLE_RATES={'api_ip': None, 'api_user': None}):
+            for page, url in pages.items():
+                uncompressed = None
+                for encoding in ENCODINGS:
+                    # Warm up the cache and template loaders
+                    client.get(url, HTTP_ACCEPT_ENCODING=encoding)
+                    started = time.process_time()
+                    for _ in range(count):
+                        response = client.get(
+                            url, HTTP_ACCEPT_ENCODING=encoding)
+                    elapsed = time.process_time() - started
+                    size = len(response.content)
+                    uncompressed = uncompressed or size
+                    self.stdout.write(
+                        f"{page:<18}"
+                        f"{response.get('Content-Encoding', 'identity'):<10}"
+                        f"{size:>10}{uncompressed / size:>8.1f}"
+                        f"{elapsed / count * 1000:>12.2f}")
@@ -0,0 +1,66 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.test.utils import setup_test_environment
+from django.test.utils import teardown_test_environment
+from django.urls import reverse
+from news_app.models import CustomUser
+
+
+class Rollback(Exception):
+    """Raised to undo the benchmark's changes to the database."""
+
+
+class Command(BaseCommand):
+    """
+    Compares the database round-trips and time per request of the
+    article list for a logged-in reader under each session backend.
+    Nothing written by the benchmark is kept.
+    """
+    help = "Benchmarks the article list under each session backend."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help="Number of requests per session backend.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        try:
+            with transaction.atomic():
+                self.run_benchmark(options['requests'])
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            teardown_test_environment()
+
+    def run_benchmark(self, count):
+        user = CustomUser.objects.create_user(
+            username='bench_sessions_reader', password='password',
+            role='Reader')
+        url = reverse('article_list')
+        self.stdout.write(
+            f"{'backend':<16}{'queries/req':>12}{'session/req':>12}"
+            f"{'ms/req':>10}")
+        for name, engine in settings.SESSION_ENGINES.items():
+            with override_settings(SESSION_ENGINE=engine):
+                client = Client()
+                client.force_login(user)
+                # Warm up the cache and template loaders
+                client.get(url)
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    for _ in range(count):
+                        client.get(url)
+                    elapsed = time.perf_counter() - started
+            session_queries = sum(
+                'django_session' in query['sql']
+                for query in queries.captured_queries)
+            self.stdout.write(
+                f"{name:<16}{len(queries) / count:>12.1f}"
+                f"{session_queries / count:>12.1f}"
+                f"{elapsed / count * 1000:>10.2f}")
@@ -0,0 +1,94 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment
+from django.test.utils import teardown_test_environment
+from django.urls import reverse
+from news_app.functions.templates import warm_templates
+from news_app.models import Article, CustomUser, Publisher
+
+LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+PROFILES = {
+    'uncached': LOADERS,
+    'cached': [('django.template.loaders.cached.Loader', LOADERS)],
+}
+
+
+class Rollback(Exception):
+    """Raised to undo the benchmark's changes to the database."""
+
+
+class Command(BaseCommand):
+    """
+    Compares the time per request of the main pages, and per rendered
+    notification email, with and without the cached template loader.
+    Nothing written by the benchmark is kept.
+    """
+    help = "Benchmarks page render times with and without cached templates."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help="Number of requests per page and loader.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        try:
+            with transaction.atomic():
+                self.run_benchmark(options['requests'])
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            teardown_test_environment()
+
+    def run_benchmark(self, count):
+        publisher = Publisher.objects.create(name='Bench Templates')
+        journalist = CustomUser.objects.create_user(
+            username='bench_templates_journalist', password='password',
+            role='Journalist', publisher=publisher)
+        reader = CustomUser.objects.create_user(
+            username='bench_templates_reader', password='password',
+            role='Reader')
+        article = Article.objects.create(
+            title='Bench article', content='<p>Content</p>' * 20,
+            article_author=journalist, editor_approved=True)
+
+        pages = {
+            'article_list': reverse('article_list'),
+            'view_article': reverse('view_article', args=[article.pk]),
+            'login': reverse('login'),
+            'register': reverse('register'),
+        }
+        self.stdout.write(f"{'page':<16}{'loader':<10}{'ms/req':>10}")
+        for profile, loaders in PROFILES.items():
+            templates = [{
+                **settings.TEMPLATES[0],
+                'APP_DIRS': False,
+                'OPTIONS': {
+                    **settings.TEMPLATES[0]['OPTIONS'], 'loaders': loaders},
+            }]
+            with override_settings(TEMPLATES=templates):
+                warm_templates()
+                client = Client()
+                client.force_login(reader)
+                for page, url in pages.items():
+                    self.report(page, profile, count, client.get, url)
+                self.report(
+                    'article_email', profile, count, render_to_string,
+                    'news_app/article_email.html',
+                    {'article': article, 'publisher': publisher})
+
+    def report(self, page, profile, count, func, *args):
+        started = time.perf_counter()
+        for _ in range(count):
+            func(*args)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{page:<16}{profile:<10}{elapsed / count * 1000:>10.2f}")
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from news_app.functions.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    """
+    Rebuilds the "Readers also follow" recommendations from the
+    subscriptions. Meant to run nightly.
+    """
+    help = "Rebuilds the source recommendations of readers and sources."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top', type=int, default=None,
+            help="Sources kept per reader and source. Defaults to the "
+                 "RECOMMENDATIONS_TOP_K setting.")
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Readers scored and rows written at a time.")
+
+    def handle(self, *args, **options):
+        count = build_recommendations(options['top'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {count} recommendation(s)."))
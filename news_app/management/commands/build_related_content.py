@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from news_app.functions.related import build_related_content
+
+
+class Command(BaseCommand):
+    """
+    Updates the related items shown on article and newsletter pages.
+    By default only newly published and changed items are indexed; run
+    it every few minutes, and with --full nightly.
+    """
+    help = "Indexes changed items and updates their related items."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help="Index every published item again.")
+        parser.add_argument(
+            '--top', type=int, default=None,
+            help="Related items kept per item. Defaults to the "
+                 "RELATED_TOP_K setting.")
+        parser.add_argument(
+            '--block-size', type=int, default=512,
+            help="Items compared with all others at a time.")
+
+    def handle(self, *args, **options):
+        indexed, updated, removed = build_related_content(
+            options['full'], options['top'], options['block_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {indexed} item(s), updated the related items of "
+            f"{updated} and removed {removed}."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from news_app.functions.templates import compile_templates, template_names
+
+
+class Command(BaseCommand):
+    """
+    Compiles every template of the app, so template syntax errors are
+    found at deploy time instead of by the first request using them.
+    """
+    help = "Compiles every template in news_app/templates."
+
+    def handle(self, *args, **options):
+        names = template_names()
+        errors = compile_templates(names)
+        for name, error in errors:
+            self.stderr.write(f"{name}: {error}")
+        if errors:
+            raise CommandError(
+                f"{len(errors)} of {len(names)} template(s) failed to "
+                f"compile.")
+        self.stdout.write(self.style.SUCCESS(
+            f"Compiled {len(names)} template(s)."))
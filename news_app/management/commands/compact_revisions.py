@@ -0,0 +1,35 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from news_app.functions.revisions import compact_revisions
+
+
+class Command(BaseCommand):
+    """
+    Drops old revisions of articles and newsletters and encodes the
+    remaining ones again, e.g. after REVISION_SNAPSHOT_INTERVAL changed.
+    The latest revision of each item is always kept.
+    """
+    help = "Drops old revisions and re-encodes the revision history."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep', type=int, default=None,
+            help="Revisions kept per item. Defaults to all.")
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help="Drop revisions older than this many days.")
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help="Items read per query.")
+
+    def handle(self, *args, **options):
+        before = None
+        if options['days'] is not None:
+            before = timezone.now() - timedelta(days=options['days'])
+        items, dropped, stored, compacted = compact_revisions(
+            options['keep'], before, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Compacted the revisions of {items} item(s), dropped "
+            f"{dropped} and reduced them from {stored} to {compacted} "
+            f"bytes."))
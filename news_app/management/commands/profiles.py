@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand, CommandError
+from news_app.functions.profiling import (
+    format_stats, list_profiles, load_profile, make_profile_token)
+
+
+class Command(BaseCommand):
+    """
+    Lists the request profiles kept by the profiling middleware, or
+    summarises one of them: its slowest functions and its SQL timeline.
+    """
+    help = "Lists or summarises stored request profiles."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'profile_id', nargs='?',
+            help="Profile to summarise. Lists all profiles when omitted.")
+        parser.add_argument(
+            '--limit', type=int, default=20,
+            help="Number of functions and queries shown in a summary.")
+        parser.add_argument(
+            '--sort', default='cumulative',
+            choices=['cumulative', 'tottime', 'calls'],
+            help="Order of the functions in a summary.")
+        parser.add_argument(
+            '--token', action='store_true',
+            help="Print a signed X-Profile header value instead.")
+
+    def handle(self, *args, **options):
+        if options['token']:
+            self.stdout.write(f"X-Profile: {make_profile_token()}")
+        elif options['profile_id']:
+            self.summarise(
+                options['profile_id'], options['limit'], options['sort'])
+        else:
+            self.list()
+
+    def list(self):
+        records = list_profiles()
+        if not records:
+            self.stdout.write("No profiles stored.")
+            return
+        self.stdout.write(
+            f"{'id':<21}{'method':<8}{'status':>6}{'ms':>10}"
+            f"{'sql ms':>10}{'queries':>9}  path")
+        for record in records:
+            self.stdout.write(
+                f"{record['id']:<21}{record['method']:<8}"
+                f"{record['status']:>6}{record['duration_ms']:>10.1f}"
+                f"{record['sql_ms']:>10.1f}{len(record['queries']):>9}  "
+                f"{record['path']}")
+
+    def summarise(self, profile_id, limit, sort):
+        record = load_profile(profile_id)
+        if record is None:
+            raise CommandError(f"No profile {profile_id}.")
+        self.stdout.write(
+            f"{record['method']} {record['path']} ({record['view']}) "
+            f"-> {record['status']} in {record['duration_ms']:.1f} ms, "
+            f"{len(record['queries'])} queries in "
+            f"{record['sql_ms']:.1f} ms")
+        self.stdout.write(format_stats(profile_id, limit, sort))
+
+        self.stdout.write("SQL timeline (start ms, duration ms):")
+        for query in record['queries'][:limit]:
+            self.stdout.write(
+                f"{query['start_ms']:>10.1f}{query['duration_ms']:>10.2f}  "
+                f"{query['sql'][:120]}")
+        slowest = sorted(
+            record['queries'], key=lambda query: query['duration_ms'],
+            reverse=True)[:5]
+        if slowest:
+            self.stdout.write("Slowest queries:")
+            for query in slowest:
+                self.stdout.write(
+                    f"{query['duration_ms']:>10.2f}  {query['sql'][:120]}")
@@ -0,0 +1,23 @@
+import time
+from django.core.management.base import BaseCommand
+from news_app.models import ThrottleBucket
+
+
+class Command(BaseCommand):
+    """
+    Deletes the token buckets of clients that have not made a request
+    for a while, keeping the throttle table small.
+    """
+    help = "Deletes idle throttle token buckets."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--idle', type=int, default=86400,
+            help="Seconds without requests after which a bucket is "
+                 "deleted.")
+
+    def handle(self, *args, **options):
+        deleted, _ = ThrottleBucket.objects.filter(
+            updated_at__lt=time.time() - options['idle']).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} idle throttle bucket(s)."))
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from news_app.functions.digests import DIGEST_PERIODS, Checkpoint
+from news_app.functions.digests import run_digests
+
+
+class Command(BaseCommand):
+    """
+    Sends the daily or weekly digest emails of readers who chose a
+    digest instead of immediate notifications.
+
+    Schedule it nightly, e.g. with cron:
+    ``0 2 * * * python manage.py send_digests --frequency daily``
+    """
+    help = "Sends daily or weekly digest emails to readers."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--frequency', choices=sorted(DIGEST_PERIODS), default='daily',
+            help="Digest frequency to send.")
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help="Number of readers processed per chunk.")
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help="Number of worker processes.")
+        parser.add_argument(
+            '--checkpoint',
+            help="Checkpoint file used to resume an interrupted run.")
+        parser.add_argument(
+            '--restart', action='store_true',
+            help="Ignore any checkpoint of a previous unfinished run.")
+
+    def handle(self, *args, **options):
+        frequency = options['frequency']
+        checkpoint_path = options['checkpoint'] or (
+            settings.BASE_DIR / f'send_digests_{frequency}.checkpoint.json')
+        checkpoint = Checkpoint(checkpoint_path, frequency)
+        if options['restart']:
+            checkpoint.clear()
+        elif checkpoint.path.exists():
+            self.stdout.write("Resuming the previous unfinished run.")
+
+        sent = run_digests(
+            frequency, timezone.now(), checkpoint,
+            chunk_size=options['chunk_size'], workers=options['workers'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Sent {sent} {frequency} digest email(s)."))
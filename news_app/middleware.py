@@ -0,0 +1,229 @@
+import logging
+import random
+import time
+import uuid
+import zlib
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+from .log import request_context
+from .functions.profiling import (
+    RequestProfiler, check_profile_token, save_profile)
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Responses with a shorter body are sent uncompressed, since the
+# compression headers and CPU time outweigh the saving.
+COMPRESS_MIN_SIZE = getattr(settings, 'COMPRESS_MIN_SIZE', 512)
+# Brotli quality and gzip level used for responses. Both favour speed
+# over ratio, as responses are compressed on every request.
+BROTLI_QUALITY = getattr(settings, 'COMPRESS_BROTLI_QUALITY', 4)
+GZIP_LEVEL = getattr(settings, 'COMPRESS_GZIP_LEVEL', 6)
+# Content types worth compressing. Images, archives and other formats
+# that are already compressed are left alone.
+COMPRESSIBLE_TYPES = (
+    'text/html', 'text/plain', 'text/css', 'text/csv', 'text/xml',
+    'application/json', 'application/javascript', 'application/xml',
+    'application/rss+xml', 'application/atom+xml', 'image/svg+xml',
+)
+# Maximum random bytes added to gzip responses containing a CSRF token,
+# see Django's GZipMiddleware.
+MAX_RANDOM_BYTES = 100
+
+
+def accepted_encodings(header):
+    """
+    Parses an Accept-Encoding header into the set of content codings
+    the client accepts, leaving out those refused with q=0.
+    """
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding)
+    return accepted
+
+
+def stream_compressor(encoding):
+    """
+    Returns the functions compressing one chunk of a streamed response
+    and ending the stream. Every chunk is flushed, so streamed content
+    reaches the client without waiting for the following chunks.
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return (
+            lambda chunk: compressor.process(chunk) + compressor.flush(),
+            compressor.finish)
+    compressor = zlib.compressobj(
+        GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return (
+        lambda chunk: (
+            compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)),
+        compressor.flush)
+
+
+def _compress_sequence(chunks, encoding):
+    compress, finish = stream_compressor(encoding)
+    for chunk in chunks:
+        yield compress(chunk)
+    yield finish()
+
+
+async def _acompress_sequence(chunks, encoding):
+    compress, finish = stream_compressor(encoding)
+    async for chunk in chunks:
+        yield compress(chunk)
+    yield finish()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compresses text based responses of at least COMPRESS_MIN_SIZE bytes
+    with brotli when the client accepts it, otherwise with gzip.
+
+    Pages that contain a CSRF token are only gzip compressed, with a
+    random amount of padding in the gzip header, so the length of
+    responses doesn't reveal their secrets to a BREACH attack.
+    """
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return response
+        content_type = response.get('Content-Type', '').split(';')[0]
+        if content_type.strip().lower() not in COMPRESSIBLE_TYPES:
+            # Server-Sent Events are also left alone, since compressors
+            # buffer the events
+            return response
+        if not response.streaming and len(response.content) < (
+                COMPRESS_MIN_SIZE):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = accepted_encodings(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        # Set by get_token and kept after CsrfViewMiddleware runs,
+        # unlike CSRF_COOKIE_NEEDS_UPDATE, which it clears before
+        # this middleware sees the response
+        secret = 'CSRF_COOKIE' in request.META
+        if brotli is not None and 'br' in accepted and not secret:
+            encoding = 'br'
+        elif 'gzip' in accepted:
+            encoding = 'gzip'
+        else:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = _acompress_sequence(
+                    response.streaming_content, encoding)
+            else:
+                response.streaming_content = _compress_sequence(
+                    response.streaming_content, encoding)
+            # The compressed size isn't known until the stream ends
+            del response.headers['Content-Length']
+        else:
+            if encoding == 'br':
+                compressed = brotli.compress(
+                    response.content, quality=BROTLI_QUALITY)
+            else:
+                compressed = compress_string(
+                    response.content,
+                    max_random_bytes=MAX_RANDOM_BYTES if secret else None)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # Compressed bodies differ byte for byte from the original, so
+        # a strong ETag becomes weak
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests sending a valid signed token in the X-Profile
+    header, and a random PROFILING_SAMPLE_RATE fraction of all others.
+    The CPU profile and SQL timeline of each profiled request are kept
+    in PROFILING_DIR, up to PROFILING_MAX_PROFILES of them; see the
+    'profiles' management command.
+
+    Removed from the middleware chain at startup unless
+    PROFILING_ENABLED is set, so it costs nothing when off.
+    """
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        self.max_profiles = getattr(settings, 'PROFILING_MAX_PROFILES', 100)
+
+    def should_profile(self, request):
+        token = request.headers.get('X-Profile')
+        if token:
+            return check_profile_token(token)
+        return random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+        profiler = RequestProfiler()
+        try:
+            profiler.start()
+        except ValueError:
+            # Another profiler is already active in this thread
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop()
+        profile_id = save_profile(
+            profiler, request, response, self.max_profiles)
+        response['X-Profile-Id'] = profile_id
+        return response
+
+
+class RequestLogMiddleware:
+    """
+    Assigns every request an id, taken from the X-Request-ID header
+    when the client or proxy sent one, adds it to every record logged
+    while the request is handled and logs one 'request' record with
+    the status and duration of each request.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        started = time.perf_counter()
+        with request_context(request_id, request):
+            response = self.get_response(request)
+            logger.info('request', extra={
+                'event': 'request',
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round(
+                    (time.perf_counter() - started) * 1000, 3),
+            })
+        response['X-Request-ID'] = request_id
+        return response
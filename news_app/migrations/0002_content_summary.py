@@ -0,0 +1,56 @@
+# Generated by Django 6.0 on 2026-10-19 12:28
+
+from django.db import migrations, models
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+# A copy of news_app.models.make_summary as it was when this migration
+# was written, so later changes to it do not change this migration.
+SUMMARY_LENGTH = 300
+
+
+def make_summary(content):
+    """
+    Returns a plain-text excerpt of the given content, truncated to
+    SUMMARY_LENGTH characters.
+    """
+    text = ' '.join(strip_tags(content or '').split())
+    return Truncator(text).chars(SUMMARY_LENGTH)
+
+
+def populate_summaries(apps, schema_editor):
+    """
+    Fills in the summary of existing articles and newsletters.
+    """
+    for model_name in ('Article', 'Newsletter'):
+        model = apps.get_model('news_app', model_name)
+        batch = []
+        for item in model.objects.only('content').iterator(chunk_size=500):
+            item.summary = make_summary(item.content)
+            batch.append(item)
+            if len(batch) >= 500:
+                model.objects.bulk_update(batch, ['summary'])
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, ['summary'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='summary',
+            field=models.CharField(blank=True, editable=False, max_length=300),
+        ),
+        migrations.AddField(
+            model_name='newsletter',
+            name='summary',
+            field=models.CharField(blank=True, editable=False, max_length=300),
+        ),
+        migrations.RunPython(populate_summaries, migrations.RunPython.noop),
+    ]
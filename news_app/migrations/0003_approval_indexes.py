@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-19 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news_app', '0002_content_summary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['editor_approved', 'independent_journalist', 'article_author'], name='article_approval_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='newsletter',
+            index=models.Index(fields=['editor_approved', 'independent_journalist', 'newsletter_author'], name='newsletter_approval_idx'),
+        ),
+    ]
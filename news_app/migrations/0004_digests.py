@@ -0,0 +1,51 @@
+# Generated by Django 6.0 on 2026-10-19 12:30
+
+from django.db import migrations, models
+from django.db.models import Q
+from django.utils import timezone
+
+
+def stamp_published_items(apps, schema_editor):
+    """
+    Stamps items that are already visible to readers with the current
+    time, as their original publish time was not recorded.
+    """
+    now = timezone.now()
+    for model_name in ('Article', 'Newsletter'):
+        model = apps.get_model('news_app', model_name)
+        model.objects.filter(
+            Q(editor_approved=True) | Q(independent_journalist=True),
+            published_at__isnull=True,
+        ).update(published_at=now)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news_app', '0003_approval_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='published_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='digest_frequency',
+            field=models.CharField(choices=[('immediate', 'Immediate'), ('daily', 'Daily digest'), ('weekly', 'Weekly digest')], default='immediate', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='last_digest_sent',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='newsletter',
+            name='published_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(
+            stamp_published_items, migrations.RunPython.noop),
+    ]
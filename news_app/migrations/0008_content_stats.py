@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-19 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news_app', '0007_title_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.PositiveSmallIntegerField(choices=[(1, 'Article'), (2, 'Newsletter')])),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('views', models.PositiveBigIntegerField(default=0)),
+                ('log_score', models.FloatField(null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', '-log_score'], name='content_stats_score_idx')],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='content_stats_item')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-19 11:20
+
+import news_app.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news_app', '0010_related_content'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='image',
+            field=models.ImageField(blank=True, storage=news_app.storage.attachment_storage, upload_to='images/%Y/%m/'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, storage=news_app.storage.attachment_storage, upload_to='thumbnails/'),
+        ),
+        migrations.AddField(
+            model_name='newsletter',
+            name='image',
+            field=models.ImageField(blank=True, storage=news_app.storage.attachment_storage, upload_to='images/%Y/%m/'),
+        ),
+        migrations.AddField(
+            model_name='newsletter',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, storage=news_app.storage.attachment_storage, upload_to='thumbnails/'),
+        ),
+    ]
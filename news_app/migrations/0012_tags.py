@@ -0,0 +1,74 @@
+# Generated by Django 6.0 on 2026-10-19 12:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news_app', '0011_attachments'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('slug', models.SlugField(unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='NewsletterTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('published_at', models.DateTimeField(editable=False, null=True)),
+                ('newsletter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='news_app.newsletter')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='news_app.tag')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArticleTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('published_at', models.DateTimeField(editable=False, null=True)),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='news_app.article')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='news_app.tag')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='articles', through='news_app.ArticleTag', to='news_app.tag'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='subscribed_tags',
+            field=models.ManyToManyField(blank=True, related_name='subscribers', to='news_app.tag'),
+        ),
+        migrations.AddField(
+            model_name='newsletter',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='newsletters', through='news_app.NewsletterTag', to='news_app.tag'),
+        ),
+        migrations.AddIndex(
+            model_name='newslettertag',
+            index=models.Index(fields=['tag', 'published_at'], name='newsletter_tag_feed_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='newslettertag',
+            constraint=models.UniqueConstraint(fields=('newsletter', 'tag'), name='newsletter_tag_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='articletag',
+            index=models.Index(fields=['tag', 'published_at'], name='article_tag_feed_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='articletag',
+            constraint=models.UniqueConstraint(fields=('article', 'tag'), name='article_tag_unique'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 6.0 on 2026-10-19 15:20
+
+import django.db.models.deletion
+import news_app.storage
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news_app', '0013_revisions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedArticle',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=200)),
+                ('content', models.TextField()),
+                ('summary', models.CharField(blank=True, max_length=300)),
+                ('editor_approved', models.BooleanField(default=False)),
+                ('independent_journalist', models.BooleanField(default=False)),
+                ('published_at', models.DateTimeField()),
+                ('image', models.ImageField(blank=True, storage=news_app.storage.attachment_storage, upload_to='images/%Y/%m/')),
+                ('thumbnail', models.ImageField(blank=True, storage=news_app.storage.attachment_storage, upload_to='thumbnails/')),
+                ('tag_ids', models.JSONField(default=list)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('article_author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_articles', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedNewsletter',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=200)),
+                ('content', models.TextField()),
+                ('summary', models.CharField(blank=True, max_length=300)),
+                ('editor_approved', models.BooleanField(default=False)),
+                ('independent_journalist', models.BooleanField(default=False)),
+                ('published_at', models.DateTimeField()),
+                ('image', models.ImageField(blank=True, storage=news_app.storage.attachment_storage, upload_to='images/%Y/%m/')),
+                ('thumbnail', models.ImageField(blank=True, storage=news_app.storage.attachment_storage, upload_to='thumbnails/')),
+                ('tag_ids', models.JSONField(default=list)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('newsletter_author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_newsletters', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
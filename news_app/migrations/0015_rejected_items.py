@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-20 09:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news_app', '0014_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='rejected',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='newsletter',
+            name='rejected',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
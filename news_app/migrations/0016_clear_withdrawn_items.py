@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-19 14:02
+
+from django.db import migrations
+
+
+def clear_withdrawn_items(apps, schema_editor):
+    """
+    Clears the publication time of items whose approval was withdrawn,
+    and of their tag links, as saving them now does.
+    """
+    for model_name, field in (
+            ('Article', 'article'), ('Newsletter', 'newsletter')):
+        model = apps.get_model('news_app', model_name)
+        links = apps.get_model('news_app', f'{model_name}Tag')
+        withdrawn = model.objects.filter(
+            editor_approved=False, independent_journalist=False,
+            published_at__isnull=False)
+        links.objects.filter(**{f'{field}__in': withdrawn}).update(
+            published_at=None)
+        withdrawn.update(published_at=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news_app', '0015_rejected_items'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_withdrawn_items, migrations.RunPython.noop),
+    ]
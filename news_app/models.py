@@ -1,5 +1,103 @@
 from django.db import models
+from django.urls import reverse
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+from .storage import attachment_storage
+
+# Maximum length of the stored plain-text excerpt of an item's content.
+SUMMARY_LENGTH = 300
+# Fields whose change puts a rejected item back in the approval queue.
+REVISED_FIELDS = {'title', 'content', 'image', 'editor_approved'}
+
+
+def make_summary(content):
+    """
+    Returns a plain-text excerpt of the given content, truncated to
+    SUMMARY_LENGTH characters, for use in listings and feeds.
+    """
+    text = ' '.join(strip_tags(content or '').split())
+    return Truncator(text).chars(SUMMARY_LENGTH)
+
+
+class TrackedFieldsMixin:
+    """
+    Remembers the field values a model instance was loaded or last
+    saved with. Saving a loaded instance only writes the fields that
+    changed since, and nothing at all when none did, so signal
+    receivers are not run either. changed_fields stays set while the
+    post_save receivers run.
+    """
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_values = instance._field_values()
+        return instance
+
+    def _field_values(self, names=None):
+        """
+        Returns the current values of the loaded concrete fields, or of
+        the named ones, by field name.
+        """
+        values = {}
+        for field in self._meta.concrete_fields:
+            # Deferred fields are not read, which would query them
+            if field.attname not in self.__dict__ or (
+                    names is not None and field.name not in names):
+                continue
+            value = getattr(self, field.attname)
+            if isinstance(value, models.fields.files.FieldFile):
+                value = value.name
+            values[field.name] = value
+        return values
+
+    def saved_value(self, name, default=None):
+        """
+        Returns the value a field was loaded or last saved with, or
+        default when it was not loaded.
+        """
+        saved = getattr(self, '_saved_values', None) or {}
+        return saved.get(name, default)
+
+    @property
+    def changed_fields(self):
+        """
+        Returns the names of the fields changed since the instance was
+        loaded or saved, or of every field of an unsaved instance.
+        """
+        saved = getattr(self, '_saved_values', None)
+        if saved is None:
+            return {field.name for field in self._meta.concrete_fields}
+        return {
+            name for name, value in self._field_values().items()
+            if name not in saved or saved[name] != value}
+
+    def save(self, *args, **kwargs):
+        # New instances, and ones created without being loaded such as
+        # by bulk_create, are saved in full
+        tracked = not (
+            self._state.adding or kwargs.get('force_insert')
+            or getattr(self, '_saved_values', None) is None)
+        if tracked and kwargs.get('update_fields') is None:
+            changed = self.changed_fields
+            if not changed:
+                return
+            kwargs['update_fields'] = changed
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if not tracked or update_fields is None:
+            self._saved_values = self._field_values()
+        else:
+            self._saved_values.update(self._field_values({
+                self._meta.get_field(name).name for name in update_fields}))
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using, fields, from_queryset)
+        if getattr(self, '_saved_values', None) is not None:
+            self._saved_values.update(self._field_values(
+                None if fields is None else {
+                    self._meta.get_field(name).name for name in fields}))
 
 
 class Publisher(models.Model):
@@ -12,6 +110,21 @@ class Publisher(models.Model):
         return self.name
 
 
+class Tag(models.Model):
+    """
+    A topic articles and newsletters can be tagged with and readers can
+    subscribe to.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    slug = models.SlugField(max_length=50, unique=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
 class CustomUser(AbstractUser):
     """
     Custom user model extending Django's AbstractUser.
@@ -23,6 +136,11 @@ class CustomUser(AbstractUser):
         ('Journalist', 'Journalist'),
         ('Editor', 'Editor'),
     )
+    DIGEST_CHOICES = (
+        ('immediate', 'Immediate'),
+        ('daily', 'Daily digest'),
+        ('weekly', 'Weekly digest'),
+    )
     role = models.CharField(
         max_length=10, choices=ROLE_CHOICES, default='Reader')
     publisher = models.ForeignKey(
@@ -40,34 +158,414 @@ class CustomUser(AbstractUser):
         blank=True,
         related_name='subscribers'
     )
+    subscribed_tags = models.ManyToManyField(
+        Tag,
+        blank=True,
+        related_name='subscribers'
+    )
+    digest_frequency = models.CharField(
+        max_length=10, choices=DIGEST_CHOICES, default='immediate')
+    last_digest_sent = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return self.username
 
 
-class Article(models.Model):
+class Article(TrackedFieldsMixin, models.Model):
     """
     Represents a news article created by a journalist.
     """
     title = models.CharField(max_length=200)
     content = models.TextField()
+    summary = models.CharField(
+        max_length=SUMMARY_LENGTH, blank=True, editable=False)
     editor_approved = models.BooleanField(default=False)
+    # Set when an editor rejects the article, until its author edits it
+    rejected = models.BooleanField(default=False, editable=False)
     article_author = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     independent_journalist = models.BooleanField(default=False)
+    published_at = models.DateTimeField(
+        null=True, blank=True, editable=False, db_index=True)
+    image = models.ImageField(
+        upload_to='images/%Y/%m/', storage=attachment_storage, blank=True)
+    # Set by a process pool worker once the image is saved
+    thumbnail = models.ImageField(
+        upload_to='thumbnails/', storage=attachment_storage, blank=True,
+        editable=False)
+    tags = models.ManyToManyField(
+        Tag, through='ArticleTag', blank=True, related_name='articles')
+
+    class Meta:
+        indexes = [
+            # Supports the editor approval queue and published listings
+            models.Index(
+                fields=['editor_approved', 'independent_journalist',
+                        'article_author'],
+                name='article_approval_idx'),
+            # Supports the admin's title prefix search
+            models.Index(fields=['title'], name='article_title_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    def get_absolute_url(self):
+        return reverse('view_article', args=[self.pk])
 
-class Newsletter(models.Model):
+    def save(self, *args, **kwargs):
+        # Keep the stored excerpt in step with the content so listings
+        # never need to load the full body. A deferred content is
+        # unchanged, and reading it would load it.
+        if 'content' not in self.get_deferred_fields():
+            self.summary = make_summary(self.content)
+        # An edited rejected item is submitted for approval again
+        if self.rejected and REVISED_FIELDS & self.changed_fields:
+            self.rejected = False
+        # Record when the item became visible to readers, and clear it
+        # when an editor withdraws the approval, so the listings that
+        # read published_at drop the item
+        visible = self.editor_approved or self.independent_journalist
+        self._newly_published = self.published_at is None and visible
+        if self._newly_published:
+            self.published_at = timezone.now()
+        elif not visible:
+            self.published_at = None
+        super().save(*args, **kwargs)
+
+
+class Newsletter(TrackedFieldsMixin, models.Model):
     """
     Represents a newsletter created by a journalist.
     """
     title = models.CharField(max_length=200)
     content = models.TextField()
+    summary = models.CharField(
+        max_length=SUMMARY_LENGTH, blank=True, editable=False)
     editor_approved = models.BooleanField(default=False)
+    # Set when an editor rejects the newsletter, until it is edited
+    rejected = models.BooleanField(default=False, editable=False)
     newsletter_author = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     independent_journalist = models.BooleanField(default=False)
+    published_at = models.DateTimeField(
+        null=True, blank=True, editable=False, db_index=True)
+    image = models.ImageField(
+        upload_to='images/%Y/%m/', storage=attachment_storage, blank=True)
+    # Set by a process pool worker once the image is saved
+    thumbnail = models.ImageField(
+        upload_to='thumbnails/', storage=attachment_storage, blank=True,
+        editable=False)
+    tags = models.ManyToManyField(
+        Tag, through='NewsletterTag', blank=True, related_name='newsletters')
+
+    class Meta:
+        indexes = [
+            # Supports the editor approval queue and published listings
+            models.Index(
+                fields=['editor_approved', 'independent_journalist',
+                        'newsletter_author'],
+                name='newsletter_approval_idx'),
+            # Supports the admin's title prefix search
+            models.Index(fields=['title'], name='newsletter_title_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+    def get_absolute_url(self):
+        return reverse('view_newsletter', args=[self.pk])
+
+    def save(self, *args, **kwargs):
+        # Keep the stored excerpt in step with the content so listings
+        # never need to load the full body. A deferred content is
+        # unchanged, and reading it would load it.
+        if 'content' not in self.get_deferred_fields():
+            self.summary = make_summary(self.content)
+        # An edited rejected item is submitted for approval again
+        if self.rejected and REVISED_FIELDS & self.changed_fields:
+            self.rejected = False
+        # Record when the item became visible to readers, and clear it
+        # when an editor withdraws the approval, so the listings that
+        # read published_at drop the item
+        visible = self.editor_approved or self.independent_journalist
+        self._newly_published = self.published_at is None and visible
+        if self._newly_published:
+            self.published_at = timezone.now()
+        elif not visible:
+            self.published_at = None
+        super().save(*args, **kwargs)
+
+
+class ArticleTag(models.Model):
+    """
+    Links a tag to an article. Holds a copy of the article's publication
+    time so tag feeds read the latest items of a tag from one index.
+    """
+    article = models.ForeignKey(Article, on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+    published_at = models.DateTimeField(null=True, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['article', 'tag'], name='article_tag_unique'),
+        ]
+        indexes = [
+            # Supports tag feeds and tag subscriptions
+            models.Index(
+                fields=['tag', 'published_at'], name='article_tag_feed_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.article_id}: {self.tag_id}'
+
+    def save(self, *args, **kwargs):
+        # Links saved one at a time, as in the admin, rather than
+        # through Article.tags
+        if self.published_at is None:
+            self.published_at = self.article.published_at
+        super().save(*args, **kwargs)
+
+
+class NewsletterTag(models.Model):
+    """
+    Links a tag to a newsletter. Holds a copy of the newsletter's
+    publication time so tag feeds read the latest items of a tag from
+    one index.
+    """
+    newsletter = models.ForeignKey(Newsletter, on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+    published_at = models.DateTimeField(null=True, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['newsletter', 'tag'], name='newsletter_tag_unique'),
+        ]
+        indexes = [
+            # Supports tag feeds and tag subscriptions
+            models.Index(
+                fields=['tag', 'published_at'],
+                name='newsletter_tag_feed_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.newsletter_id}: {self.tag_id}'
+
+    def save(self, *args, **kwargs):
+        # Links saved one at a time, as in the admin, rather than
+        # through Newsletter.tags
+        if self.published_at is None:
+            self.published_at = self.newsletter.published_at
+        super().save(*args, **kwargs)
+
+
+class ArchivedArticle(models.Model):
+    """
+    An article published before the archive cutoff, moved out of the
+    article table by archive_content. It keeps the primary key it had,
+    so its page is still found at the same URL.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=200)
+    content = models.TextField()
+    summary = models.CharField(max_length=SUMMARY_LENGTH, blank=True)
+    editor_approved = models.BooleanField(default=False)
+    article_author = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE,
+        related_name='archived_articles')
+    independent_journalist = models.BooleanField(default=False)
+    published_at = models.DateTimeField()
+    image = models.ImageField(
+        upload_to='images/%Y/%m/', storage=attachment_storage, blank=True)
+    thumbnail = models.ImageField(
+        upload_to='thumbnails/', storage=attachment_storage, blank=True)
+    # Ids of the tags the article carried
+    tag_ids = models.JSONField(default=list)
+    archived_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return self.title
+
+    def get_absolute_url(self):
+        return reverse('view_article', args=[self.pk])
+
+
+class ArchivedNewsletter(models.Model):
+    """
+    A newsletter published before the archive cutoff, moved out of the
+    newsletter table by archive_content.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=200)
+    content = models.TextField()
+    summary = models.CharField(max_length=SUMMARY_LENGTH, blank=True)
+    editor_approved = models.BooleanField(default=False)
+    newsletter_author = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE,
+        related_name='archived_newsletters')
+    independent_journalist = models.BooleanField(default=False)
+    published_at = models.DateTimeField()
+    image = models.ImageField(
+        upload_to='images/%Y/%m/', storage=attachment_storage, blank=True)
+    thumbnail = models.ImageField(
+        upload_to='thumbnails/', storage=attachment_storage, blank=True)
+    # Ids of the tags the newsletter carried
+    tag_ids = models.JSONField(default=list)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.title
+
+    def get_absolute_url(self):
+        return reverse('view_newsletter', args=[self.pk])
+
+
+class ApiToken(models.Model):
+    """
+    Represents a token a user authenticates API requests with. Only a
+    hash of the token is stored.
+    """
+    user = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name='api_tokens')
+    name = models.CharField(max_length=100)
+    key_hash = models.CharField(max_length=64, unique=True)
+    prefix = models.CharField(max_length=8)
+    created_at = models.DateTimeField(auto_now_add=True)
+    revoked = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f'{self.name} ({self.prefix}...)'
+
+
+class ThrottleBucket(models.Model):
+    """
+    Token bucket state of a throttled client, shared by all worker
+    processes.
+    """
+    key = models.CharField(max_length=200, unique=True)
+    tokens = models.FloatField()
+    updated_at = models.FloatField()
+
+    def __str__(self):
+        return self.key
+
+
+class ContentStats(models.Model):
+    """
+    View count and trending score of an article or newsletter, written
+    in batches by the buffered view counter.
+    """
+    ARTICLE = 1
+    NEWSLETTER = 2
+    KIND_CHOICES = ((ARTICLE, 'Article'), (NEWSLETTER, 'Newsletter'))
+
+    kind = models.PositiveSmallIntegerField(choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    views = models.PositiveBigIntegerField(default=0)
+    # Natural log of the forward decayed view count, see
+    # functions.stats. Null until the first views are flushed.
+    log_score = models.FloatField(null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id'], name='content_stats_item'),
+        ]
+        indexes = [
+            # Supports the trending lists
+            models.Index(
+                fields=['kind', '-log_score'], name='content_stats_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.object_id}'
+
+
+class Recommendation(models.Model):
+    """
+    Sources recommended to a reader, or the sources most similar to a
+    journalist or publisher, as built by build_recommendations. The
+    sources are packed into one binary value, see
+    functions.recommendations.
+    """
+    READER = 0
+    JOURNALIST = 1
+    PUBLISHER = 2
+    KIND_CHOICES = (
+        (READER, 'Reader'), (JOURNALIST, 'Journalist'),
+        (PUBLISHER, 'Publisher'))
+
+    kind = models.PositiveSmallIntegerField(choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    sources = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id'], name='recommendation_owner'),
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.object_id}'
+
+
+class RelatedContent(models.Model):
+    """
+    Term vector and most similar items of a published article or
+    newsletter, built by build_related_content. The related items are
+    stored with their titles, so pages show them without another query.
+    """
+    ARTICLE = 1
+    NEWSLETTER = 2
+    KIND_CHOICES = ((ARTICLE, 'Article'), (NEWSLETTER, 'Newsletter'))
+
+    kind = models.PositiveSmallIntegerField(choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    # Packed hashed term frequencies, see functions.related. Null when
+    # the item changed and has to be indexed again.
+    vector = models.BinaryField(null=True)
+    related = models.JSONField(default=list)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id'], name='related_content_item'),
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.object_id}'
+
+
+class Revision(models.Model):
+    """
+    A saved version of the title and content of an article or
+    newsletter. Snapshots store the content in full, other revisions a
+    delta from the previous revision, both compressed; see
+    functions.revisions.
+    """
+    ARTICLE = 1
+    NEWSLETTER = 2
+    KIND_CHOICES = ((ARTICLE, 'Article'), (NEWSLETTER, 'Newsletter'))
+
+    kind = models.PositiveSmallIntegerField(choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    number = models.PositiveIntegerField()
+    title = models.CharField(max_length=200)
+    snapshot = models.BooleanField(default=False)
+    data = models.BinaryField()
+    # Length of the content of this version, in characters
+    length = models.PositiveIntegerField()
+    author = models.ForeignKey(
+        CustomUser, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id', 'number'],
+                name='revision_item_number'),
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.object_id} #{self.number}'
@@ -21,7 +21,22 @@ class PublisherSerializer(serializers.ModelSerializer):
         fields = ['name']
 
 
-class ArticleSerializer(serializers.ModelSerializer):
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """
+    A ModelSerializer that takes an additional ``fields`` argument
+    controlling which of its fields are serialized.
+    """
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            # Drop any fields that were not requested
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
+
+class ArticleSerializer(DynamicFieldsModelSerializer):
     """
     Serializer for the Article model, including nested author details.
     """
@@ -29,10 +44,10 @@ class ArticleSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Article
-        fields = ['id', 'title', 'content', 'article_author']
+        fields = ['id', 'title', 'summary', 'content', 'article_author']
 
 
-class NewsletterSerializer(serializers.ModelSerializer):
+class NewsletterSerializer(DynamicFieldsModelSerializer):
     """
     Serializer for the Newsletter model, including nested author
     details.
@@ -41,4 +56,5 @@ class NewsletterSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Newsletter
-        fields = ['id', 'title', 'content', 'newsletter_author']
+        fields = [
+            'id', 'title', 'summary', 'content', 'newsletter_author']
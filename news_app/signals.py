@@ -0,0 +1,228 @@
+from functools import partial
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from .feeds import FEED_FIELDS, bump_feed_version, bump_item_feeds
+from .functions import audience
+from .functions.media import schedule_thumbnail, thumbnail_name
+from .functions.events import get_broker, make_event
+from .functions.revisions import kind_of, record_revision
+from .functions.tags import bump_facet_version, tag_links
+from .models import Article, Newsletter, CustomUser, RelatedContent
+from .models import ContentStats, Revision
+from .models import ArticleTag, NewsletterTag
+
+# The subscriber kind and reader field of each subscription table.
+SUBSCRIPTIONS = {
+    CustomUser.subscribed_publishers.through:
+        (audience.PUBLISHER, 'subscribed_publishers'),
+    CustomUser.subscribed_journalists.through:
+        (audience.JOURNALIST, 'subscribed_journalists'),
+    CustomUser.subscribed_tags.through:
+        (audience.TAG, 'subscribed_tags'),
+}
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_save, sender=Newsletter)
+@receiver(post_delete, sender=Article)
+@receiver(post_delete, sender=Newsletter)
+def invalidate_item_feeds(sender, instance, created=True, **kwargs):
+    """
+    Invalidates the cached feeds an article or newsletter appears in
+    when it is created or deleted, or a field feeds show changes.
+    """
+    if created or FEED_FIELDS & instance.changed_fields:
+        bump_item_feeds(instance)
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_save, sender=Newsletter)
+def publish_item_event(sender, instance, **kwargs):
+    """
+    Pushes an event to connected readers when an article or newsletter
+    becomes visible through editor approval or independent publishing.
+    """
+    if getattr(instance, '_newly_published', False):
+        transaction.on_commit(
+            partial(get_broker().publish, make_event(instance)))
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_save, sender=Newsletter)
+def mark_related_content_stale(sender, instance, **kwargs):
+    """
+    Queues a published article or newsletter for indexing by the next
+    build_related_content run when its title or content changes.
+    """
+    if instance.published_at is None or not (
+            {'title', 'content'} & instance.changed_fields):
+        return
+    kind = (
+        RelatedContent.ARTICLE if sender is Article
+        else RelatedContent.NEWSLETTER)
+    RelatedContent.objects.filter(
+        kind=kind, object_id=instance.pk).update(vector=None)
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_save, sender=Newsletter)
+def record_item_revision(sender, instance, created, **kwargs):
+    """
+    Records a revision of a new article or newsletter, or of one whose
+    title or content changed, attributed to the user set as its
+    edited_by.
+    """
+    if created or {'title', 'content'} & instance.changed_fields:
+        record_revision(
+            instance, getattr(instance, 'edited_by', None), created)
+
+
+@receiver(post_delete, sender=Article)
+@receiver(post_delete, sender=Newsletter)
+def delete_item_stats(sender, instance, **kwargs):
+    """Deletes the view counts of a deleted article or newsletter."""
+    kind = (
+        ContentStats.ARTICLE if sender is Article
+        else ContentStats.NEWSLETTER)
+    ContentStats.objects.filter(kind=kind, object_id=instance.pk).delete()
+
+
+@receiver(post_delete, sender=Article)
+@receiver(post_delete, sender=Newsletter)
+def delete_item_revisions(sender, instance, **kwargs):
+    """Deletes the revisions of a deleted article or newsletter."""
+    Revision.objects.filter(
+        kind=kind_of(sender), object_id=instance.pk).delete()
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_save, sender=Newsletter)
+def render_item_thumbnail(sender, instance, **kwargs):
+    """
+    Queues the rendering of the thumbnail of an article or newsletter
+    whose image changed, once the change is committed.
+    """
+    if 'image' not in instance.changed_fields:
+        return
+    if not instance.image:
+        if instance.thumbnail:
+            sender.objects.filter(pk=instance.pk).update(thumbnail='')
+    elif instance.thumbnail.name != thumbnail_name(instance.image.name):
+        transaction.on_commit(partial(
+            schedule_thumbnail, sender, instance.pk, instance.image.name))
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_save, sender=Newsletter)
+def publish_item_tags(sender, instance, created, **kwargs):
+    """
+    Copies the publication time of a published or withdrawn article or
+    newsletter to its tag links, adding it to or removing it from the
+    tag feeds.
+    """
+    if not created and 'published_at' in instance.changed_fields:
+        links, field = tag_links(sender)
+        links.objects.filter(**{field: instance}).update(
+            published_at=instance.published_at)
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_save, sender=Newsletter)
+@receiver(post_delete, sender=Article)
+@receiver(post_delete, sender=Newsletter)
+def invalidate_tag_facets(sender, instance, created=True, **kwargs):
+    """
+    Invalidates the cached facet counts when an article or newsletter
+    is created, published or deleted.
+    """
+    if created or 'published_at' in instance.changed_fields:
+        bump_facet_version()
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+@receiver(m2m_changed, sender=Newsletter.tags.through)
+def item_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Copies publication times to new tag links and invalidates the tag
+    feeds, personal feeds and facet counts when tags are added to or
+    removed from articles and newsletters.
+    """
+    if not action.startswith('post_'):
+        return
+    if action == 'post_add':
+        model = Article if sender is Article.tags.through else Newsletter
+        links, field = tag_links(model)
+        if reverse:
+            links.objects.filter(
+                tag=instance, **{f'{field}__in': pk_set}).update(
+                    published_at=Subquery(model.objects.filter(
+                        pk=OuterRef(f'{field}_id')).values('published_at')))
+        elif instance.published_at is not None:
+            links.objects.filter(
+                **{field: instance, 'tag__in': pk_set}).update(
+                    published_at=instance.published_at)
+    _invalidate_tags()
+
+
+@receiver(post_save, sender=ArticleTag)
+@receiver(post_save, sender=NewsletterTag)
+@receiver(post_delete, sender=ArticleTag)
+@receiver(post_delete, sender=NewsletterTag)
+def tag_link_changed(sender, instance, **kwargs):
+    """
+    Invalidates the tag feeds, personal feeds and facet counts when a
+    tag link is saved or deleted on its own, as in the admin.
+    """
+    _invalidate_tags()
+
+
+def _invalidate_tags():
+    bump_facet_version()
+    bump_feed_version('tag', 'all')
+    bump_feed_version('reader', 'all')
+
+
+@receiver(m2m_changed, sender=CustomUser.subscribed_publishers.through)
+@receiver(m2m_changed, sender=CustomUser.subscribed_journalists.through)
+@receiver(m2m_changed, sender=CustomUser.subscribed_tags.through)
+def invalidate_reader_feed(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    """
+    Invalidates the cached personal feed of readers whose
+    subscriptions changed.
+    """
+    if not action.startswith('post_'):
+        return
+    if not reverse and isinstance(instance, CustomUser):
+        bump_feed_version('reader', instance.pk)
+    elif pk_set is None:
+        # A source dropped all its subscribers, which clear() doesn't
+        # list
+        bump_feed_version('reader', 'all')
+    else:
+        for pk in pk_set:
+            bump_feed_version('reader', pk)
+
+
+@receiver(m2m_changed, sender=CustomUser.subscribed_publishers.through)
+@receiver(m2m_changed, sender=CustomUser.subscribed_journalists.through)
+@receiver(m2m_changed, sender=CustomUser.subscribed_tags.through)
+def invalidate_audience(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Drops the cached subscriber sets of the journalists, publishers and
+    tags whose subscribers changed.
+    """
+    kind, field = SUBSCRIPTIONS[sender]
+    if reverse:
+        # The subscribers of one source changed
+        if action.startswith('post_'):
+            audience.invalidate(kind, [instance.pk])
+    elif action == 'pre_clear':
+        # A reader drops all their subscriptions, which clear() doesn't
+        # list
+        audience.invalidate(
+            kind, getattr(instance, field).values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        audience.invalidate(kind, pk_set)
@@ -0,0 +1,72 @@
+import gzip
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+# Extensions of text based static files worth compressing.
+COMPRESSIBLE_EXTENSIONS = (
+    '.css', '.js', '.map', '.svg', '.html', '.txt', '.json', '.xml')
+# Files smaller than this are not worth compressing.
+MIN_COMPRESS_SIZE = 256
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Static files storage that stores files under content hashed names
+    and writes gzip and brotli compressed variants of text files next
+    to them at collectstatic time, so they can be served pre-compressed
+    with far-future cache headers.
+    """
+    def post_process(self, paths, dry_run=False, **options):
+        processed = []
+        for name, hashed_name, result in super().post_process(
+                paths, dry_run, **options):
+            if hashed_name and not isinstance(result, Exception):
+                processed.append(hashed_name)
+            yield name, hashed_name, result
+
+        if dry_run:
+            return
+        for hashed_name in processed:
+            for variant in self.compress(hashed_name):
+                yield hashed_name, variant, True
+
+    def compress(self, name):
+        """
+        Writes the compressed variants of a stored file that are smaller
+        than the original. Returns the names of the written variants.
+        """
+        if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+            return []
+        with self.open(name) as original:
+            content = original.read()
+        if len(content) < MIN_COMPRESS_SIZE:
+            return []
+
+        # mtime=0 keeps the output identical between runs
+        variants = [('.gz', gzip.compress(content, 9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(content)))
+
+        written = []
+        for suffix, compressed in variants:
+            if len(compressed) >= len(content):
+                continue
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(compressed))
+            written.append(name + suffix)
+        return written
+
+
+def attachment_storage():
+    """
+    Returns the storage of article and newsletter images, configured as
+    STORAGES['attachments'].
+    """
+    return storages['attachments']
@@ -1,8 +1,23 @@
-from django.test import TestCase
+import time
+from io import StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
 from django.urls import reverse
-from rest_framework.test import APIClient
-from rest_framework import status
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework import exceptions, status
+from .authentication import TokenAuthentication, issue_token, revoke_token
+from .authentication import TOKEN_CACHE_TTL, token_cache
+from .factories import role_group
+from .functions.events import events_since, make_event
+from .functions.revisions import get_version
+from .functions.stats import (
+    TRENDING_EPOCH, compute_trending, flush_views)
 from .models import CustomUser, Article, Newsletter, Publisher
+from .models import ContentStats
+from .models import Revision, Tag, ThrottleBucket
 
 
 class ApiReaderViewTests(TestCase):
@@ -113,3 +128,525 @@ class ApiReaderViewTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
         self.assertEqual(
             response.data['error'], 'This view is for Readers only.')
+
+    def test_api_reader_view_fields_projection(self):
+        """
+        Test that the fields parameter limits the serialized fields.
+        """
+        self.reader.subscribed_publishers.add(self.publisher)
+        self.client.force_authenticate(user=self.reader)
+
+        response = self.client.get(self.url, {'fields': 'id,title,summary'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        article = response.data['publishers_articles'][0]
+        self.assertEqual(set(article), {'id', 'title', 'summary'})
+        self.assertEqual(article['summary'], 'Content')
+
+    def test_api_reader_view_unknown_field(self):
+        """
+        Test that unknown fields are rejected.
+        """
+        self.client.force_authenticate(user=self.reader)
+        response = self.client.get(self.url, {'fields': 'id,password'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ThrottlingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse('api_reader_view')
+        self.reader = CustomUser.objects.create_user(
+            username='sue', password='password', role='Reader',
+            email='sue@gmail.com'
+        )
+
+    @override_settings(THROTTLE_RATES={'api_ip': '2/minute'})
+    def test_api_ip_throttle(self):
+        """
+        Test that clients over the IP rate get 429 with Retry-After.
+        """
+        for _ in range(2):
+            response = self.client.get(self.url)
+            self.assertEqual(
+                response.status_code, status.HTTP_403_FORBIDDEN)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(
+            response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+
+    @override_settings(THROTTLE_RATES={'api_ip': '1/minute'}, NUM_PROXIES=1)
+    def test_clients_behind_a_proxy_have_their_own_limit(self):
+        """
+        Test that the client address is read from X-Forwarded-For behind
+        a trusted proxy, ignoring addresses the client set.
+        """
+        def get(forwarded_for):
+            return self.client.get(
+                self.url, HTTP_X_FORWARDED_FOR=forwarded_for).status_code
+
+        self.assertEqual(get('10.0.0.1'), status.HTTP_403_FORBIDDEN)
+        self.assertEqual(get('10.0.0.2'), status.HTTP_403_FORBIDDEN)
+        self.assertEqual(
+            get('1.2.3.4, 10.0.0.1'), status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(THROTTLE_RATES={'api_user': '1/hour'})
+    def test_api_user_throttle(self):
+        """
+        Test that authenticated users over their rate get 429.
+        """
+        self.client.force_authenticate(user=self.reader)
+        self.assertEqual(
+            self.client.get(self.url).status_code, status.HTTP_200_OK)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(
+            response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+
+    @override_settings(
+        THROTTLE_RATES={'api_user': '1/hour'},
+        THROTTLE_STORE='news_app.functions.throttling.DatabaseBucketStore')
+    def test_database_store(self):
+        """
+        Test that the opt-in database store keeps the buckets in rows.
+        """
+        self.client.force_authenticate(user=self.reader)
+        self.assertEqual(
+            self.client.get(self.url).status_code, status.HTTP_200_OK)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(
+            response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertTrue(ThrottleBucket.objects.filter(
+            key=f'api_user:user:{self.reader.pk}').exists())
+
+    @override_settings(THROTTLE_RATES={'login': '1/minute'})
+    def test_login_throttle(self):
+        """
+        Test that repeated login attempts are throttled.
+        """
+        url = reverse('login')
+        data = {'username': 'sue', 'password': 'wrong'}
+        self.assertEqual(self.client.post(url, data).status_code, 200)
+
+        response = self.client.post(url, data)
+
+        self.assertEqual(
+            response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+
+class TokenAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.client = APIClient()
+        self.url = reverse('api_reader_view')
+        self.reader = CustomUser.objects.create_user(
+            username='sue', password='password', role='Reader',
+            email='sue@gmail.com'
+        )
+        self.token, self.key = issue_token(self.reader, 'Phone')
+
+    def test_token_is_hashed_at_rest(self):
+        """
+        Test that the raw token is not stored.
+        """
+        self.assertNotEqual(self.token.key_hash, self.key)
+        self.assertTrue(self.key.startswith(self.token.prefix))
+
+    def test_api_reader_view_with_token(self):
+        """
+        Test that a reader can use the API with a bearer token.
+        """
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.key}')
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_verified_token_is_cached(self):
+        """
+        Test that a verified token is not looked up again until its
+        cache entry expires.
+        """
+        request = APIRequestFactory().get(
+            self.url, HTTP_AUTHORIZATION=f'Bearer {self.key}')
+        authentication = TokenAuthentication()
+        authentication.authenticate(request)
+
+        CustomUser.objects.filter(pk=self.reader.pk).update(is_active=False)
+        with self.assertNumQueries(0):
+            user, _ = authentication.authenticate(request)
+        self.assertEqual(user, self.reader)
+
+        expired = time.monotonic() + TOKEN_CACHE_TTL + 1
+        with mock.patch('time.monotonic', return_value=expired):
+            with self.assertRaises(exceptions.AuthenticationFailed):
+                authentication.authenticate(request)
+
+    def test_token_revoked_elsewhere_is_rejected(self):
+        """
+        Test that a cached token revoked by another process is rejected.
+        """
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.key}')
+        self.client.get(self.url)
+        # Revoked without evicting this process's cache entry
+        with mock.patch.object(token_cache, 'discard'):
+            revoke_token(self.token)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(
+            response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_revoked_token_is_rejected(self):
+        """
+        Test that a revoked token can no longer be used.
+        """
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.key}')
+        self.client.get(self.url)
+        revoke_token(self.token)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(
+            response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_invalid_token_is_rejected(self):
+        """
+        Test that an unknown token is rejected.
+        """
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer invalid')
+        response = self.client.get(self.url)
+
+        self.assertEqual(
+            response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(TRENDING_HALF_LIFE=3600)
+class TrendingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Drop views counted by other tests
+        flush_views()
+        self.journalist = CustomUser.objects.create_user(
+            username='tom', password='password', role='Journalist')
+        self.old, self.new, self.pending = [
+            Article.objects.create(
+                title=title, content="Content",
+                article_author=self.journalist,
+                independent_journalist=independent)
+            for title, independent in [
+                ("Old", True), ("New", True), ("Pending", False)]]
+
+    def view(self, article, count):
+        for _ in range(count):
+            self.client.get(reverse('view_article', args=[article.pk]))
+
+    def test_views_are_buffered_and_flushed_in_batches(self):
+        with self.assertNumQueries(1):
+            self.client.get(reverse('view_article', args=[self.old.pk]))
+        self.assertFalse(ContentStats.objects.exists())
+
+        self.view(self.old, 2)
+        self.view(self.new, 3)
+        self.assertEqual(flush_views(now=TRENDING_EPOCH), 6)
+        self.view(self.new, 1)
+        self.assertEqual(flush_views(now=TRENDING_EPOCH), 1)
+
+        views = dict(ContentStats.objects.filter(
+            kind=ContentStats.ARTICLE).values_list('object_id', 'views'))
+        self.assertEqual(views, {self.old.pk: 3, self.new.pk: 4})
+
+    def test_scores_decay(self):
+        self.view(self.old, 8)
+        flush_views(now=TRENDING_EPOCH)
+        # Two half-lives later 8 old views weigh as much as 2 new ones
+        self.view(self.new, 3)
+        self.view(self.pending, 50)
+        now = TRENDING_EPOCH + 2 * 3600
+        flush_views(now=now)
+
+        articles = compute_trending(now)['articles']
+        self.assertEqual(
+            [item['id'] for item in articles], [self.new.pk, self.old.pk])
+        self.assertAlmostEqual(articles[0]['score'], 3)
+        self.assertAlmostEqual(articles[1]['score'], 2)
+        self.assertEqual(articles[1]['views'], 8)
+
+    @override_settings(TRENDING_SIZE=1)
+    def test_unpublished_and_deleted_items_take_no_place(self):
+        self.view(self.pending, 5)
+        self.view(self.old, 3)
+        self.view(self.new, 1)
+        flush_views(now=TRENDING_EPOCH)
+
+        articles = compute_trending(TRENDING_EPOCH)['articles']
+        self.assertEqual([item['id'] for item in articles], [self.old.pk])
+
+        self.old.delete()
+        self.assertFalse(ContentStats.objects.filter(
+            kind=ContentStats.ARTICLE, object_id=self.old.pk).exists())
+        articles = compute_trending(TRENDING_EPOCH)['articles']
+        self.assertEqual([item['id'] for item in articles], [self.new.pk])
+
+    def test_api_serves_cached_lists(self):
+        self.view(self.old, 1)
+        flush_views()
+        url = reverse('api_trending')
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['title'] for item in response.data['articles']], ["Old"])
+        self.assertEqual(response.data['newsletters'], [])
+
+
+class RecommendationApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.publisher = Publisher.objects.create(name="Test Publisher")
+        self.john, self.tom = [
+            CustomUser.objects.create_user(
+                username=name, password='password', role='Journalist')
+            for name in ('john', 'tom')]
+        self.sue, self.bob = [
+            CustomUser.objects.create_user(
+                username=name, password='password', role='Reader')
+            for name in ('sue', 'bob')]
+        self.sue.subscribed_journalists.set([self.john, self.tom])
+        self.bob.subscribed_journalists.set([self.john])
+        call_command('build_recommendations', stdout=StringIO())
+
+    @override_settings(THROTTLE_RATES={'api_user': None})
+    def test_reader_recommendations(self):
+        self.client.force_authenticate(self.bob)
+        # A single lookup, with throttling off
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('api_recommendations'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(source['type'], source['id']) for source in response.data],
+            [('journalist', self.tom.pk)])
+
+    def test_similar_sources(self):
+        url = reverse('api_similar_sources', args=['journalist', self.tom.pk])
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.data[0]['id'], self.john.pk)
+
+        response = self.client.get(
+            reverse('api_similar_sources', args=['editor', self.tom.pk]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_subscriptions_page_shows_recommendations(self):
+        self.client.force_login(self.bob)
+        response = self.client.get(reverse('manage_subscriptions'))
+        self.assertEqual(
+            response.context['recommended'], [('journalist', self.tom)])
+        self.assertContains(response, "Readers also follow")
+
+
+@override_settings(THROTTLE_RATES={'api_ip': None})
+class TagApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        journalist = CustomUser.objects.create_user(
+            username='tom', password='password', role='Journalist')
+        self.science, self.sport = [
+            Tag.objects.create(name=name.title(), slug=name)
+            for name in ('science', 'sport')]
+        for title, independent, tags in [
+                ("Published", True, [self.science, self.sport]),
+                ("Pending", False, [self.science])]:
+            article = Article.objects.create(
+                title=title, content="Content", article_author=journalist,
+                independent_journalist=independent)
+            article.tags.set(tags)
+
+    def test_tagged_content(self):
+        response = self.client.get(reverse('api_tags'), {'tag': 'science'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [article['title'] for article in response.data['articles']],
+            ["Published"])
+        self.assertEqual(
+            {facet['slug']: facet['article_count']
+             for facet in response.data['tags']},
+            {'science': 1, 'sport': 1})
+
+        response = self.client.get(reverse('api_tags'), {'tag': 'unknown'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(THROTTLE_RATES={'api_user': None})
+    def test_reader_view_lists_tagged_content(self):
+        reader = CustomUser.objects.create_user(
+            username='sue', password='password', role='Reader')
+        reader.subscribed_tags.add(self.science)
+        self.client.force_authenticate(reader)
+
+        response = self.client.get(reverse('api_reader_view'))
+
+        self.assertEqual(
+            [article['title'] for article in response.data['tags_articles']],
+            ["Published"])
+
+    @override_settings(THROTTLE_RATES={'api_user': None})
+    def test_withdrawn_items_leave_listings(self):
+        editor = CustomUser.objects.create_user(
+            username='ed', password='password', role='Editor')
+        role_group('Editor').user_set.add(editor)
+        reader = CustomUser.objects.create_user(
+            username='sue', password='password', role='Reader')
+        reader.subscribed_tags.add(self.science)
+        first = Article.objects.get(title="Published")
+        article = Article.objects.create(
+            title="Approved", content="Content",
+            article_author=first.article_author, editor_approved=True)
+        article.tags.set([self.science])
+        self.client.get(reverse('view_article', args=[article.pk]))
+        flush_views(now=TRENDING_EPOCH)
+        since = make_event(first)['id']
+
+        def listed():
+            self.client.force_authenticate(reader)
+            reader_view = self.client.get(reverse('api_reader_view')).data
+            self.client.force_authenticate(None)
+            tagged = self.client.get(
+                reverse('api_tags'), {'tag': 'science'}).data
+            feed = self.client.get(reverse('tag_rss', args=[self.science.pk]))
+            return [
+                sorted(item['title'] for item in tagged['articles']),
+                sorted(
+                    item['title'] for item in reader_view['tags_articles']),
+                "Approved" in feed.content.decode(),
+                [item['title'] for item in
+                 compute_trending(TRENDING_EPOCH)['articles']],
+                [event['title'] for event in events_since(since)],
+            ]
+
+        self.assertEqual(listed(), [
+            ["Approved", "Published"], ["Approved", "Published"], True,
+            ["Approved"], ["Approved"]])
+
+        self.client.force_login(editor)
+        self.client.post(
+            reverse('edit_article', args=[article.pk]),
+            {'title': "Approved", 'content': "Content",
+             'tags': [self.science.pk]})
+        article.refresh_from_db()
+        self.assertIsNone(article.published_at)
+        self.assertEqual(listed(), [
+            ["Published"], ["Published"], False, [], []])
+
+
+@override_settings(
+    THROTTLE_RATES={'api_user': None}, REVISION_SNAPSHOT_INTERVAL=3)
+class RevisionApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.journalist = CustomUser.objects.create_user(
+            username='tom', password='password', role='Journalist')
+        role_group('Journalist').user_set.add(self.journalist)
+        self.article = Article.objects.create(
+            title="Draft", content="One two three.\nFour five six.",
+            article_author=self.journalist)
+        self.client.force_login(self.journalist)
+        self.contents = [self.article.content]
+        for i in range(5):
+            content = self.contents[-1] + f"\nLine {i}."
+            self.client.post(
+                reverse('edit_article', args=[self.article.pk]),
+                {'title': f"Title {i}", 'content': content})
+            self.contents.append(content)
+
+    def url(self, name, *args):
+        return reverse(name, args=['article', self.article.pk, *args])
+
+    def test_edits_are_stored_as_deltas_between_snapshots(self):
+        revisions = Revision.objects.filter(
+            object_id=self.article.pk).order_by('number')
+        self.assertEqual(
+            [revision.snapshot for revision in revisions],
+            [True, False, False, True, False, False])
+        self.assertEqual(revisions[5].author, self.journalist)
+        # A delta is smaller than the content it rebuilds
+        self.assertLess(len(revisions[5].data), len(self.contents[5]))
+
+    def test_unchanged_edit_records_no_revision(self):
+        self.client.post(
+            reverse('edit_article', args=[self.article.pk]),
+            {'title': "Title 4", 'content': self.contents[-1]})
+        self.assertEqual(
+            Revision.objects.filter(object_id=self.article.pk).count(), 6)
+
+    def test_saves_of_one_item_are_numbered_in_turn(self):
+        first = Article.objects.get(pk=self.article.pk)
+        second = Article.objects.get(pk=self.article.pk)
+        first.title, second.title = "First", "Second"
+        with mock.patch.object(
+                QuerySet, 'select_for_update', autospec=True,
+                side_effect=QuerySet.select_for_update) as lock:
+            first.save()
+            second.save()
+        # The item row is locked before the next number is read
+        self.assertEqual(
+            [call.args[0].model for call in lock.call_args_list],
+            [Article, Article])
+        self.assertEqual(
+            [(revision.number, revision.title) for revision in
+             Revision.objects.filter(number__gt=6).order_by('number')],
+            [(7, "First"), (8, "Second")])
+
+    def test_list_revisions(self):
+        response = self.client.get(self.url('api_revisions'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [revision['number'] for revision in response.data],
+            [6, 5, 4, 3, 2, 1])
+        self.assertEqual(response.data[0]['title'], "Title 4")
+        self.assertEqual(response.data[0]['author'], 'tom')
+
+    def test_fetch_every_revision(self):
+        for number, content in enumerate(self.contents, 1):
+            response = self.client.get(self.url('api_revision', number))
+            self.assertEqual(response.data['content'], content)
+            # One query reads a snapshot and at most two deltas
+            with self.assertNumQueries(1):
+                get_version(Revision.ARTICLE, self.article.pk, number)
+
+        response = self.client.get(self.url('api_revision', 7))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_diff_revisions(self):
+        response = self.client.get(self.url('api_revision_diff', 2, 4))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['diff'].endswith(
+            "\n Line 0.\n+Line 1.\n+Line 2."))
+
+    def test_revisions_are_for_editors_and_journalists(self):
+        reader = CustomUser.objects.create_user(
+            username='sue', password='password', role='Reader')
+        role_group('Reader').user_set.add(reader)
+        self.client.force_login(reader)
+        response = self.client.get(self.url('api_revisions'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_login(self.journalist)
+        response = self.client.get(
+            reverse('api_revisions', args=['podcast', self.article.pk]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_deleting_an_item_deletes_its_revisions(self):
+        self.article.delete()
+        self.assertFalse(Revision.objects.exists())
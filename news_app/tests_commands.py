@@ -0,0 +1,409 @@
+import tempfile
+from io import StringIO
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+from django.conf import settings
+from django.core import mail
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from .checks import check_performance_settings, fail_fast
+from .functions.recommendations import get_recommendations
+from .functions.revisions import get_version
+from .functions.templates import template_names
+from .models import CustomUser, Article, Newsletter, Publisher, Recommendation
+from .models import ArchivedArticle, ArchivedNewsletter, RelatedContent
+from .models import ContentStats, Revision, Tag
+
+
+class SendDigestsCommandTests(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.checkpoint = str(Path(self.tmp_dir.name) / 'digest.json')
+        self.publisher = Publisher.objects.create(name="Test Publisher")
+        self.journalist = CustomUser.objects.create_user(
+            username='john', password='password', role='Journalist',
+            publisher=self.publisher, email='john@gmail.com'
+        )
+        yesterday = timezone.now() - timedelta(days=2)
+        self.reader = CustomUser.objects.create_user(
+            username='sue', password='password', role='Reader',
+            email='sue@gmail.com', digest_frequency='daily',
+            last_digest_sent=yesterday
+        )
+        self.reader.subscribed_publishers.add(self.publisher)
+        self.immediate_reader = CustomUser.objects.create_user(
+            username='tom', password='password', role='Reader',
+            email='tom@gmail.com'
+        )
+        self.immediate_reader.subscribed_publishers.add(self.publisher)
+
+        Article.objects.create(
+            title="Approved Article", content="Content",
+            article_author=self.journalist, editor_approved=True)
+        Newsletter.objects.create(
+            title="Approved Newsletter", content="Content",
+            newsletter_author=self.journalist, editor_approved=True)
+        Article.objects.create(
+            title="Pending Article", content="Content",
+            article_author=self.journalist)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_send_digests(self):
+        """
+        Test that due digest readers get one digest of their new items.
+        """
+        call_command(
+            'send_digests', frequency='daily', checkpoint=self.checkpoint,
+            stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['sue@gmail.com'])
+        self.assertIn('Approved Article', mail.outbox[0].body)
+        self.assertIn('Approved Newsletter', mail.outbox[0].body)
+        self.assertNotIn('Pending Article', mail.outbox[0].body)
+        self.reader.refresh_from_db()
+        self.assertGreater(
+            self.reader.last_digest_sent,
+            timezone.now() - timedelta(minutes=1))
+        # The checkpoint is removed once the run completes
+        self.assertFalse(Path(self.checkpoint).exists())
+
+    def test_send_digests_includes_subscribed_tags(self):
+        """
+        Test that digests list the published items carrying a tag the
+        reader follows.
+        """
+        tag = Tag.objects.create(name="Science", slug='science')
+        self.reader.subscribed_publishers.clear()
+        self.reader.subscribed_tags.add(tag)
+        other = CustomUser.objects.create_user(
+            username='ann', password='password', role='Journalist')
+        Article.objects.create(
+            title="Untagged Article", content="Content",
+            article_author=other, independent_journalist=True)
+        article = Article.objects.create(
+            title="Tagged Article", content="Content",
+            article_author=other, independent_journalist=True)
+        article.tags.add(tag)
+
+        call_command(
+            'send_digests', frequency='daily', checkpoint=self.checkpoint,
+            stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('Tagged Article', mail.outbox[0].body)
+        self.assertNotIn('Untagged Article', mail.outbox[0].body)
+        self.assertNotIn('Approved Article', mail.outbox[0].body)
+
+    def test_send_digests_is_not_repeated(self):
+        """
+        Test that a reader is not sent the same digest twice.
+        """
+        for _ in range(2):
+            call_command(
+                'send_digests', frequency='daily',
+                checkpoint=self.checkpoint, stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class BuildRecommendationsCommandTests(TestCase):
+    def setUp(self):
+        self.publisher = Publisher.objects.create(name="Test Publisher")
+        self.john, self.tom, self.ann = [
+            CustomUser.objects.create_user(
+                username=name, password='password', role='Journalist')
+            for name in ('john', 'tom', 'ann')]
+        self.sue, self.bob, self.eve = [
+            CustomUser.objects.create_user(
+                username=name, password='password', role='Reader')
+            for name in ('sue', 'bob', 'eve')]
+        # john and tom are followed together most often
+        self.sue.subscribed_journalists.set([self.john, self.tom])
+        self.bob.subscribed_journalists.set([self.john, self.tom, self.ann])
+        self.bob.subscribed_publishers.set([self.publisher])
+        self.eve.subscribed_journalists.set([self.john])
+
+    def test_builds_source_and_reader_recommendations(self):
+        out = StringIO()
+        call_command('build_recommendations', '--batch-size', '2', stdout=out)
+        # Three journalists, a publisher and the two readers not
+        # following everything
+        self.assertIn("Stored 6 recommendation(s).", out.getvalue())
+
+        similar = get_recommendations(Recommendation.JOURNALIST, self.john.pk)
+        self.assertEqual(
+            [(source['type'], source['id']) for source in similar],
+            [('journalist', self.tom.pk), ('journalist', self.ann.pk),
+             ('publisher', self.publisher.pk)])
+        self.assertAlmostEqual(similar[0]['score'], 2 / 6 ** 0.5, 4)
+
+        # Recommendations leave out the sources a reader follows
+        recommended = get_recommendations(Recommendation.READER, self.eve.pk)
+        self.assertEqual(recommended[0]['id'], self.tom.pk)
+        self.assertNotIn(
+            self.john.pk,
+            [source['id'] for source in recommended
+             if source['type'] == 'journalist'])
+        self.assertEqual(
+            get_recommendations(Recommendation.READER, self.bob.pk), [])
+
+    def test_rebuild_replaces_recommendations(self):
+        call_command('build_recommendations', stdout=StringIO())
+        CustomUser.subscribed_journalists.through.objects.all().delete()
+        CustomUser.subscribed_publishers.through.objects.all().delete()
+        call_command('build_recommendations', stdout=StringIO())
+        self.assertFalse(Recommendation.objects.exists())
+
+
+class BuildRelatedContentCommandTests(TestCase):
+    def setUp(self):
+        self.journalist = CustomUser.objects.create_user(
+            username='john', password='password', role='Journalist')
+        self.rain, self.storm, self.football = [
+            Article.objects.create(
+                title=title, content=content, independent_journalist=True,
+                article_author=self.journalist)
+            for title, content in [
+                ("Heavy rain expected", "<p>Rain and wind tonight.</p>"),
+                ("Storm warning", "<p>Wind and heavy rain tomorrow.</p>"),
+                ("Football final", "<p>The final ends in a draw.</p>"),
+            ]]
+        self.newsletter = Newsletter.objects.create(
+            title="Weekly weather", content="Rain, wind and a storm.",
+            independent_journalist=True, newsletter_author=self.journalist)
+
+    def build(self, *args):
+        out = StringIO()
+        call_command('build_related_content', *args, stdout=out)
+        return out.getvalue()
+
+    def related(self, article):
+        return [
+            (item['type'], item['id']) for item in RelatedContent.objects.get(
+                kind=RelatedContent.ARTICLE, object_id=article.pk).related]
+
+    def test_related_items_by_similarity(self):
+        self.assertIn("Indexed 4 item(s)", self.build())
+        related = self.related(self.rain)
+        self.assertEqual(related[0], ('article', self.storm.pk))
+        self.assertIn(('newsletter', self.newsletter.pk), related)
+        self.assertNotIn(('article', self.rain.pk), related)
+        self.assertNotIn(('article', self.football.pk), related)
+
+        response = self.client.get(
+            reverse('view_article', args=[self.rain.pk]))
+        self.assertContains(response, "Storm warning")
+
+    def test_incremental_build_indexes_changed_items(self):
+        self.build()
+        self.assertIn("Indexed 0 item(s)", self.build())
+
+        # A newly published item is indexed and listed by its neighbours
+        match = Article.objects.create(
+            title="Football semi final", content="<p>A final goal.</p>",
+            independent_journalist=True, article_author=self.journalist)
+        self.assertIn("Indexed 1 item(s)", self.build())
+        self.assertEqual(self.related(self.football)[0], ('article', match.pk))
+
+        # A changed item is indexed again
+        self.storm.content = "<p>Football match postponed.</p>"
+        self.storm.title = "Football postponed"
+        self.storm.save()
+        self.assertIn("Indexed 1 item(s)", self.build())
+        self.assertIn(('article', self.storm.pk), self.related(match))
+
+        # Deleted items are removed from the lists
+        match.delete()
+        self.assertIn("removed 1", self.build())
+        self.assertNotIn(('article', match.pk), self.related(self.football))
+
+
+@override_settings(REVISION_SNAPSHOT_INTERVAL=4)
+class CompactRevisionsCommandTests(TestCase):
+    def setUp(self):
+        journalist = CustomUser.objects.create_user(
+            username='john', password='password', role='Journalist')
+        paragraphs = [
+            f"<p>Paragraph {i} of a long article about the weather.</p>\n"
+            for i in range(200)]
+        self.article = Article.objects.create(
+            title="Weather", content=''.join(paragraphs),
+            article_author=journalist)
+        self.contents = [self.article.content]
+        for i in range(9):
+            paragraphs[i * 20] = f"<p>Paragraph {i * 20} was edited.</p>\n"
+            self.article.content = ''.join(paragraphs)
+            self.article.save()
+            self.contents.append(self.article.content)
+
+    def revisions(self):
+        return list(Revision.objects.filter(
+            object_id=self.article.pk).order_by('number'))
+
+    def contents_of(self, revisions):
+        return [
+            get_version(Revision.ARTICLE, self.article.pk, r.number)[1]
+            for r in revisions]
+
+    def test_edits_cost_a_fraction_of_the_content(self):
+        revisions = self.revisions()
+        self.assertEqual(
+            [r.number for r in revisions if r.snapshot], [1, 5, 9])
+        deltas = [len(r.data) for r in revisions if not r.snapshot]
+        self.assertLess(max(deltas), len(self.contents[0]) / 50)
+        self.assertEqual(self.contents_of(revisions), self.contents)
+
+    def test_history_of_existing_items_starts_with_the_replaced_version(self):
+        Revision.objects.all().delete()
+        article = Article.objects.get(pk=self.article.pk)
+        article.content = "Rewritten."
+        article.save()
+        revisions = self.revisions()
+        self.assertEqual([r.number for r in revisions], [1, 2])
+        self.assertEqual(
+            self.contents_of(revisions), [self.contents[-1], "Rewritten."])
+
+    def test_compaction_keeps_the_latest_revisions(self):
+        out = StringIO()
+        with override_settings(REVISION_SNAPSHOT_INTERVAL=2):
+            call_command('compact_revisions', '--keep', '5', stdout=out)
+        self.assertIn("dropped 5", out.getvalue())
+
+        revisions = self.revisions()
+        self.assertEqual([r.number for r in revisions], [6, 7, 8, 9, 10])
+        self.assertEqual(
+            [r.snapshot for r in revisions],
+            [True, False, True, False, True])
+        self.assertEqual(self.contents_of(revisions), self.contents[5:])
+
+    def test_compaction_by_age_keeps_the_latest_revision(self):
+        Revision.objects.update(
+            created_at=timezone.now() - timedelta(days=60))
+        call_command('compact_revisions', '--days', '30', stdout=StringIO())
+        [revision] = self.revisions()
+        self.assertEqual(revision.number, 10)
+        self.assertTrue(revision.snapshot)
+        self.assertEqual(self.contents_of([revision]), self.contents[-1:])
+
+
+class ArchiveContentCommandTests(TestCase):
+    def setUp(self):
+        self.journalist = CustomUser.objects.create_user(
+            username='john', password='password', role='Journalist')
+        self.tag = Tag.objects.create(name="Weather", slug='weather')
+        self.old, self.recent, self.draft = [
+            Article.objects.create(
+                title=title, content="Rain.", article_author=self.journalist,
+                independent_journalist=independent)
+            for title, independent in [
+                ("Old news", True), ("Recent news", True),
+                ("Old draft", False)]]
+        self.old.tags.add(self.tag)
+        self.newsletter = Newsletter.objects.create(
+            title="Old newsletter", content="Wind.",
+            independent_journalist=True, newsletter_author=self.journalist)
+        ContentStats.objects.create(
+            kind=ContentStats.ARTICLE, object_id=self.old.pk, views=3)
+        long_ago = timezone.now() - timedelta(days=400)
+        Article.objects.filter(pk=self.old.pk).update(published_at=long_ago)
+        Newsletter.objects.update(published_at=long_ago)
+
+    def archive(self):
+        out = StringIO()
+        call_command(
+            'archive_content', '--days', '365', '--batch-size', '1',
+            stdout=out)
+        return out.getvalue()
+
+    def test_old_items_are_moved_to_the_archive(self):
+        self.assertIn(
+            "Archived 1 article(s) and 1 newsletter(s)", self.archive())
+
+        self.assertEqual(
+            set(Article.objects.values_list('title', flat=True)),
+            {"Recent news", "Old draft"})
+        self.assertFalse(Newsletter.objects.exists())
+        archived = ArchivedArticle.objects.get()
+        self.assertEqual(
+            (archived.pk, archived.title, archived.tag_ids),
+            (self.old.pk, "Old news", [self.tag.pk]))
+        self.assertEqual(
+            ArchivedNewsletter.objects.get().pk, self.newsletter.pk)
+        self.assertFalse(ContentStats.objects.filter(
+            kind=ContentStats.ARTICLE, object_id=self.old.pk).exists())
+        # The history of archived items is kept
+        self.assertTrue(Revision.objects.filter(
+            kind=Revision.ARTICLE, object_id=self.old.pk).exists())
+        self.assertIn("Archived 0 article(s)", self.archive())
+
+    def test_archived_items_stay_reachable(self):
+        self.archive()
+        response = self.client.get(reverse('article_list'))
+        self.assertNotContains(response, "Old news")
+        self.assertContains(response, "Recent news")
+
+        response = self.client.get(
+            reverse('view_article', args=[self.old.pk]))
+        self.assertContains(response, "Old news")
+        self.assertContains(response, "This article has been archived.")
+        response = self.client.get(
+            reverse('view_newsletter', args=[self.newsletter.pk]))
+        self.assertContains(response, "Old newsletter")
+
+        response = self.client.get(reverse('view_article', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+
+class CheckTemplatesCommandTests(SimpleTestCase):
+    def test_compiles_app_templates(self):
+        out = StringIO()
+        call_command('check_templates', stdout=out)
+        self.assertIn(f"Compiled {len(template_names())}", out.getvalue())
+        self.assertIn('news_app/article_list.html', template_names())
+
+    def test_reports_syntax_errors(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            Path(tmp_dir, 'broken.html').write_text('{% if %}')
+            templates = [{
+                'BACKEND': 'django.template.backends.django.DjangoTemplates',
+                'DIRS': [tmp_dir],
+            }]
+            with override_settings(TEMPLATES=templates), mock.patch(
+                    'news_app.management.commands.check_templates.'
+                    'template_names', return_value=['broken.html']):
+                with self.assertRaises(CommandError):
+                    call_command('check_templates', stderr=StringIO())
+
+
+class PerformanceChecksTests(SimpleTestCase):
+    def test_development_settings_are_reported(self):
+        with override_settings(DEBUG=True):
+            ids = {message.id for message in check_performance_settings()}
+        self.assertIn('news_app.E001', ids)
+        self.assertIn('news_app.E005', ids)
+        self.assertIn('news_app.E006', ids)
+        with override_settings(DEBUG=True), self.assertRaises(
+                ImproperlyConfigured):
+            fail_fast()
+
+    @override_settings(
+        DEBUG=False, SECRET_KEY='a-long-and-random-production-key',
+        ALLOWED_HOSTS=['news.example.com'], CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': 'redis://localhost:6379'}})
+    def test_production_settings_pass(self):
+        with mock.patch.dict(
+                settings.DATABASES['default'], {'CONN_MAX_AGE': 60}):
+            errors = [
+                message for message in check_performance_settings()
+                if message.is_serious()]
+            self.assertEqual(errors, [])
+            fail_fast()
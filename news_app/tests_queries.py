@@ -0,0 +1,298 @@
+import asyncio
+from io import StringIO
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models.signals import post_save
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from .factories import build_graph, make_users
+from .functions.pagination import EstimatedCountPaginator
+from .models import Article, ContentStats, Newsletter, Tag
+from .storage import attachment_storage
+
+
+class QueryCountTests(TestCase):
+    """
+    Pins the number of queries of every view on a graph with many
+    users and items, so a query added per listed row shows up as a
+    failing test.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.graph = build_graph()
+        cls.reader = cls.graph.readers[0]
+        cls.journalist = cls.graph.journalists[0]
+        cls.editor = cls.graph.editors[0]
+        cls.article = Article.objects.filter(
+            article_author=cls.journalist, editor_approved=True).first()
+        cls.newsletter = Newsletter.objects.filter(
+            newsletter_author=cls.journalist, editor_approved=True).first()
+        articles = Article.objects.filter(editor_approved=True)[:10]
+        newsletters = Newsletter.objects.filter(editor_approved=True)[:10]
+        ContentStats.objects.bulk_create(
+            [ContentStats(kind=ContentStats.ARTICLE, object_id=item.pk,
+                          views=1, log_score=1.0) for item in articles]
+            + [ContentStats(kind=ContentStats.NEWSLETTER, object_id=item.pk,
+                            views=1, log_score=1.0) for item in newsletters])
+        cls.tag = Tag.objects.create(name="Science", slug='science')
+        cls.tag.articles.add(*articles)
+        cls.tag.newsletters.add(*newsletters)
+        call_command('build_recommendations', stdout=StringIO())
+        for i in range(3):
+            cls.article.title = f"Revised {i}"
+            cls.article.content += f"\nRevised {i}."
+            cls.article.edited_by = cls.journalist
+            cls.article.save()
+
+    def setUp(self):
+        # Cached views are measured with a cold cache
+        cache.clear()
+
+    def assertViewQueries(
+            self, num, user, name, *args, status=200, data=None):
+        if user is not None:
+            self.client.force_login(user)
+        url = reverse(name, args=args)
+        with self.assertNumQueries(num):
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, status)
+
+    def test_article_list(self):
+        self.assertViewQueries(3, None, 'article_list')
+
+    def test_register_user(self):
+        self.assertViewQueries(0, None, 'register')
+
+    def test_login_user(self):
+        self.assertViewQueries(0, None, 'login')
+
+    def test_logout_user(self):
+        self.assertViewQueries(4, self.reader, 'logout')
+
+    def test_change_password_user(self):
+        self.assertViewQueries(2, self.reader, 'change_password')
+
+    def test_add_article(self):
+        self.assertViewQueries(6, self.journalist, 'add_article')
+
+    def test_view_article(self):
+        self.assertViewQueries(1, None, 'view_article', self.article.pk)
+
+    def test_edit_article(self):
+        self.assertViewQueries(
+            7, self.journalist, 'edit_article', self.article.pk)
+
+    def test_delete_article(self):
+        self.assertViewQueries(
+            5, self.journalist, 'delete_article', self.article.pk)
+
+    def test_add_newsletter(self):
+        self.assertViewQueries(6, self.journalist, 'add_newsletter')
+
+    def test_view_newsletter(self):
+        self.assertViewQueries(
+            1, None, 'view_newsletter', self.newsletter.pk)
+
+    def test_edit_newsletter(self):
+        self.assertViewQueries(
+            7, self.journalist, 'edit_newsletter', self.newsletter.pk)
+
+    def test_delete_newsletter(self):
+        self.assertViewQueries(
+            5, self.journalist, 'delete_newsletter', self.newsletter.pk)
+
+    def test_approval_queue(self):
+        self.assertViewQueries(7, self.editor, 'approval_queue')
+
+    def test_manage_subscriptions(self):
+        self.assertViewQueries(9, self.reader, 'manage_subscriptions')
+
+    def test_api_tokens(self):
+        self.assertViewQueries(3, self.reader, 'api_tokens')
+
+    def test_password_reset_request(self):
+        self.assertViewQueries(0, None, 'password_reset_request')
+
+    def test_password_reset_confirm(self):
+        uid = urlsafe_base64_encode(force_bytes(self.reader.pk))
+        token = default_token_generator.make_token(self.reader)
+        self.assertViewQueries(
+            1, None, 'password_reset_confirm', uid, token)
+
+    def test_api_reader_view(self):
+        # The throttle buckets are kept in the cache
+        self.assertViewQueries(8, self.reader, 'api_reader_view')
+
+    def test_api_throttle_metrics(self):
+        admin = make_users('Reader', 1, 'admin', is_staff=True)[0]
+        self.assertViewQueries(2, admin, 'api_throttle_metrics')
+
+    def test_serve_attachment(self):
+        name = attachment_storage().save(
+            'images/query_count.png', ContentFile(b'image'))
+        self.addCleanup(attachment_storage().delete, name)
+        Article.objects.filter(pk=self.article.pk).update(image=name)
+        self.assertViewQueries(
+            1, None, 'serve_attachment', 'article', self.article.pk,
+            'image')
+
+    def test_api_tags(self):
+        self.assertViewQueries(
+            4, None, 'api_tags', data={'tag': self.tag.slug})
+
+    def test_api_trending(self):
+        self.assertViewQueries(4, None, 'api_trending')
+
+    def test_api_recommendations(self):
+        self.assertViewQueries(3, self.reader, 'api_recommendations')
+
+    def test_api_similar_sources(self):
+        self.assertViewQueries(
+            1, None, 'api_similar_sources', 'journalist',
+            self.journalist.pk)
+
+    def test_api_revisions(self):
+        self.assertViewQueries(
+            5, self.journalist, 'api_revisions', 'article', self.article.pk)
+
+    def test_api_revision(self):
+        self.assertViewQueries(
+            6, self.journalist, 'api_revision', 'article', self.article.pk,
+            2)
+
+    def test_api_revision_diff(self):
+        self.assertViewQueries(
+            6, self.journalist, 'api_revision_diff', 'article',
+            self.article.pk, 1, 3)
+
+    def test_content_events(self):
+        self.async_client.force_login(self.reader)
+
+        async def open_stream():
+            response = await self.async_client.get(reverse('content_events'))
+            stream = aiter(response.streaming_content)
+            await asyncio.wait_for(anext(stream), 1)
+            await stream.aclose()
+            return response
+
+        # The view's queries run in this thread, so they are counted
+        with self.assertNumQueries(4):
+            response = async_to_sync(open_stream)()
+        self.assertEqual(response.status_code, 200)
+
+    def test_admin_changelists(self):
+        admin = make_users(
+            'Reader', 1, 'admin', is_staff=True, is_superuser=True)[0]
+        for name, num in [
+                ('admin:news_app_article_changelist', 4),
+                ('admin:news_app_newsletter_changelist', 4),
+                ('admin:news_app_customuser_changelist', 4)]:
+            with self.subTest(name):
+                self.assertViewQueries(num, admin, name)
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.graph = build_graph()
+
+    @mock.patch(
+        'news_app.functions.pagination.table_row_estimate',
+        return_value=5000000)
+    def test_large_unfiltered_table_is_estimated(self, estimate):
+        paginator = EstimatedCountPaginator(Article.objects.all(), 100)
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.count, 5000000)
+
+        # Filtered results are counted exactly
+        paginator = EstimatedCountPaginator(
+            Article.objects.filter(editor_approved=True), 100)
+        self.assertEqual(
+            paginator.count,
+            Article.objects.filter(editor_approved=True).count())
+
+    def test_small_table_is_counted(self):
+        paginator = EstimatedCountPaginator(Article.objects.all(), 100)
+        # SQLite keeps no table statistics
+        self.assertEqual(paginator.count, Article.objects.count())
+
+
+class TrackedFieldsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.graph = build_graph()
+        cls.journalist = cls.graph.journalists[0]
+        cls.article = Article.objects.filter(
+            article_author=cls.journalist, editor_approved=False).first()
+
+    def updates(self, queries):
+        return [
+            query['sql'] for query in queries
+            if query['sql'].startswith('UPDATE "news_app_article"')]
+
+    def test_unchanged_save_is_skipped(self):
+        article = Article.objects.get(pk=self.article.pk)
+        self.assertEqual(article.changed_fields, set())
+        with self.assertNumQueries(0):
+            article.save()
+
+    def test_only_changed_fields_are_written(self):
+        article = Article.objects.get(pk=self.article.pk)
+        article.title = "New title"
+        self.assertEqual(article.changed_fields, {'title'})
+        with CaptureQueriesContext(connection) as queries:
+            article.save()
+        [update] = self.updates(queries)
+        self.assertIn('"title"', update)
+        self.assertNotIn('"content"', update)
+        self.assertEqual(article.changed_fields, set())
+
+        article.refresh_from_db()
+        self.assertEqual(article.title, "New title")
+        self.assertEqual(article.changed_fields, set())
+
+    def test_deferred_fields_are_not_loaded(self):
+        # Starts the revision history, which the next revision's content
+        # is then taken from
+        article = Article.objects.get(pk=self.article.pk)
+        article.title = "First title"
+        article.save()
+
+        article = Article.objects.defer('content').get(pk=self.article.pk)
+        article.title = "New title"
+        with CaptureQueriesContext(connection) as queries:
+            article.save()
+        [update] = self.updates(queries)
+        self.assertNotIn('"content"', update)
+        self.assertEqual(article.get_deferred_fields(), {'content'})
+
+    def test_changed_fields_during_post_save(self):
+        seen = []
+
+        def receiver(sender, instance, **kwargs):
+            seen.append(instance.changed_fields)
+        post_save.connect(receiver, sender=Article)
+        self.addCleanup(post_save.disconnect, receiver, sender=Article)
+
+        article = Article.objects.get(pk=self.article.pk)
+        article.content = "Rewritten"
+        article.save()
+        self.assertEqual(seen, [{'content', 'summary'}])
+
+    def test_unchanged_edit_form_writes_nothing(self):
+        self.client.force_login(self.journalist)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse('edit_article', args=[self.article.pk]),
+                {'title': self.article.title,
+                 'content': self.article.content})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.updates(queries), [])
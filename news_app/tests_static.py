@@ -0,0 +1,59 @@
+import gzip
+import tempfile
+from pathlib import Path
+from django.test import SimpleTestCase
+from project_news.static import IMMUTABLE, StaticFiles
+from .storage import CompressedManifestStaticFilesStorage
+
+
+class StaticFilesTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name) / 'static'
+        self.root.mkdir()
+        (self.root / 'site.css').write_text('body { color: red; }\n' * 50)
+        self.storage = CompressedManifestStaticFilesStorage(
+            location=self.root, base_url='/static/')
+        self.files = StaticFiles(self.root, '/static/')
+
+    def test_compress_writes_smaller_variants(self):
+        written = self.storage.compress('site.css')
+        self.assertIn('site.css.gz', written)
+        original = (self.root / 'site.css').read_bytes()
+        compressed = (self.root / 'site.css.gz').read_bytes()
+        self.assertEqual(gzip.decompress(compressed), original)
+
+    def test_serves_preferred_variant(self):
+        self.storage.compress('site.css')
+        status, headers, filename = self.files.respond(
+            '/static/site.css', 'gzip, deflate', '')
+        self.assertEqual(status, 200)
+        self.assertEqual(dict(headers)['Content-Encoding'], 'gzip')
+        self.assertEqual(filename.name, 'site.css.gz')
+
+        status, headers, filename = self.files.respond(
+            '/static/site.css', '', '')
+        self.assertNotIn('Content-Encoding', dict(headers))
+        self.assertEqual(filename.name, 'site.css')
+
+    def test_hashed_names_are_immutable(self):
+        (self.root / 'site.0123456789ab.css').write_text('body {}')
+        _, headers, _ = self.files.respond(
+            '/static/site.0123456789ab.css', '', '')
+        self.assertEqual(dict(headers)['Cache-Control'], IMMUTABLE)
+
+    def test_unchanged_file_is_not_modified(self):
+        _, headers, _ = self.files.respond('/static/site.css', '', '')
+        status, _, filename = self.files.respond(
+            '/static/site.css', '', dict(headers)['ETag'])
+        self.assertEqual(status, 304)
+        self.assertIsNone(filename)
+
+    def test_paths_outside_root_are_not_served(self):
+        (self.root.parent / 'secret.txt').write_text('secret')
+        self.assertIsNone(
+            self.files.respond('/static/../secret.txt', '', ''))
+        self.assertIsNone(
+            self.files.respond('/static/%2e%2e/secret.txt', '', ''))
+        self.assertIsNone(self.files.respond('/static/missing.css', '', ''))
@@ -0,0 +1,784 @@
+import asyncio
+import gzip
+import json
+import logging
+import random
+import tempfile
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
+import brotli
+from django.contrib.auth.models import Permission
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from .feeds import reader_feed_token
+from .functions.audience import ReaderSet, audience
+from .functions.events import EventBroker, InProcessBackend, make_event
+from .functions.events import MAX_CONNECTIONS_PER_USER, TooManyConnections
+from .functions.media import parse_range, thumbnail_name
+from .functions.profiling import list_profiles, make_profile_token
+from .log import (
+    JsonFormatter, QueueJsonHandler, RequestContextFilter, get_event_counts,
+    request_context)
+from .middleware import CompressionMiddleware, ProfilingMiddleware
+from .models import CustomUser, Article, Newsletter, Publisher, Tag
+
+
+class ApprovalQueueTests(TestCase):
+    def setUp(self):
+        self.url = reverse('approval_queue')
+        self.publisher = Publisher.objects.create(name="Test Publisher")
+        self.other_publisher = Publisher.objects.create(name="Other")
+
+        self.editor = CustomUser.objects.create_user(
+            username='ed', password='password', role='Editor',
+            publisher=self.publisher, email='ed@gmail.com'
+        )
+        self.editor.user_permissions.add(
+            Permission.objects.get(codename='change_article'))
+        self.journalist = CustomUser.objects.create_user(
+            username='john', password='password', role='Journalist',
+            publisher=self.publisher, email='john@gmail.com'
+        )
+        self.other_journalist = CustomUser.objects.create_user(
+            username='jane', password='password', role='Journalist',
+            publisher=self.other_publisher, email='jane@gmail.com'
+        )
+        self.readers = [
+            CustomUser.objects.create_user(
+                username=f'reader{i}', password='password', role='Reader',
+                email=f'reader{i}@gmail.com')
+            for i in range(3)]
+        for reader in self.readers:
+            reader.subscribed_publishers.add(self.publisher)
+
+        self.articles = [
+            Article.objects.create(
+                title=f"Article {i}", content="Content",
+                article_author=self.journalist)
+            for i in range(3)]
+        self.newsletter = Newsletter.objects.create(
+            title="Newsletter", content="Content",
+            newsletter_author=self.journalist)
+        self.other_article = Article.objects.create(
+            title="Other Article", content="Content",
+            article_author=self.other_journalist)
+
+        self.client.force_login(self.editor)
+
+    def test_queue_lists_only_own_publisher_items(self):
+        """
+        Test that the queue is scoped to the editor's publisher.
+        """
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            set(response.context['pending_articles']), set(self.articles))
+        self.assertNotIn(
+            self.other_article, response.context['pending_articles'])
+
+    @mock.patch('news_app.functions.notifications.Tweet')
+    def test_bulk_approve_sends_one_digest_per_subscriber(self, tweet):
+        """
+        Test that a bulk approval sends a single digest per subscriber
+        and a single tweet.
+        """
+        response = self.client.post(self.url, {
+            'action': 'approve',
+            'articles': [a.pk for a in self.articles] + [
+                self.other_article.pk],
+            'newsletters': [self.newsletter.pk],
+        })
+
+        self.assertRedirects(response, self.url)
+        self.assertEqual(
+            Article.objects.filter(editor_approved=True).count(), 3)
+        self.assertTrue(
+            Newsletter.objects.get(pk=self.newsletter.pk).editor_approved)
+        # Items of other publishers are left untouched
+        self.assertFalse(
+            Article.objects.get(pk=self.other_article.pk).editor_approved)
+        self.assertEqual(len(mail.outbox), len(self.readers))
+        self.assertEqual(tweet.return_value.make_tweet.call_count, 1)
+
+    @mock.patch('news_app.functions.notifications.Tweet')
+    def test_bulk_approve_publishes_tag_links(self, tweet):
+        """
+        Test that bulk approved items show up in the feeds of their
+        tags.
+        """
+        tag = Tag.objects.create(name="Science", slug='science')
+        self.articles[0].tags.add(tag)
+        url = reverse('tag_rss', args=[tag.pk])
+        self.assertNotContains(self.client.get(url), "Article 0")
+
+        self.client.post(self.url, {
+            'action': 'approve', 'articles': [self.articles[0].pk]})
+
+        self.assertContains(self.client.get(url), "Article 0")
+
+    @mock.patch('news_app.functions.notifications.Tweet')
+    def test_failed_tweet_is_counted(self, tweet):
+        """
+        Test that a failed tweet is logged and counted as an event.
+        """
+        tweet.return_value.make_tweet.side_effect = Exception('down')
+        before = get_event_counts().get('tweet_failed', 0)
+        with self.assertLogs('news_app.log', 'WARNING') as logs:
+            self.client.post(self.url, {
+                'action': 'approve',
+                'articles': [self.articles[0].pk],
+            })
+
+        self.assertEqual(logs.records[0].event, 'tweet_failed')
+        self.assertEqual(logs.records[0].error, 'down')
+        self.assertEqual(get_event_counts()['tweet_failed'], before + 1)
+
+    def test_bulk_reject_returns_items_to_authors(self):
+        """
+        Test that rejected items are kept for their author and return to
+        the queue once edited.
+        """
+        article = self.articles[0]
+        self.client.post(self.url, {
+            'action': 'reject',
+            'articles': [article.pk],
+        })
+
+        article.refresh_from_db()
+        self.assertTrue(article.rejected)
+        self.assertEqual(len(mail.outbox), 0)
+        response = self.client.get(self.url)
+        self.assertNotIn(article, response.context['pending_articles'])
+
+        self.journalist.user_permissions.add(
+            Permission.objects.get(codename='change_article'))
+        self.client.force_login(self.journalist)
+        response = self.client.get(reverse('view_article', args=[article.pk]))
+        self.assertContains(response, "Rejected by the editor.")
+        self.client.post(
+            reverse('edit_article', args=[article.pk]),
+            {'title': article.title, 'content': "Revised content"})
+        article.refresh_from_db()
+        self.assertFalse(article.rejected)
+
+        self.client.force_login(self.editor)
+        response = self.client.get(self.url)
+        self.assertIn(article, response.context['pending_articles'])
+
+    def test_non_editor_is_forbidden(self):
+        """
+        Test that non-Editor roles cannot use the queue.
+        """
+        self.client.force_login(self.readers[0])
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 403)
+
+
+class FeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.publisher = Publisher.objects.create(name="Test Publisher")
+        self.journalist = CustomUser.objects.create_user(
+            username='john', password='password', role='Journalist',
+            publisher=self.publisher, email='john@gmail.com'
+        )
+        self.reader = CustomUser.objects.create_user(
+            username='sue', password='password', role='Reader',
+            email='sue@gmail.com'
+        )
+        self.approved = Article.objects.create(
+            title="Approved Article", content="Content",
+            article_author=self.journalist, editor_approved=True)
+        self.pending = Article.objects.create(
+            title="Pending Article", content="Content",
+            article_author=self.journalist)
+        self.url = reverse('publisher_rss', args=[self.publisher.pk])
+
+    def test_publisher_feed_lists_approved_items(self):
+        """
+        Test that only approved items appear in a publisher feed.
+        """
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Approved Article")
+        self.assertNotContains(response, "Pending Article")
+        self.assertTrue(response.has_header('ETag'))
+
+    def test_unchanged_feed_returns_not_modified(self):
+        """
+        Test that polling with a current ETag returns 304 until an item
+        is approved.
+        """
+        etag = self.client.get(self.url)['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.pending.editor_approved = True
+        self.pending.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Pending Article")
+
+    def test_reader_feed(self):
+        """
+        Test that a reader's personal feed follows their subscriptions
+        and rejects invalid tokens.
+        """
+        token = reader_feed_token(self.reader)
+        url = reverse('reader_atom', args=[token])
+        self.assertNotContains(self.client.get(url), "Approved Article")
+
+        self.reader.subscribed_publishers.add(self.publisher)
+        self.assertContains(self.client.get(url), "Approved Article")
+
+        response = self.client.get(reverse('reader_rss', args=['invalid']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_item_leaving_a_source_updates_its_feed(self):
+        """
+        Test that an article published independently disappears from
+        its publisher's feed.
+        """
+        etag = self.client.get(self.url)['ETag']
+        article = Article.objects.get(pk=self.approved.pk)
+        article.independent_journalist = True
+        article.editor_approved = False
+        article.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, "Approved Article")
+
+    def test_cleared_subscribers_update_reader_feeds(self):
+        """
+        Test that clearing the subscribers of a publisher updates the
+        personal feeds of its former subscribers.
+        """
+        self.reader.subscribed_publishers.add(self.publisher)
+        url = reverse('reader_atom', args=[reader_feed_token(self.reader)])
+        etag = self.client.get(url)['ETag']
+
+        self.publisher.subscribers.clear()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, "Approved Article")
+
+
+class ContentEventsTests(TestCase):
+    def setUp(self):
+        self.publisher = Publisher.objects.create(name="Test Publisher")
+        self.other_publisher = Publisher.objects.create(name="Other")
+        self.journalist = CustomUser.objects.create_user(
+            username='john', password='password', role='Journalist',
+            publisher=self.publisher, email='john@gmail.com'
+        )
+        self.other_journalist = CustomUser.objects.create_user(
+            username='jane', password='password', role='Journalist',
+            publisher=self.other_publisher, email='jane@gmail.com'
+        )
+        self.reader = CustomUser.objects.create_user(
+            username='sue', password='password', role='Reader',
+            email='sue@gmail.com'
+        )
+        self.article = Article.objects.create(
+            title="Approved Article", content="Content",
+            article_author=self.journalist, editor_approved=True)
+        self.other_article = Article.objects.create(
+            title="Other Article", content="Content",
+            article_author=self.other_journalist, editor_approved=True)
+
+    async def test_stream_receives_subscribed_events(self):
+        """
+        Test that a stream only delivers events of the reader's
+        subscriptions and releases its connection when closed.
+        """
+        broker = EventBroker(InProcessBackend())
+        stream = aiter(broker.open(self.reader, [self.publisher.pk], []))
+        self.assertTrue((await anext(stream)).startswith('retry:'))
+
+        next_chunk = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        broker.publish(make_event(self.other_article))
+        broker.publish(make_event(self.article))
+        chunk = await asyncio.wait_for(next_chunk, 1)
+
+        self.assertIn('"title": "Approved Article"', chunk)
+        self.assertIn(f'id: {make_event(self.article)["id"]}', chunk)
+        await stream.aclose()
+        self.assertEqual(broker.connections, {})
+
+    async def test_stream_replays_missed_events(self):
+        """
+        Test that events after Last-Event-ID are replayed.
+        """
+        broker = EventBroker(InProcessBackend())
+        last_event_id = make_event(self.other_article)['id'].replace(
+            str(self.other_article.pk), '0')
+        stream = aiter(broker.open(
+            self.reader, [self.publisher.pk], [], last_event_id))
+        await anext(stream)
+
+        chunk = await asyncio.wait_for(anext(stream), 1)
+
+        self.assertIn('"title": "Approved Article"', chunk)
+        await stream.aclose()
+
+    def test_connection_limit(self):
+        """
+        Test that a user can't open more streams than allowed.
+        """
+        broker = EventBroker(InProcessBackend())
+        for _ in range(MAX_CONNECTIONS_PER_USER):
+            broker.open(self.reader, [], [])
+
+        with self.assertRaises(TooManyConnections):
+            broker.open(self.reader, [], [])
+
+    def test_non_reader_is_forbidden(self):
+        """
+        Test that non-Reader roles can't open an event stream.
+        """
+        self.client.force_login(self.journalist)
+        response = self.client.get(reverse('content_events'))
+
+        self.assertEqual(response.status_code, 403)
+
+
+class CompressionMiddlewareTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.body = b'<p>Breaking news from the council.</p>' * 50
+
+    def compress(self, response, accept_encoding):
+        request = self.factory.get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_prefers_brotli(self):
+        response = self.compress(HttpResponse(self.body), 'gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), self.body)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_refused_encoding_is_not_used(self):
+        response = self.compress(HttpResponse(self.body), 'br;q=0, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), self.body)
+
+    def test_small_and_compressed_bodies_are_skipped(self):
+        response = self.compress(HttpResponse(b'<p>Short</p>'), 'gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        response = self.compress(
+            HttpResponse(self.body, content_type='image/png'), 'gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_csrf_pages_are_not_brotli_compressed(self):
+        # Through the whole middleware stack, as CsrfViewMiddleware
+        # changes the request after the view has used the token
+        response = self.client.get(
+            reverse('login'), HTTP_ACCEPT_ENCODING='br, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn(b'csrfmiddlewaretoken', gzip.decompress(
+            response.content))
+
+    def test_streaming_response(self):
+        chunks = [self.body[:1000], self.body[1000:]]
+        response = self.compress(StreamingHttpResponse(chunks), 'gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)),
+            self.body)
+
+    def test_event_streams_are_not_compressed(self):
+        response = self.compress(
+            StreamingHttpResponse(
+                [b'data: {}\n\n'], content_type='text/event-stream'),
+            'gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.profile_dir = Path(tmp_dir.name)
+        self.settings = override_settings(
+            PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=0.0,
+            PROFILING_MAX_PROFILES=2, PROFILING_DIR=self.profile_dir)
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+
+    def test_removed_from_chain_when_disabled(self):
+        with override_settings(PROFILING_ENABLED=False):
+            with self.assertRaises(MiddlewareNotUsed):
+                ProfilingMiddleware(lambda request: HttpResponse())
+            response = self.client.get(
+                reverse('article_list'), HTTP_X_PROFILE=make_profile_token())
+        self.assertFalse(response.has_header('X-Profile-Id'))
+        self.assertEqual(list(self.profile_dir.iterdir()), [])
+
+    def test_signed_header_profiles_request(self):
+        response = self.client.get(
+            reverse('article_list'), HTTP_X_PROFILE=make_profile_token())
+        profile_id = response['X-Profile-Id']
+        [record] = list_profiles()
+        self.assertEqual(record['id'], profile_id)
+        self.assertEqual(record['view'], 'article_list')
+        self.assertEqual(len(record['queries']), 2)
+        self.assertTrue((self.profile_dir / f'{profile_id}.prof').exists())
+
+        out = StringIO()
+        call_command('profiles', profile_id, stdout=out)
+        self.assertIn('SQL timeline', out.getvalue())
+
+    def test_invalid_header_is_ignored(self):
+        response = self.client.get(
+            reverse('article_list'), HTTP_X_PROFILE='forged')
+        self.assertFalse(response.has_header('X-Profile-Id'))
+
+    def test_keeps_latest_profiles(self):
+        with override_settings(PROFILING_SAMPLE_RATE=1.0):
+            ids = [
+                self.client.get(reverse('article_list'))['X-Profile-Id']
+                for _ in range(3)]
+        self.assertEqual(
+            [record['id'] for record in list_profiles()], ids[1:])
+        self.assertEqual(len(list(self.profile_dir.glob('*.prof'))), 2)
+
+
+class RequestLogTests(TestCase):
+    def test_request_id_is_returned_and_logged(self):
+        with self.assertLogs('news_app.middleware', 'INFO') as logs:
+            response = self.client.get(
+                reverse('article_list'), HTTP_X_REQUEST_ID='abc123')
+        self.assertEqual(response['X-Request-ID'], 'abc123')
+        [record] = logs.records
+        self.assertEqual(record.event, 'request')
+        self.assertEqual(record.status, 200)
+        self.assertEqual(record.path, reverse('article_list'))
+
+        response = self.client.get(reverse('article_list'))
+        self.assertEqual(len(response['X-Request-ID']), 32)
+
+    def test_records_carry_request_context(self):
+        user = CustomUser.objects.create_user(
+            username='reader', password='password', role='Reader')
+        request = RequestFactory().get(reverse('article_list'))
+        request._cached_user = user
+        record = logging.LogRecord(
+            'news_app', logging.INFO, __file__, 1, 'Hello %s', ('you',),
+            None)
+        record.event = 'greeting'
+        with request_context('abc123', request):
+            RequestContextFilter().filter(record)
+
+        data = json.loads(JsonFormatter().format(record))
+        self.assertEqual(data['message'], 'Hello you')
+        self.assertEqual(data['level'], 'INFO')
+        self.assertEqual(data['event'], 'greeting')
+        self.assertEqual(data['request_id'], 'abc123')
+        self.assertEqual(data['user_id'], user.pk)
+
+    def test_queue_handler_writes_json_lines(self):
+        stream = StringIO()
+        handler = QueueJsonHandler(stream)
+        record = logging.LogRecord(
+            'news_app', logging.INFO, __file__, 1, 'Hello %s', ('you',),
+            None)
+        record.count = 2
+        handler.handle(record)
+        # Closing the handler writes the queued records
+        handler.close()
+
+        data = json.loads(stream.getvalue())
+        self.assertEqual(data['message'], 'Hello you')
+        self.assertEqual(data['count'], 2)
+
+    def test_full_queue_drops_records(self):
+        handler = QueueJsonHandler(StringIO(), maxsize=1)
+        handler.close()
+        before = get_event_counts().get('log_records_dropped', 0)
+        for _ in range(3):
+            handler.handle(logging.LogRecord(
+                'news_app', logging.INFO, __file__, 1, 'Hello', (), None))
+        self.assertEqual(
+            get_event_counts()['log_records_dropped'], before + 2)
+
+
+class AudienceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.publisher = Publisher.objects.create(name="Test Publisher")
+        self.editor = CustomUser.objects.create_user(
+            username='ed', password='password', role='Editor',
+            publisher=self.publisher, email='ed@gmail.com')
+        self.editor.user_permissions.add(
+            Permission.objects.get(codename='change_article'))
+        self.journalist = CustomUser.objects.create_user(
+            username='john', password='password', role='Journalist',
+            publisher=self.publisher, email='john@gmail.com')
+        self.both, self.publisher_only, self.journalist_only = [
+            CustomUser.objects.create_user(
+                username=name, password='password', role='Reader',
+                email=f'{name}@gmail.com')
+            for name in ('both', 'publisher_only', 'journalist_only')]
+        self.publisher.subscribers.add(self.both, self.publisher_only)
+        self.journalist.subscribers.add(self.both, self.journalist_only)
+
+    def test_reader_sets_match_python_sets(self):
+        rng = random.Random(0)
+        samples = [
+            set(rng.sample(range(1, 5000), size))
+            for size in (0, 3, 40, 2000, 4000)]
+        for a in samples:
+            for b in samples:
+                x, y = ReaderSet.from_ids(list(a)), ReaderSet.from_ids(list(b))
+                self.assertEqual(set(x | y), a | b)
+                self.assertEqual(set(x & y), a & b)
+                self.assertEqual(set(x - y), a - b)
+                self.assertEqual(len(x | y), len(a | b))
+        readers = ReaderSet.from_ids(list(samples[3]))
+        self.assertIsNotNone(readers.bits)
+        self.assertIn(min(samples[3]), readers)
+        self.assertNotIn(5001, readers)
+
+    def test_approval_emails_each_subscriber_once(self):
+        article = Article.objects.create(
+            title="Pending", content="Content",
+            article_author=self.journalist)
+        self.client.force_login(self.editor)
+        with mock.patch('news_app.views.Tweet'):
+            self.client.post(
+                reverse('edit_article', args=[article.pk]),
+                {'title': "Pending", 'content': "Content",
+                 'editor_approved': 'on'})
+
+        self.assertEqual(
+            sorted(email.to[0] for email in mail.outbox),
+            ['both@gmail.com', 'journalist_only@gmail.com',
+             'publisher_only@gmail.com'])
+
+    def test_subscription_changes_update_cached_sets(self):
+        readers = audience([self.publisher], [self.journalist])
+        self.assertEqual(len(readers), 3)
+        with self.assertNumQueries(0):
+            audience([self.publisher], [self.journalist])
+
+        self.journalist_only.subscribed_publishers.add(self.publisher)
+        self.assertIn(
+            self.journalist_only.pk, audience(publishers=[self.publisher]))
+        self.both.subscribed_journalists.clear()
+        self.assertNotIn(
+            self.both.pk, audience(journalists=[self.journalist]))
+        self.publisher.subscribers.remove(self.publisher_only)
+        self.assertNotIn(
+            self.publisher_only.pk, audience(publishers=[self.publisher]))
+
+
+def make_image(size=(800, 600), name='photo.png'):
+    """Returns an uploaded PNG image of the given size."""
+    output = BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(output, 'PNG')
+    return SimpleUploadedFile(name, output.getvalue(), 'image/png')
+
+
+class AttachmentTests(TestCase):
+    def setUp(self):
+        self.publisher = Publisher.objects.create(name="Test Publisher")
+        self.journalist = CustomUser.objects.create_user(
+            username='john', password='password', role='Journalist',
+            publisher=self.publisher, email='john@gmail.com')
+        self.journalist.user_permissions.add(
+            Permission.objects.get(codename='add_article'))
+        self.client.force_login(self.journalist)
+
+    def upload(self, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('add_article'), {
+                'title': 'Pictured', 'content': 'Content',
+                'publish_as': 'publisher', 'image': image})
+
+    def test_upload_renders_thumbnail(self):
+        """
+        Test that an uploaded image is stored with a thumbnail.
+        """
+        response = self.upload(make_image())
+
+        self.assertRedirects(response, reverse('article_list'))
+        article = Article.objects.get(title='Pictured')
+        self.assertEqual(
+            article.thumbnail.name, thumbnail_name(article.image.name))
+        with Image.open(article.thumbnail) as thumbnail:
+            self.assertEqual(thumbnail.size, (320, 240))
+        response = self.client.get(article.get_absolute_url())
+        self.assertContains(response, reverse(
+            'serve_attachment', args=['article', article.pk, 'thumbnail']))
+
+    @override_settings(ATTACHMENT_MAX_SIZE=100)
+    def test_large_upload_is_refused(self):
+        """
+        Test that images over ATTACHMENT_MAX_SIZE are refused.
+        """
+        response = self.upload(make_image())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('image', response.context['form'].errors)
+        self.assertFalse(Article.objects.exists())
+
+    def test_serve_ranges_and_etags(self):
+        """
+        Test that attachments are served with validators and byte
+        ranges.
+        """
+        self.upload(make_image())
+        article = Article.objects.get()
+        with article.image.open('rb') as image:
+            data = image.read()
+        url = reverse(
+            'serve_attachment', args=['article', article.pk, 'image'])
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), data)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        # Replacing the image keeps the URL, so copies are revalidated
+        self.assertIn('no-cache', response['Cache-Control'])
+        etag = response['ETag']
+
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(url, headers={'Range': 'bytes=10-19'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(
+            response['Content-Range'], f'bytes 10-19/{len(data)}')
+        self.assertEqual(b''.join(response.streaming_content), data[10:20])
+
+        response = self.client.get(url, headers={'Range': 'bytes=-5'})
+        self.assertEqual(b''.join(response.streaming_content), data[-5:])
+
+        # A stale If-Range gets the whole file
+        response = self.client.get(
+            url, headers={'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(
+            url, headers={'Range': f'bytes={len(data)}-'})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(data)}')
+
+        response = self.client.get(reverse(
+            'serve_attachment', args=['article', article.pk, 'other']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_parse_range(self):
+        """
+        Test the parsing of Range headers.
+        """
+        self.assertEqual(parse_range('bytes=0-99', 50), (0, 49))
+        self.assertEqual(parse_range('bytes=-100', 50), (0, 49))
+        self.assertIsNone(parse_range('bytes=0-1,5-6', 50))
+        self.assertIsNone(parse_range('bytes=9-3', 50))
+        self.assertIsNone(parse_range('items=0-1', 50))
+        self.assertFalse(parse_range('bytes=50-', 50))
+
+
+class TagTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.journalist = CustomUser.objects.create_user(
+            username='john', password='password', role='Journalist',
+            email='john@gmail.com')
+        self.reader = CustomUser.objects.create_user(
+            username='sue', password='password', role='Reader',
+            email='sue@gmail.com')
+        self.politics, self.science, self.sport = [
+            Tag.objects.create(name=name.title(), slug=name)
+            for name in ('politics', 'science', 'sport')]
+        self.both = Article.objects.create(
+            title="Both", content="Content", article_author=self.journalist,
+            independent_journalist=True)
+        self.both.tags.set([self.politics, self.science])
+        self.science_only = Article.objects.create(
+            title="Science only", content="Content",
+            article_author=self.journalist)
+        self.science_only.tags.set([self.science])
+        newsletter = Newsletter.objects.create(
+            title="Newsletter", content="Content",
+            newsletter_author=self.journalist)
+        newsletter.tags.set([self.science, self.sport])
+
+    def facets(self, response):
+        return {
+            facet['slug']: (facet['article_count'], facet['newsletter_count'])
+            for facet in response.context['facets']}
+
+    def test_listing_is_filtered_with_facet_counts(self):
+        """
+        Test that the listing shows the items carrying every selected
+        tag, with the facet counts of the filtered items.
+        """
+        response = self.client.get(reverse('article_list'))
+        self.assertEqual(self.facets(response), {
+            'politics': (1, 0), 'science': (2, 1), 'sport': (0, 1)})
+
+        response = self.client.get(
+            reverse('article_list'), {'tag': ['science', 'politics']})
+        self.assertEqual(list(response.context['article_list']), [self.both])
+        self.assertEqual(list(response.context['newsletter_list']), [])
+        self.assertEqual(
+            self.facets(response), {'politics': (1, 0), 'science': (1, 0)})
+
+        # Facets come from the cache until the tags of an item change,
+        # leaving the tag lookup and the two listings
+        with self.assertNumQueries(3):
+            self.client.get(
+                reverse('article_list'), {'tag': ['science', 'politics']})
+        self.science_only.tags.add(self.politics)
+        response = self.client.get(
+            reverse('article_list'), {'tag': ['science', 'politics']})
+        self.assertEqual(len(response.context['article_list']), 2)
+
+    def test_tag_links_follow_publication(self):
+        """
+        Test that tag feeds list items once they are published.
+        """
+        url = reverse('tag_rss', args=[self.science.pk])
+        response = self.client.get(url)
+        self.assertContains(response, "Both")
+        self.assertNotContains(response, "Science only")
+
+        self.science_only.editor_approved = True
+        self.science_only.save()
+        self.assertContains(self.client.get(url), "Science only")
+
+    def test_tag_subscriptions(self):
+        """
+        Test that readers subscribe to tags, and get the tagged items in
+        their personal feed and notifications.
+        """
+        self.client.force_login(self.reader)
+        self.client.post(reverse('manage_subscriptions'), {
+            'tags': [self.science.pk], 'digest_frequency': 'immediate'})
+        self.assertEqual(list(self.reader.subscribed_tags.all()), [
+            self.science])
+
+        url = reverse('reader_rss', args=[reader_feed_token(self.reader)])
+        response = self.client.get(url)
+        self.assertContains(response, "Both")
+        self.assertNotContains(response, "Science only")
+
+        self.assertEqual(
+            list(audience(tags=[self.science])), [self.reader.pk])
+        self.assertEqual(len(audience(tags=[self.sport])), 0)
@@ -1,5 +1,6 @@
 from django.urls import path
 from . import views
+from . import feeds
 
 urlpatterns = [
     # Article URLs
@@ -16,6 +17,7 @@ urlpatterns = [
     path('logout/', views.logout_user, name='logout'),
     path('change_password/', views.change_password_user,
          name='change_password'),
+    path('api_tokens/', views.api_tokens, name='api_tokens'),
 
     # Newsletter URLs
     path('newsletter/<int:pk>/', views.view_newsletter,
@@ -26,6 +28,13 @@ urlpatterns = [
     path('newsletter/<int:pk>/delete/', views.delete_newsletter,
          name='delete_newsletter'),
 
+    # Image attachments of articles and newsletters
+    path('media/<str:kind>/<int:pk>/<str:variant>/', views.serve_attachment,
+         name='serve_attachment'),
+
+    # Editor URLs
+    path('approval_queue/', views.approval_queue, name='approval_queue'),
+
     # Subscription URLs
     path('subscriptions/', views.manage_subscriptions,
          name='manage_subscriptions'),
@@ -36,6 +45,45 @@ urlpatterns = [
     path('reset/<uidb64>/<token>/', views.password_reset_confirm,
          name='password_reset_confirm'),
 
+    # Feed URLs
+    path('feeds/publisher/<int:pk>/rss/',
+         feeds.cached_feed(feeds.PublisherFeed(), 'publisher'),
+         name='publisher_rss'),
+    path('feeds/publisher/<int:pk>/atom/',
+         feeds.cached_feed(feeds.AtomPublisherFeed(), 'publisher'),
+         name='publisher_atom'),
+    path('feeds/journalist/<int:pk>/rss/',
+         feeds.cached_feed(feeds.JournalistFeed(), 'journalist'),
+         name='journalist_rss'),
+    path('feeds/journalist/<int:pk>/atom/',
+         feeds.cached_feed(feeds.AtomJournalistFeed(), 'journalist'),
+         name='journalist_atom'),
+    path('feeds/tag/<int:pk>/rss/',
+         feeds.cached_feed(feeds.TagFeed(), 'tag'), name='tag_rss'),
+    path('feeds/tag/<int:pk>/atom/',
+         feeds.cached_feed(feeds.AtomTagFeed(), 'tag'), name='tag_atom'),
+    path('feeds/reader/<str:token>/rss/',
+         feeds.cached_feed(feeds.ReaderFeed(), 'reader', private=True),
+         name='reader_rss'),
+    path('feeds/reader/<str:token>/atom/',
+         feeds.cached_feed(feeds.AtomReaderFeed(), 'reader', private=True),
+         name='reader_atom'),
+
     # API URLs
     path('api/reader_view/', views.api_reader_view, name='api_reader_view'),
+    path('api/events/', views.content_events, name='content_events'),
+    path('api/throttle_metrics/', views.api_throttle_metrics,
+         name='api_throttle_metrics'),
+    path('api/trending/', views.api_trending, name='api_trending'),
+    path('api/tags/', views.api_tags, name='api_tags'),
+    path('api/recommendations/', views.api_recommendations,
+         name='api_recommendations'),
+    path('api/recommendations/<str:kind>/<int:pk>/',
+         views.api_similar_sources, name='api_similar_sources'),
+    path('api/revisions/<str:kind>/<int:pk>/', views.api_revisions,
+         name='api_revisions'),
+    path('api/revisions/<str:kind>/<int:pk>/<int:number>/',
+         views.api_revision, name='api_revision'),
+    path('api/revisions/<str:kind>/<int:pk>/<int:first>/diff/<int:second>/',
+         views.api_revision_diff, name='api_revision_diff'),
 ]
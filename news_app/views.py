@@ -1,3 +1,5 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.forms import PasswordChangeForm, AuthenticationForm
 from django.contrib.auth.forms import SetPasswordForm
@@ -6,33 +8,78 @@ from django.contrib.auth import login, logout, update_session_auth_hash
 from django.contrib.auth import models as auth_models
 from django.contrib import messages
 from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import JSONField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.core.mail import EmailMessage
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
 from django.template.loader import render_to_string
 from django.contrib.sites.shortcuts import get_current_site
+from django.utils.http import urlencode
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from django.contrib.auth.tokens import default_token_generator
 from .forms import RegisterForm, ArticleForm, NewsletterForm
-from .models import Article, Publisher, Newsletter, CustomUser
+from .models import Article, Publisher, Newsletter, CustomUser, ApiToken
+from .models import ArticleTag, NewsletterTag
+from .models import ContentStats, Recommendation, RelatedContent, Tag
+from .models import ArchivedArticle, ArchivedNewsletter, Revision
 from .functions.tweet import Tweet
+from .functions.notifications import notify_subscribers
+from .functions.notifications import send_publisher_digest
+from .functions.notifications import tweet_publisher_digest
+from .functions.events import get_broker, make_event, TooManyConnections
+from .functions.throttling import throttle, UserRateThrottle, get_metrics
+from .functions.stats import get_trending, record_view
+from .functions.archive import archive_model
+from .functions.media import serve_file
+from .functions.tags import bump_facet_version, facet_counts
+from .functions.tags import filter_by_tags, selected_tags
+from .functions.recommendations import get_recommendations
+from .functions.revisions import KINDS as REVISION_KINDS
+from .functions.revisions import diff_versions, get_version
+from .log import count_event
+from .feeds import bump_feed_version, reader_feed_token
+from .authentication import TokenAuthentication, issue_token, revoke_token
 from .serializers import ArticleSerializer, NewsletterSerializer
 from rest_framework.decorators import api_view, authentication_classes
 from rest_framework.decorators import permission_classes
+from rest_framework.decorators import throttle_classes
 from rest_framework.authentication import SessionAuthentication
 from rest_framework.authentication import BasicAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 
 
 def article_list(request):
     """
-    Displays a list of all articles and newsletters.
+    Displays a list of all articles and newsletters, optionally only
+    those carrying every tag given in the tag query parameter, with the
+    number of listed items per tag.
     """
-    articles = Article.objects.all().order_by('title')
-    newsletters = Newsletter.objects.all().order_by('title')
+    tags = selected_tags(request.GET.getlist('tag'))
+    # The listing only shows titles, so the content body is not loaded
+    articles = filter_by_tags(Article.objects, tags).select_related(
+        'article_author__publisher').defer('content').order_by('title')
+    newsletters = filter_by_tags(Newsletter.objects, tags).select_related(
+        'newsletter_author__publisher').defer('content').order_by('title')
+
+    # Each facet links to the listing with its tag toggled
+    selected = {tag.slug for tag in tags}
+    facets = [
+        {**facet, 'selected': facet['slug'] in selected,
+         'query': urlencode(
+             [('tag', slug) for slug in sorted(selected ^ {facet['slug']})])}
+        for facet in facet_counts(
+            articles, newsletters, 'list:' + ','.join(sorted(selected)))]
     context = {
         'article_list': articles,
-        'newsletter_list': newsletters
+        'newsletter_list': newsletters,
+        'facets': facets,
+        'selected_tags': tags,
     }
     return render(request, 'news_app/article_list.html', context)
 
@@ -137,6 +184,7 @@ def register_user(request):
     return render(request, 'news_app/register.html', context)
 
 
+@throttle('login', methods=('POST',))
 def login_user(request):
     """
     Handles user login.
@@ -212,27 +260,19 @@ def add_article(request):
 
                     # Email subscribers of the independent journalist
                     journalist = request.user
-                    subscribers = (
-                        CustomUser.objects.filter(
-                            subscribed_journalists=journalist))
-                    if subscribers.exists():
-                        subject = (
-                            f'New Article from {journalist.username}: '
-                            f'{article.title}')
-                        message = render_to_string(
-                            'news_app/independent_article_email.html',
-                            {
-                             'article': article,
-                             'journalist': journalist,
-                            })
-                        # Get email addresses of all subscribers
-                        recipient_list = [
-                            subscriber.email for subscriber in subscribers
-                            if subscriber.email]
-                        if recipient_list:
-                            email = EmailMessage(
-                                subject, message, to=recipient_list)
-                            email.send()
+                    subject = (
+                        f'New Article from {journalist.username}: '
+                        f'{article.title}')
+                    message = render_to_string(
+                        'news_app/independent_article_email.html',
+                        {
+                         'article': article,
+                         'journalist': journalist,
+                        })
+                    # Subscribers are emailed once each
+                    notify_subscribers(
+                        subject, message, journalists=[journalist],
+                        tags=form.cleaned_data['tags'])
 
                     # Tweet about the new article
                     try:
@@ -246,13 +286,15 @@ def add_article(request):
                             "article.")
                     except Exception as e:
                         # Log the error and inform the user
-                        print(f"Error posting tweet: {e}")
+                        count_event('tweet_failed', error=str(e))
                         messages.warning(
                             request, f"Article approved, but failed to post a "
                             f"tweet. Error: {e}")
 
+            # Attributes the revision history entry to the user
+            article.edited_by = request.user
             article.save()
-            form.save_m2m()  # Needed for ManyToMany fields like categories
+            form.save_m2m()  # Saves the tags, a ManyToMany field
             messages.success(request, 'Article added successfully.')
             return redirect('article_list')
     else:
@@ -260,17 +302,68 @@ def add_article(request):
     return render(request, 'news_app/add_article.html', {'form': form})
 
 
+def related_items(kind):
+    """
+    Returns a subquery of the related items stored for the articles or
+    newsletters of a queryset.
+    """
+    return Subquery(
+        RelatedContent.objects.filter(
+            kind=kind, object_id=OuterRef('pk')).values('related')[:1],
+        output_field=JSONField())
+
+
 def view_article(request, pk):
     """
     Displays a single article.
     """
-    article = get_object_or_404(Article, pk=pk)
+    # The page shows the author and their publisher, and the related
+    # items in the same query
+    article = Article.objects.select_related(
+        'article_author__publisher',
+    ).annotate(
+        related_items=related_items(RelatedContent.ARTICLE),
+    ).filter(pk=pk).first()
+    archived = article is None
+    if archived:
+        # Old articles are moved to the archive with their primary key
+        article = get_object_or_404(
+            ArchivedArticle.objects.select_related(
+                'article_author__publisher'),
+            pk=pk)
+    # Counted in memory and written in batches; archived articles are
+    # not counted
+    if not archived:
+        record_view(ContentStats.ARTICLE, article.pk)
     context = {
-        'article': article
+        'article': article,
+        'archived': archived,
     }
     return render(request, 'news_app/view_article.html', context)
 
 
+def serve_attachment(request, kind, pk, variant):
+    """
+    Serves the image or thumbnail of an article or newsletter. Supports
+    conditional requests and byte ranges.
+    """
+    model = {'article': Article, 'newsletter': Newsletter}.get(kind)
+    if model is None or variant not in ('image', 'thumbnail'):
+        raise Http404("No such attachment.")
+    item = model.objects.only(variant).filter(pk=pk).first()
+    if item is None:
+        item = get_object_or_404(
+            archive_model(model).objects.only(variant), pk=pk)
+    attachment = getattr(item, variant)
+    if not attachment:
+        raise Http404("No such attachment.")
+    response = serve_file(request, attachment.storage, attachment.name)
+    # A replaced image keeps its URL, so caches revalidate their copy
+    # with the ETag on every use, which costs a 304 when unchanged
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
 @login_required
 @permission_required('news_app.change_article', raise_exception=True)
 def edit_article(request, pk):
@@ -297,27 +390,25 @@ def edit_article(request, pk):
                 if is_approved and not was_approved:
                     publisher = article_instance.article_author.publisher
                     if publisher:
-                        subscribers = publisher.subscribers.all()
-                        if subscribers:
-                            subject = (
-                                f"New Article Published: "
-                                f"{article_instance.title}")
-                            # Render email content from a template for
-                            # better practice
-                            message = render_to_string(
-                                'news_app/article_email.html',
-                                {
-                                 'article': article_instance,
-                                 'publisher': publisher,
-                                })
-                            # Get email addresses of all publisher
-                            # subscribers
-                            recipient_list = [
-                                subscriber.email for subscriber in subscribers
-                                if subscriber.email]
-                            email = EmailMessage(
-                                subject, message, to=recipient_list)
-                            email.send()
+                        subject = (
+                            f"New Article Published: "
+                            f"{article_instance.title}")
+                        # Render email content from a template for
+                        # better practice
+                        message = render_to_string(
+                            'news_app/article_email.html',
+                            {
+                             'article': article_instance,
+                             'publisher': publisher,
+                            })
+                        # Readers following both the publisher and the
+                        # author are emailed once; digest readers get
+                        # the item in their digest
+                        notify_subscribers(
+                            subject, message, publishers=[publisher],
+                            journalists=[
+                                article_instance.article_author_id],
+                            tags=form.cleaned_data['tags'])
 
                     # Tweet about the new article
                     try:
@@ -332,12 +423,14 @@ def edit_article(request, pk):
                             "article.")
                     except Exception as e:
                         # Log the error and inform the user
-                        print(f"Error posting tweet: {e}")
+                        count_event('tweet_failed', error=str(e))
                         messages.warning(
                             request, f"Article approved, but failed to post a "
                             f"tweet. Error: {e}")
 
+            article_instance.edited_by = request.user
             article_instance.save()
+            form.save_m2m()
             messages.success(request, 'Article updated successfully.')
             return redirect('article_list')
     else:
@@ -390,27 +483,19 @@ def add_newsletter(request):
 
                     # Email subscribers of the independent journalist
                     journalist = request.user
-                    subscribers = (
-                        CustomUser.objects.filter(
-                            subscribed_journalists=journalist))
-                    if subscribers.exists():
-                        subject = (
-                            f"New Newsletter from {journalist.username}: "
-                            f"{newsletter.title}")
-                        message = render_to_string(
-                            'news_app/independent_newsletter_email.html',
-                            {
-                             'newsletter': newsletter,
-                             'journalist': journalist,
-                            })
-                        # Get email addresses of all subscribers
-                        recipient_list = [
-                            subscriber.email for subscriber in subscribers
-                            if subscriber.email]
-                        if recipient_list:
-                            email = EmailMessage(
-                                subject, message, to=recipient_list)
-                            email.send()
+                    subject = (
+                        f"New Newsletter from {journalist.username}: "
+                        f"{newsletter.title}")
+                    message = render_to_string(
+                        'news_app/independent_newsletter_email.html',
+                        {
+                         'newsletter': newsletter,
+                         'journalist': journalist,
+                        })
+                    # Subscribers are emailed once each
+                    notify_subscribers(
+                        subject, message, journalists=[journalist],
+                        tags=form.cleaned_data['tags'])
 
                     # Tweet about the new newsletter
                     try:
@@ -424,13 +509,14 @@ def add_newsletter(request):
                             "newsletter.")
                     except Exception as e:
                         # Log the error and inform the user
-                        print(f"Error posting tweet: {e}")
+                        count_event('tweet_failed', error=str(e))
                         messages.warning(
                             request, f"Newsletter approved, but failed to post"
                             f" a tweet. Error: {e}")
 
+            newsletter.edited_by = request.user
             newsletter.save()
-            form.save_m2m()  # Needed for ManyToMany fields like categories
+            form.save_m2m()  # Saves the tags, a ManyToMany field
             messages.success(request, 'Newsletter added successfully.')
             return redirect('article_list')
     else:
@@ -442,9 +528,23 @@ def view_newsletter(request, pk):
     """
     Displays a single newsletter.
     """
-    newsletter = get_object_or_404(Newsletter, pk=pk)
+    # The page shows the author and their publisher
+    newsletter = Newsletter.objects.select_related(
+        'newsletter_author__publisher',
+    ).annotate(
+        related_items=related_items(RelatedContent.NEWSLETTER),
+    ).filter(pk=pk).first()
+    archived = newsletter is None
+    if archived:
+        newsletter = get_object_or_404(
+            ArchivedNewsletter.objects.select_related(
+                'newsletter_author__publisher'),
+            pk=pk)
+    if not archived:
+        record_view(ContentStats.NEWSLETTER, newsletter.pk)
     context = {
-        'newsletter': newsletter
+        'newsletter': newsletter,
+        'archived': archived,
     }
     return render(request, 'news_app/view_newsletter.html', context)
 
@@ -475,27 +575,25 @@ def edit_newsletter(request, pk):
                 if is_approved and not was_approved:
                     publisher = newsletter_instance.newsletter_author.publisher
                     if publisher:
-                        subscribers = publisher.subscribers.all()
-                        if subscribers:
-                            subject = (
-                                f"New Newsletter Published: "
-                                f"{newsletter_instance.title}")
-                            # Render email content from a template for
-                            # better practice
-                            message = render_to_string(
-                                'news_app/newsletter_email.html',
-                                {
-                                 'newsletter': newsletter_instance,
-                                 'publisher': publisher,
-                                })
-                            # Get email addresses of all publisher
-                            # subscribers
-                            recipient_list = [
-                                subscriber.email for subscriber in subscribers
-                                if subscriber.email]
-                            email = EmailMessage(
-                                subject, message, to=recipient_list)
-                            email.send()
+                        subject = (
+                            f"New Newsletter Published: "
+                            f"{newsletter_instance.title}")
+                        # Render email content from a template for
+                        # better practice
+                        message = render_to_string(
+                            'news_app/newsletter_email.html',
+                            {
+                             'newsletter': newsletter_instance,
+                             'publisher': publisher,
+                            })
+                        # Readers following both the publisher and the
+                        # author are emailed once; digest readers get
+                        # the item in their digest
+                        notify_subscribers(
+                            subject, message, publishers=[publisher],
+                            journalists=[
+                                newsletter_instance.newsletter_author_id],
+                            tags=form.cleaned_data['tags'])
 
                     # Tweet about the new newsletter
                     try:
@@ -510,12 +608,14 @@ def edit_newsletter(request, pk):
                             "newsletter.")
                     except Exception as e:
                         # Log the error and inform the user
-                        print(f"Error posting tweet: {e}")
+                        count_event('tweet_failed', error=str(e))
                         messages.warning(
                             request, f"Newsletter approved, but failed to post"
                             f" a tweet. Error: {e}")
 
+            newsletter_instance.edited_by = request.user
             newsletter_instance.save()
+            form.save_m2m()
             messages.success(request, 'Newsletter updated successfully.')
             return redirect('article_list')
     else:
@@ -541,6 +641,104 @@ def delete_newsletter(request, pk):
         request, 'news_app/delete_newsletter.html', {'newsletter': newsletter})
 
 
+@login_required
+@permission_required('news_app.change_article', raise_exception=True)
+def approval_queue(request):
+    """
+    Allows an editor to approve or reject pending articles and
+    newsletters of their publisher in bulk.
+    """
+    # Ensure only 'Editor' role with a publisher can access this page
+    publisher = request.user.publisher
+    if request.user.role != 'Editor' or not publisher:
+        messages.error(request, "Only editors can approve items.")
+        return redirect('article_list')
+
+    pending_articles = Article.objects.filter(
+        editor_approved=False, independent_journalist=False, rejected=False,
+        article_author__publisher=publisher
+    ).select_related('article_author').defer('content').order_by('id')
+    pending_newsletters = Newsletter.objects.filter(
+        editor_approved=False, independent_journalist=False, rejected=False,
+        newsletter_author__publisher=publisher
+    ).select_related('newsletter_author').defer('content').order_by('id')
+
+    if request.method == 'POST':
+        action = request.POST.get('action')
+        selected_articles = pending_articles.filter(
+            pk__in=request.POST.getlist('articles'))
+        selected_newsletters = pending_newsletters.filter(
+            pk__in=request.POST.getlist('newsletters'))
+
+        if action == 'approve':
+            now = timezone.now()
+            with transaction.atomic():
+                # Lock the selected rows so concurrent edits can't
+                # approve them twice
+                articles = list(selected_articles.select_for_update())
+                newsletters = list(selected_newsletters.select_for_update())
+                Article.objects.filter(
+                    pk__in=[a.pk for a in articles]
+                ).update(
+                    editor_approved=True,
+                    published_at=Coalesce('published_at', Value(now)))
+                Newsletter.objects.filter(
+                    pk__in=[n.pk for n in newsletters]
+                ).update(
+                    editor_approved=True,
+                    published_at=Coalesce('published_at', Value(now)))
+                ArticleTag.objects.filter(
+                    article__in=[a.pk for a in articles],
+                    published_at__isnull=True).update(published_at=now)
+                NewsletterTag.objects.filter(
+                    newsletter__in=[n.pk for n in newsletters],
+                    published_at__isnull=True).update(published_at=now)
+
+            if articles or newsletters:
+                # Bulk updates bypass the signals that refresh the feeds
+                # and facets and push events to connected readers
+                bump_feed_version('publisher', publisher.pk)
+                bump_feed_version('tag', 'all')
+                bump_feed_version('reader', 'all')
+                bump_facet_version()
+                broker = get_broker()
+                for item in articles + newsletters:
+                    if item.published_at is None:
+                        item.published_at = now
+                        broker.publish(make_event(item))
+                # One digest per subscriber for the whole batch
+                send_publisher_digest(publisher, articles, newsletters)
+                try:
+                    tweet_publisher_digest(publisher, articles, newsletters)
+                except Exception as e:
+                    # Log the error and inform the user
+                    count_event('tweet_failed', error=str(e))
+                    messages.warning(
+                        request, f"Items approved, but failed to post a "
+                        f"tweet. Error: {e}")
+            messages.success(
+                request, f"{len(articles)} article(s) and "
+                f"{len(newsletters)} newsletter(s) approved.")
+
+        elif action == 'reject':
+            # Rejected items are kept for their authors to revise, and
+            # return to the queue when edited
+            with transaction.atomic():
+                selected_articles.update(rejected=True)
+                selected_newsletters.update(rejected=True)
+            messages.success(
+                request, "Selected items have been returned to their "
+                "authors.")
+
+        return redirect('approval_queue')
+
+    context = {
+        'pending_articles': pending_articles,
+        'pending_newsletters': pending_newsletters,
+    }
+    return render(request, 'news_app/approval_queue.html', context)
+
+
 @login_required
 def manage_subscriptions(request):
     """
@@ -556,22 +754,100 @@ def manage_subscriptions(request):
         # Get lists of IDs from the form submission
         subscribed_journalists_ids = request.POST.getlist('journalists')
         subscribed_publishers_ids = request.POST.getlist('publishers')
+        subscribed_tags_ids = request.POST.getlist('tags')
 
         # Update user's subscriptions
         request.user.subscribed_journalists.set(subscribed_journalists_ids)
         request.user.subscribed_publishers.set(subscribed_publishers_ids)
+        request.user.subscribed_tags.set(subscribed_tags_ids)
+
+        # Update the user's digest preference
+        digest_frequency = request.POST.get('digest_frequency')
+        choices = dict(CustomUser.DIGEST_CHOICES)
+        if (digest_frequency in choices
+                and digest_frequency != request.user.digest_frequency):
+            request.user.digest_frequency = digest_frequency
+            # Digests start from now rather than from the beginning
+            request.user.last_digest_sent = timezone.now()
+            request.user.save(
+                update_fields=['digest_frequency', 'last_digest_sent'])
 
         messages.success(request, "Your subscriptions have been updated.")
         return redirect('article_list')
 
     # GET request: display the subscription options
-    journalists = CustomUser.objects.filter(role='Journalist')
-    publishers = Publisher.objects.all()
+    journalists = list(CustomUser.objects.filter(role='Journalist'))
+    publishers = list(Publisher.objects.all())
+    # Looked up once instead of once per listed journalist/publisher
+    subscribed_journalist_ids = set(
+        request.user.subscribed_journalists.values_list('pk', flat=True))
+    subscribed_publisher_ids = set(
+        request.user.subscribed_publishers.values_list('pk', flat=True))
+    tags = list(Tag.objects.all())
+    subscribed_tag_ids = set(
+        request.user.subscribed_tags.values_list('pk', flat=True))
+
+    # Recommended sources the reader doesn't follow yet, named from the
+    # lists above
+    sources = {
+        'journalist': ({j.pk: j for j in journalists},
+                       subscribed_journalist_ids),
+        'publisher': ({p.pk: p for p in publishers},
+                      subscribed_publisher_ids),
+    }
+    recommended = []
+    for source in get_recommendations(
+            Recommendation.READER, request.user.pk):
+        objects, subscribed = sources[source['type']]
+        if source['id'] in objects and source['id'] not in subscribed:
+            recommended.append((source['type'], objects[source['id']]))
 
-    context = {'journalists': journalists, 'publishers': publishers}
+    context = {
+        'journalists': journalists,
+        'publishers': publishers,
+        'subscribed_journalist_ids': subscribed_journalist_ids,
+        'subscribed_publisher_ids': subscribed_publisher_ids,
+        'tags': tags,
+        'subscribed_tag_ids': subscribed_tag_ids,
+        'recommended': recommended,
+        'digest_choices': CustomUser.DIGEST_CHOICES,
+        'feed_token': reader_feed_token(request.user),
+    }
     return render(request, 'news_app/manage_subscriptions.html', context)
 
 
+@login_required
+def api_tokens(request):
+    """
+    Allows a reader to create and revoke the tokens used to access the
+    API from other devices.
+    """
+    # Ensure only 'Reader' role can access this page
+    if request.user.role != 'Reader':
+        messages.error(request, "Only readers can use the API.")
+        return redirect('article_list')
+
+    new_key = None
+    if request.method == 'POST':
+        if request.POST.get('action') == 'create':
+            name = request.POST.get('name', '').strip()[:100] or 'API token'
+            token, new_key = issue_token(request.user, name)
+            messages.success(
+                request, "Token created. Copy it now, it won't be shown "
+                "again.")
+        elif request.POST.get('action') == 'revoke':
+            token = get_object_or_404(
+                ApiToken, pk=request.POST.get('token'), user=request.user)
+            revoke_token(token)
+            messages.success(request, "Token revoked.")
+            return redirect('api_tokens')
+
+    tokens = request.user.api_tokens.order_by('-created_at')
+    context = {'tokens': tokens, 'new_key': new_key}
+    return render(request, 'news_app/api_tokens.html', context)
+
+
+@throttle('password_reset', methods=('POST',))
 def password_reset_request(request):
     """
     Handles the request for a password reset link.
@@ -645,19 +921,74 @@ def password_reset_confirm(request, uidb64=None, token=None):
         return redirect('password_reset_request')
 
 
+async def content_events(request):
+    """
+    Server-Sent Events endpoint pushing an event to a 'Reader' when an
+    item from their subscriptions is published. Supports resuming with
+    the Last-Event-ID header.
+    """
+    user = await request.auser()
+    if not user.is_authenticated or user.role != 'Reader':
+        return JsonResponse(
+            {'error': 'This view is for Readers only.'}, status=403)
+
+    @sync_to_async
+    def load_subscriptions():
+        return (
+            list(user.subscribed_publishers.values_list('pk', flat=True)),
+            list(user.subscribed_journalists.values_list('pk', flat=True)))
+
+    publisher_ids, journalist_ids = await load_subscriptions()
+    try:
+        stream = get_broker().open(
+            user, publisher_ids, journalist_ids,
+            request.headers.get('Last-Event-ID'))
+    except TooManyConnections as e:
+        return JsonResponse(
+            {'error': str(e)}, status=503, headers={'Retry-After': '30'})
+
+    response = StreamingHttpResponse(
+        stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop proxies such as nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# The IP throttle runs before authentication so rejected clients never
+# cost a password hash
+@throttle('api_ip')
 @api_view(['GET'])
-@authentication_classes([SessionAuthentication, BasicAuthentication])
+@authentication_classes(
+    [SessionAuthentication, TokenAuthentication, BasicAuthentication])
 @permission_classes([IsAuthenticated])
+@throttle_classes([UserRateThrottle])
 def api_reader_view(request):
     """
     API endpoint for a 'Reader' to get articles and
-    newsletters they are subscribed to.
+    newsletters they are subscribed to. The optional ``fields`` query
+    parameter limits the serialized fields.
     """
     user = request.user
     if user.role != 'Reader':
         return Response(
             {'error': 'This view is for Readers only.'}, status=403)
 
+    # Optional field projection, e.g. ?fields=id,title,summary
+    fields = None
+    if request.query_params.get('fields'):
+        fields = [
+            name.strip() for name in request.query_params['fields'].split(',')
+            if name.strip()]
+        allowed = (
+            set(ArticleSerializer.Meta.fields)
+            | set(NewsletterSerializer.Meta.fields))
+        unknown = sorted(set(fields) - allowed)
+        if unknown:
+            return Response(
+                {'error': f"Unknown fields: {', '.join(unknown)}."},
+                status=400)
+
     # Get subscribed publishers and journalists
     subscribed_publishers = user.subscribed_publishers.all()
     subscribed_journalists = user.subscribed_journalists.all()
@@ -686,15 +1017,42 @@ def api_reader_view(request):
         independent_journalist=True
     ).select_related('newsletter_author')
 
+    # Get published content carrying subscribed tags, through the tag
+    # links so each item is listed once
+    subscribed_tags = user.subscribed_tags.all()
+    tag_articles = Article.objects.filter(
+        pk__in=ArticleTag.objects.filter(
+            tag__in=subscribed_tags, published_at__isnull=False,
+        ).values('article_id')
+    ).select_related('article_author')
+    tag_newsletters = Newsletter.objects.filter(
+        pk__in=NewsletterTag.objects.filter(
+            tag__in=subscribed_tags, published_at__isnull=False,
+        ).values('newsletter_id')
+    ).select_related('newsletter_author')
+
+    # Only load the content body when the client asked for it
+    if fields is not None and 'content' not in fields:
+        publisher_articles = publisher_articles.defer('content')
+        publisher_newsletters = publisher_newsletters.defer('content')
+        independent_articles = independent_articles.defer('content')
+        independent_newsletters = independent_newsletters.defer('content')
+        tag_articles = tag_articles.defer('content')
+        tag_newsletters = tag_newsletters.defer('content')
+
     # Serialize the data
-    publisher_articles_data = (
-        ArticleSerializer(publisher_articles, many=True).data)
-    publisher_newsletters_data = (
-        NewsletterSerializer(publisher_newsletters, many=True).data)
-    independent_articles_data = (
-        ArticleSerializer(independent_articles, many=True).data)
-    independent_newsletters_data = (
-        NewsletterSerializer(independent_newsletters, many=True).data)
+    publisher_articles_data = ArticleSerializer(
+        publisher_articles, many=True, fields=fields).data
+    publisher_newsletters_data = NewsletterSerializer(
+        publisher_newsletters, many=True, fields=fields).data
+    independent_articles_data = ArticleSerializer(
+        independent_articles, many=True, fields=fields).data
+    independent_newsletters_data = NewsletterSerializer(
+        independent_newsletters, many=True, fields=fields).data
+    tag_articles_data = ArticleSerializer(
+        tag_articles, many=True, fields=fields).data
+    tag_newsletters_data = NewsletterSerializer(
+        tag_newsletters, many=True, fields=fields).data
 
     # Combine independent content
     subscribed_content = {
@@ -702,6 +1060,181 @@ def api_reader_view(request):
         'publishers_newsletters': publisher_newsletters_data,
         'journalists_articles': independent_articles_data,
         'journalists_newsletters': independent_newsletters_data,
+        'tags_articles': tag_articles_data,
+        'tags_newsletters': tag_newsletters_data,
     }
 
     return Response(subscribed_content)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def api_throttle_metrics(request):
+    """
+    API endpoint for staff to see the allowed and throttled request
+    counts per throttle scope of this server process.
+    """
+    return Response(get_metrics())
+
+
+@api_view(['GET'])
+@authentication_classes(
+    [SessionAuthentication, TokenAuthentication, BasicAuthentication])
+@permission_classes([IsAuthenticated])
+@throttle_classes([UserRateThrottle])
+def api_recommendations(request):
+    """
+    API endpoint listing the journalists and publishers recommended to
+    the user, based on what readers with similar subscriptions follow.
+    """
+    return Response(
+        get_recommendations(Recommendation.READER, request.user.pk))
+
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def api_similar_sources(request, kind, pk):
+    """
+    API endpoint listing the journalists and publishers most often
+    followed together with a journalist or publisher.
+    """
+    kinds = {
+        'journalist': Recommendation.JOURNALIST,
+        'publisher': Recommendation.PUBLISHER,
+    }
+    if kind not in kinds:
+        return Response({'error': f"Unknown source type {kind}."}, status=404)
+    return Response(get_recommendations(kinds[kind], pk))
+
+
+@throttle('api_ip')
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def api_tags(request):
+    """
+    API endpoint listing the latest published articles and newsletters
+    carrying every tag given in the tag query parameter, with the
+    number of those items per tag.
+    """
+    slugs = sorted(set(request.query_params.getlist('tag')))
+    tags = selected_tags(slugs)
+    unknown = sorted(set(slugs) - {tag.slug for tag in tags})
+    if unknown:
+        return Response(
+            {'error': f"Unknown tags: {', '.join(unknown)}."}, status=404)
+
+    articles = filter_by_tags(
+        Article.objects.filter(published_at__isnull=False), tags)
+    newsletters = filter_by_tags(
+        Newsletter.objects.filter(published_at__isnull=False), tags)
+    size = getattr(settings, 'TAG_LISTING_SIZE', 50)
+    fields = ['id', 'title', 'summary']
+    return Response({
+        'tags': facet_counts(articles, newsletters, 'api:' + ','.join(slugs)),
+        'articles': ArticleSerializer(
+            articles.defer('content').order_by('-published_at')[:size],
+            many=True, fields=fields).data,
+        'newsletters': NewsletterSerializer(
+            newsletters.defer('content').order_by('-published_at')[:size],
+            many=True, fields=fields).data,
+    })
+
+
+def _revision_kind(request, kind):
+    """
+    Returns the revision kind of an item type, or an error response
+    when the type is unknown or the user cannot edit items of it.
+    """
+    if kind not in REVISION_KINDS:
+        return Response({'error': f"Unknown item type {kind}."}, status=404)
+    if not request.user.has_perm(f'news_app.change_{kind}'):
+        return Response(
+            {'error': 'Revisions are for editors and journalists only.'},
+            status=403)
+    return REVISION_KINDS[kind]
+
+
+def _revision_data(revision):
+    """Returns the fields of a revision shown by the API."""
+    return {
+        'number': revision.number,
+        'title': revision.title,
+        'length': revision.length,
+        'author': revision.author.username if revision.author else None,
+        'created_at': revision.created_at,
+    }
+
+
+@api_view(['GET'])
+@authentication_classes(
+    [SessionAuthentication, TokenAuthentication, BasicAuthentication])
+@permission_classes([IsAuthenticated])
+@throttle_classes([UserRateThrottle])
+def api_revisions(request, kind, pk):
+    """
+    API endpoint listing the revisions of an article or newsletter,
+    latest first, for users who can edit it.
+    """
+    kind = _revision_kind(request, kind)
+    if isinstance(kind, Response):
+        return kind
+    # The stored contents are not needed for the list
+    revisions = Revision.objects.filter(kind=kind, object_id=pk).defer(
+        'data').select_related('author').order_by('-number')
+    data = [_revision_data(revision) for revision in revisions]
+    if not data:
+        return Response({'error': 'No revisions found.'}, status=404)
+    return Response(data)
+
+
+@api_view(['GET'])
+@authentication_classes(
+    [SessionAuthentication, TokenAuthentication, BasicAuthentication])
+@permission_classes([IsAuthenticated])
+@throttle_classes([UserRateThrottle])
+def api_revision(request, kind, pk, number):
+    """
+    API endpoint returning the title and content of a revision of an
+    article or newsletter.
+    """
+    kind = _revision_kind(request, kind)
+    if isinstance(kind, Response):
+        return kind
+    version = get_version(kind, pk, number)
+    if version is None:
+        return Response({'error': 'No such revision.'}, status=404)
+    revision, content = version
+    return Response({**_revision_data(revision), 'content': content})
+
+
+@api_view(['GET'])
+@authentication_classes(
+    [SessionAuthentication, TokenAuthentication, BasicAuthentication])
+@permission_classes([IsAuthenticated])
+@throttle_classes([UserRateThrottle])
+def api_revision_diff(request, kind, pk, first, second):
+    """
+    API endpoint returning a unified diff of the content of two
+    revisions of an article or newsletter.
+    """
+    kind = _revision_kind(request, kind)
+    if isinstance(kind, Response):
+        return kind
+    diff = diff_versions(kind, pk, first, second)
+    if diff is None:
+        return Response({'error': 'No such revision.'}, status=404)
+    return Response({'from': first, 'to': second, 'diff': diff})
+
+
+# Public and served from the cache, so no authentication is attempted
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def api_trending(request):
+    """
+    API endpoint listing the articles and newsletters with the most
+    views, with recent views weighing more than older ones.
+    """
+    return Response(get_trending())
@@ -0,0 +1,11 @@
+"""
+Settings profiles of project_news, selected with DJANGO_SETTINGS_MODULE:
+
+- project_news.settings.dev: local development, the default of
+  manage.py.
+- project_news.settings.test: the test suite.
+- project_news.settings.prod: production, the default of the WSGI and
+  ASGI applications.
+
+Every profile builds on project_news.settings.base.
+"""
@@ -0,0 +1,353 @@
+"""
+Django settings for project_news project, shared by every profile.
+
+Generated by 'django-admin startproject' using Django 5.2.7.
+
+The dev, test and prod modules of this package build on these settings.
+Values that differ between deployments are read from environment
+variables.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/5.2/topics/settings/
+
+For the full list of settings and their values, see
+https://docs.djangoproject.com/en/5.2/ref/settings/
+"""
+
+from pathlib import Path
+import os
+
+# Build paths inside the project like this: BASE_DIR / 'subdir'.
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+
+def env_bool(name, default=False):
+    """Reads a true/false flag from an environment variable."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def env_list(name, default=''):
+    """Reads a comma separated list from an environment variable."""
+    return [
+        item.strip() for item in os.environ.get(name, default).split(',')
+        if item.strip()]
+
+
+# Deployment checklist
+# See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', '')
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = env_bool('DJANGO_DEBUG')
+
+ALLOWED_HOSTS = env_list('DJANGO_ALLOWED_HOSTS')
+
+
+# Application definition
+
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    # new app
+    "news_app",
+    # 3rd party apps
+    'rest_framework',
+]
+
+MIDDLEWARE = [
+    # Outermost, so its record covers the whole request
+    'news_app.middleware.RequestLogMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    # Compresses response bodies, so it must come before middleware
+    # that reads or changes them
+    'news_app.middleware.CompressionMiddleware',
+    # Removed at startup unless PROFILING_ENABLED is set
+    'news_app.middleware.ProfilingMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'project_news.urls'
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [BASE_DIR / 'templates'],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'project_news.wsgi.application'
+
+
+# Database
+# https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.mysql',
+        'NAME': os.environ.get('DB_NAME', 'project_news_db'),
+        'USER': os.environ.get('DB_USER', 'admin'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'password'),
+        'HOST': os.environ.get('DB_HOST', '127.0.0.1'),
+        'PORT': os.environ.get('DB_PORT', '3306'),
+        # Seconds a connection is reused across requests, 0 closes it
+        # at the end of every request
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '0')),
+        'OPTIONS': {
+            'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
+        },
+    }
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Set REDIS_URL, e.g. redis://127.0.0.1:6379/0, for a cache shared by
+# all server processes. Without it every process has its own cache.
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'project-news',
+        }
+    }
+
+
+# Sessions
+# https://docs.djangoproject.com/en/5.2/topics/http/sessions/
+# Set SESSION_BACKEND to choose where sessions are kept:
+# - 'db': in the django_session table, read on every request.
+# - 'cached_db': in the cache, written through to the database and
+#   only read from it on a cache miss.
+# - 'cache': only in the cache; sessions are lost when it is cleared.
+#   With several server processes 'cached_db' and 'cache' need a cache
+#   shared by all processes (e.g. Redis or Memcached), otherwise a
+#   logout in one process is not seen by the others.
+# - 'signed_cookies': in a signed cookie, no server-side storage. Only
+#   suitable for small sessions, and a leaked SECRET_KEY allows forged
+#   sessions.
+# Database backed sessions should be cleaned up daily with
+# 'python manage.py clearsessions'.
+
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_ENGINES[os.environ.get('SESSION_BACKEND', 'db')]
+
+
+# Password validation
+# https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/5.2/topics/i18n/
+
+LANGUAGE_CODE = 'en-us'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/5.2/howto/static-files/
+
+STATIC_URL = 'static/'
+
+# Add static files directories
+STATICFILES_DIRS = [
+    BASE_DIR / "news_app/static",
+    # Add other app static directories if needed
+]
+# Define the root directory for static files
+STATIC_ROOT = BASE_DIR / "static"
+
+# collectstatic stores files under content hashed names with
+# pre-compressed gzip/brotli variants. The WSGI and ASGI applications
+# serve them with far-future cache headers unless SERVE_STATIC is False,
+# e.g. when a web server or CDN serves them.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'news_app.storage.CompressedManifestStaticFilesStorage',
+    },
+    # Article and newsletter images and their thumbnails. Any storage
+    # backend works, as files are only accessed through the storage API.
+    'attachments': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {
+            'location': os.environ.get('MEDIA_ROOT', BASE_DIR / 'media'),
+        },
+    },
+}
+SERVE_STATIC = env_bool('SERVE_STATIC', True)
+
+# Uploads are streamed to a temporary file in chunks instead of being
+# read into memory. Images over ATTACHMENT_MAX_SIZE bytes are refused.
+# Thumbnails of up to THUMBNAIL_SIZE pixels are rendered by a pool of
+# THUMBNAIL_WORKERS processes; with no workers they are rendered when
+# the item is saved.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+ATTACHMENT_MAX_SIZE = 10 * 1024 * 1024
+THUMBNAIL_SIZE = (320, 320)
+THUMBNAIL_WORKERS = 2
+
+# Default primary key field type
+# https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
+
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Use the custom user model for authentication
+AUTH_USER_MODEL = 'news_app.CustomUser'
+
+EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+DEFAULT_FROM_EMAIL = 'noreply@newsapp.com'
+
+# Request throttling with token buckets shared by all worker processes,
+# kept in the shared cache production requires. Use
+# 'news_app.functions.throttling.DatabaseBucketStore' to keep them in
+# the database instead, at the cost of a locked row write per request
+# and scope.
+THROTTLE_STORE = 'news_app.functions.throttling.CacheBucketStore'
+# Number of trusted reverse proxies in front of the application. Client
+# addresses are read from X-Forwarded-For when set, and every client
+# would share the proxy's address otherwise.
+NUM_PROXIES = int(os.environ.get('NUM_PROXIES', '0'))
+THROTTLE_RATES = {
+    'api_user': '120/minute',
+    'api_ip': '240/minute',
+    'login': '10/minute',
+    'password_reset': '5/hour',
+}
+
+# Response compression. Bodies shorter than COMPRESS_MIN_SIZE bytes are
+# sent as they are; pages with a CSRF token are never brotli compressed.
+COMPRESS_MIN_SIZE = 512
+COMPRESS_BROTLI_QUALITY = 4
+COMPRESS_GZIP_LEVEL = 6
+
+# Request profiling, off unless PROFILING_ENABLED is set. Requests with
+# a signed X-Profile header ('python manage.py profiles --token') and a
+# PROFILING_SAMPLE_RATE fraction of all requests are profiled, keeping
+# the latest PROFILING_MAX_PROFILES profiles in PROFILING_DIR.
+PROFILING_ENABLED = env_bool('PROFILING_ENABLED')
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_MAX_PROFILES = 100
+PROFILING_DIR = BASE_DIR / 'profiles'
+
+# Admin changelists of tables with more rows than this, according to
+# the table statistics, show the estimated row count instead of
+# counting every row.
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 100000
+
+# Article and newsletter views are counted in memory and written to
+# the database every VIEW_FLUSH_INTERVAL seconds. Trending scores halve
+# every TRENDING_HALF_LIFE seconds; the TRENDING_SIZE items with the
+# highest scores are kept in the cache for TRENDING_CACHE_TIMEOUT.
+VIEW_FLUSH_INTERVAL = 10
+TRENDING_HALF_LIFE = 6 * 60 * 60
+TRENDING_SIZE = 20
+TRENDING_CACHE_TIMEOUT = 5 * 60
+
+# Sources kept per reader, journalist and publisher by the nightly
+# build_recommendations command.
+RECOMMENDATIONS_TOP_K = 10
+
+# Related items kept per article and newsletter by
+# build_related_content, and the number of hashed word features.
+RELATED_TOP_K = 5
+RELATED_FEATURES = 2 ** 18
+
+# Tag facet counts are cached for TAG_FACET_CACHE_TIMEOUT seconds, or
+# until an item or its tags change. The tag API lists up to
+# TAG_LISTING_SIZE articles and newsletters.
+TAG_FACET_CACHE_TIMEOUT = 10 * 60
+TAG_LISTING_SIZE = 50
+
+# Every REVISION_SNAPSHOT_INTERVAL-th revision of an item stores its
+# content in full, so a version is rebuilt from at most that many
+# revisions.
+REVISION_SNAPSHOT_INTERVAL = 10
+
+# archive_content moves items published more than ARCHIVE_AFTER_DAYS
+# days ago to the archive tables.
+ARCHIVE_AFTER_DAYS = 2 * 365
+
+# Records are written to stdout as JSON lines by a background thread,
+# with the id, view and user of the request they were logged in.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'json': {
+            'class': 'news_app.log.QueueJsonHandler',
+            'stream': 'ext://sys.stdout',
+        },
+    },
+    'loggers': {
+        'news_app': {
+            'handlers': ['json'],
+            'level': os.environ.get('LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+        'django': {
+            'handlers': ['json'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
@@ -0,0 +1,26 @@
+"""
+Development settings for project_news, on top of the shared settings.
+"""
+
+import os
+
+from .base import *  # noqa: F401,F403
+from .base import STORAGES, env_bool, env_list
+
+DEBUG = env_bool('DJANGO_DEBUG', True)
+
+# SECURITY WARNING: only use the fallback key for local development!
+SECRET_KEY = os.environ.get(
+    'DJANGO_SECRET_KEY',
+    'django-insecure-9p-u7_hcw40p(3@gek=*4!ddy_a7*g3li2d1%uw39p57^e&^2y')
+
+ALLOWED_HOSTS = env_list('DJANGO_ALLOWED_HOSTS', 'localhost,127.0.0.1')
+
+# runserver serves static files from the app directories as they are
+STORAGES = {
+    **STORAGES,
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+SERVE_STATIC = False
@@ -0,0 +1,50 @@
+"""
+Production settings for project_news, on top of the shared settings.
+
+DJANGO_SECRET_KEY and DJANGO_ALLOWED_HOSTS must be set. Database
+connections are kept open between requests, templates are compiled
+once per process by the cached loader and warmed when the WSGI/ASGI
+application starts, and the startup self-check refuses to start with
+settings that would make the site slow.
+"""
+
+import os
+
+from .base import *  # noqa: F401,F403
+from .base import DATABASES, TEMPLATES
+
+# Also keeps Django from recording every SQL query in memory
+DEBUG = False
+
+# Reuse database connections for up to a minute, checking they are
+# still alive before each request reuses them
+DATABASES = {
+    alias: {
+        **database,
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
+    }
+    for alias, database in DATABASES.items()
+}
+
+# Keep compiled templates in memory instead of reading and parsing the
+# template files on every render
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]
+# Compile the app's templates when the application starts
+TEMPLATE_WARMUP = True
+
+# Check the settings above when the application starts, see
+# news_app/checks.py
+STARTUP_CHECKS = True
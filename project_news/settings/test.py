@@ -0,0 +1,65 @@
+"""
+Settings used by the test suite, on top of the shared settings.
+
+The suite runs on an in-memory SQLite database with no external
+services, so it can run anywhere and with --parallel.
+"""
+
+import tempfile
+from .base import *  # noqa: F401,F403
+from .base import LOGGING, STORAGES
+
+DEBUG = False
+
+SECRET_KEY = 'django-insecure-test-key'
+
+ALLOWED_HOSTS = ['testserver']
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'project-news-test',
+    }
+}
+
+# Hashing passwords with a deliberately slow hasher dominates the run
+# time of tests creating users
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# Templates use static files that have not been collected
+STORAGES = {
+    **STORAGES,
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+    # Uploaded images go to a throwaway directory
+    'attachments': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {'location': tempfile.mkdtemp(prefix='news-app-test-')},
+    },
+}
+SERVE_STATIC = False
+
+# Render thumbnails in the test process
+THUMBNAIL_WORKERS = 0
+
+# Tests flush counted views themselves
+VIEW_FLUSH_INTERVAL = None
+
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+
+# Keep expected warnings, such as failed tweets, out of the test output
+LOGGING = {
+    **LOGGING,
+    'loggers': {
+        name: {**logger, 'level': 'CRITICAL'}
+        for name, logger in LOGGING['loggers'].items()
+    },
+}
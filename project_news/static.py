@@ -0,0 +1,182 @@
+"""
+Serves collected static files directly from the WSGI and ASGI
+applications, without going through Django's URL routing.
+
+Pre-compressed brotli and gzip variants written at collectstatic time
+are served to clients that accept them, and files with a content hash
+in their name are cached by clients for a year.
+"""
+
+import asyncio
+import mimetypes
+import os
+import re
+from pathlib import Path
+from urllib.parse import unquote
+
+from django.conf import settings
+
+# Files with a content hash in their name, e.g. styles.1a2b3c4d5e6f.css
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+SHORT_LIVED = 'public, max-age=60'
+# Variants in order of preference: (Accept-Encoding token, suffix)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+CHUNK_SIZE = 64 * 1024
+
+
+class StaticFiles:
+    """
+    Resolves request paths under a URL prefix to files under a root
+    directory and builds their response headers.
+    """
+    def __init__(self, root, prefix):
+        self.root = Path(root).resolve()
+        self.prefix = '/' + prefix.strip('/') + '/'
+
+    def matches(self, path):
+        return path.startswith(self.prefix)
+
+    def find(self, path):
+        """
+        Returns the file a request path points at, or None when it
+        doesn't exist or lies outside the root directory.
+        """
+        relative = unquote(path[len(self.prefix):])
+        candidate = (self.root / relative).resolve()
+        if self.root not in candidate.parents or not candidate.is_file():
+            return None
+        return candidate
+
+    def respond(self, path, accept_encoding, if_none_match):
+        """
+        Returns the status, headers and file to send for a request, or
+        None when the request is not for an existing static file.
+        """
+        original = self.find(path)
+        if original is None:
+            return None
+
+        filename, encoding = original, None
+        accepted = {
+            token.split(';')[0].strip()
+            for token in accept_encoding.split(',')}
+        for token, suffix in ENCODINGS:
+            variant = original.with_name(original.name + suffix)
+            if token in accepted and variant.is_file():
+                filename, encoding = variant, token
+                break
+
+        stat = filename.stat()
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        content_type = (
+            mimetypes.guess_type(original.name)[0]
+            or 'application/octet-stream')
+        headers = [
+            ('Content-Type', content_type),
+            ('Cache-Control', IMMUTABLE if HASHED_NAME.search(
+                original.name) else SHORT_LIVED),
+            ('ETag', etag),
+            ('Vary', 'Accept-Encoding'),
+        ]
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        if if_none_match and etag in if_none_match:
+            return 304, headers, None
+        headers.append(('Content-Length', str(stat.st_size)))
+        return 200, headers, filename
+
+
+class StaticFilesMiddleware:
+    """
+    WSGI middleware serving static files ahead of the application.
+    """
+    def __init__(self, application, root, prefix):
+        self.application = application
+        self.files = StaticFiles(root, prefix)
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        method = environ.get('REQUEST_METHOD')
+        if method in ('GET', 'HEAD') and self.files.matches(path):
+            result = self.files.respond(
+                path, environ.get('HTTP_ACCEPT_ENCODING', ''),
+                environ.get('HTTP_IF_NONE_MATCH', ''))
+            if result is not None:
+                status, headers, filename = result
+                start_response(
+                    '304 Not Modified' if status == 304 else '200 OK',
+                    headers)
+                if filename is None or method == 'HEAD':
+                    return [b'']
+                file_wrapper = environ.get(
+                    'wsgi.file_wrapper', _read_chunks)
+                return file_wrapper(open(filename, 'rb'), CHUNK_SIZE)
+        return self.application(environ, start_response)
+
+
+def _read_chunks(file, chunk_size):
+    """Fallback for servers without wsgi.file_wrapper."""
+    with file:
+        while chunk := file.read(chunk_size):
+            yield chunk
+
+
+class ASGIStaticFilesMiddleware:
+    """
+    ASGI middleware serving static files ahead of the application.
+    """
+    def __init__(self, application, root, prefix):
+        self.application = application
+        self.files = StaticFiles(root, prefix)
+
+    async def __call__(self, scope, receive, send):
+        if (scope['type'] == 'http'
+                and scope['method'] in ('GET', 'HEAD')
+                and self.files.matches(scope['path'])):
+            request_headers = dict(scope['headers'])
+            result = await asyncio.to_thread(
+                self.files.respond, scope['path'],
+                request_headers.get(b'accept-encoding', b'').decode(),
+                request_headers.get(b'if-none-match', b'').decode())
+            if result is not None:
+                await self.send_file(scope, send, *result)
+                return
+        await self.application(scope, receive, send)
+
+    async def send_file(self, scope, send, status, headers, filename):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [
+                (name.lower().encode(), value.encode())
+                for name, value in headers],
+        })
+        if filename is None or scope['method'] == 'HEAD':
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        with open(filename, 'rb') as file:
+            while True:
+                chunk = await asyncio.to_thread(file.read, CHUNK_SIZE)
+                more = len(chunk) == CHUNK_SIZE
+                await send({
+                    'type': 'http.response.body', 'body': chunk,
+                    'more_body': more})
+                if not more:
+                    break
+
+
+def static_root_and_prefix():
+    """
+    Returns the static files root and URL prefix from the settings, or
+    None when static files should not be served by the application.
+    """
+    serve = getattr(settings, 'SERVE_STATIC', not settings.DEBUG)
+    if not serve or not settings.STATIC_ROOT:
+        return None
+    if '://' in settings.STATIC_URL:
+        # Static files are served from another host, e.g. a CDN
+        return None
+    if not os.path.isdir(settings.STATIC_ROOT):
+        return None
+    return settings.STATIC_ROOT, settings.STATIC_URL
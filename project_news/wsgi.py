@@ -10,8 +10,24 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project_news.settings')
+from news_app.checks import fail_fast
+from news_app.functions.templates import warm_templates
+from project_news.static import StaticFilesMiddleware, static_root_and_prefix
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project_news.settings.prod')
 
 application = get_wsgi_application()
+
+if getattr(settings, 'STARTUP_CHECKS', False):
+    fail_fast()
+if getattr(settings, 'TEMPLATE_WARMUP', False):
+    warm_templates()
+
+# Serve collected static files with far-future cache headers when
+# Django itself doesn't serve them
+static_files = static_root_and_prefix()
+if static_files:
+    application = StaticFilesMiddleware(application, *static_files)